@@ -0,0 +1,184 @@
+"""Account lookup across DRY_ADMIN and DRY_VIEWER.
+
+Admins and viewers share one username namespace. ``find_account`` resolves a
+username with a single UNION ALL query over both unique username indexes
+(an admin wins if both tables have the name), and ``username_taken`` checks
+both tables at once.
+
+``username_taken`` first asks ``UsernameFilter``, a Bloom filter of every
+username, so checks for free names (the common case during signup bursts)
+need no query. The filter has no false negatives for names it has seen; it
+is rebuilt from MySQL every ``USERNAME_FILTER_TTL`` seconds and names
+registered by this process are added immediately. A name registered by
+another worker process since the last rebuild can therefore be reported as
+free; registration still relies on the unique index of DRY_VIEWER.
+"""
+import hashlib
+import math
+import threading
+import time
+import unicodedata
+
+from flask import current_app
+
+LOOKUP_SQL = """
+    SELECT * FROM (
+        SELECT 'admin' AS ROLE, ADMIN_ID AS USER_ID, USERNAME, PASSWORD_HASH, FNAME, LNAME
+        FROM DRY_ADMIN WHERE USERNAME = %s
+        UNION ALL
+        SELECT 'viewer', ACCOUNT, USERNAME, PASSWORD_HASH, FNAME, LNAME
+        FROM DRY_VIEWER WHERE USERNAME = %s
+    ) accounts
+    ORDER BY ROLE
+    LIMIT 1
+"""
+
+EXISTS_SQL = """
+    SELECT EXISTS (SELECT 1 FROM DRY_ADMIN WHERE USERNAME = %s)
+        OR EXISTS (SELECT 1 FROM DRY_VIEWER WHERE USERNAME = %s)
+"""
+
+
+def find_account(cursor, username):
+    """Returns the account row (ROLE, USER_ID, USERNAME, PASSWORD_HASH, FNAME, LNAME) or None.
+
+    ``cursor`` must be a dictionary cursor.
+    """
+    cursor.execute(LOOKUP_SQL, (username, username))
+    return cursor.fetchone()
+
+
+def username_taken(cursor, username):
+    """True if an admin or viewer already uses ``username``; ``cursor`` must be a tuple cursor."""
+    usernames = get_filter()
+    if not usernames.might_contain(cursor, username):
+        return False
+    cursor.execute(EXISTS_SQL, (username, username))
+    taken = bool(cursor.fetchone()[0])
+    usernames.record_lookup(taken)
+    return taken
+
+
+def normalize(username):
+    """Folds case, accents and trailing spaces the way the utf8mb4_unicode_ci
+    collation compares them (closely enough that equal names hash equally)."""
+    decomposed = unicodedata.normalize('NFKD', username)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().rstrip(' ')
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.nbits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.nhashes = max(1, round(self.nbits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.nbits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return ((h1 + i * h2) % self.nbits for i in range(self.nhashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class UsernameFilter:
+    """Bloom filter of all admin and viewer usernames, rebuilt every ``ttl`` seconds."""
+
+    def __init__(self, ttl=300, error_rate=0.01):
+        self.ttl = ttl
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._loaded_at = 0.0
+        self._loading = False
+        self._added = []  # names added while a rebuild is scanning
+
+        self._negatives = 0  # checks answered without a query
+        self._lookups = 0  # checks that had to query MySQL
+        self._false_positives = 0
+
+    def _load(self, cursor):
+        cursor.execute("SELECT (SELECT COUNT(*) FROM DRY_ADMIN) + (SELECT COUNT(*) FROM DRY_VIEWER)")
+        count = cursor.fetchone()[0]
+        # Room to grow until the next rebuild without losing accuracy
+        bloom = BloomFilter(max(2 * count, 1024), self.error_rate)
+        cursor.execute("SELECT USERNAME FROM DRY_ADMIN UNION ALL SELECT USERNAME FROM DRY_VIEWER")
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            for (username,) in rows:
+                bloom.add(normalize(username))
+        return bloom
+
+    def might_contain(self, cursor, username):
+        with self._lock:
+            rebuild = not self._loading and (self._bloom is None
+                                             or time.monotonic() - self._loaded_at > self.ttl)
+            if rebuild:
+                self._loading = True
+                self._added = []
+        if rebuild:
+            # Scanned without the lock, so other checks keep using the old filter
+            started = time.monotonic()
+            try:
+                bloom = self._load(cursor)
+            except Exception:
+                with self._lock:
+                    self._loading = False
+                raise
+            with self._lock:
+                for name in self._added:
+                    bloom.add(name)
+                self._bloom, self._loaded_at, self._loading = bloom, started, False
+                self._added = []
+        with self._lock:
+            if self._bloom is None:
+                # The first build is still running in another request: ask MySQL
+                return True
+            if normalize(username) in self._bloom:
+                return True
+            self._negatives += 1
+            return False
+
+    def record_lookup(self, found):
+        with self._lock:
+            self._lookups += 1
+            self._false_positives += not found
+
+    def add(self, username):
+        """Records a username created by this process."""
+        with self._lock:
+            if self._loading:
+                self._added.append(normalize(username))
+            if self._bloom is not None:
+                self._bloom.add(normalize(username))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "usernames": self._bloom.count if self._bloom else 0,
+                "bits": self._bloom.nbits if self._bloom else 0,
+                "negatives": self._negatives,
+                "lookups": self._lookups,
+                "false_positives": self._false_positives,
+            }
+
+
+def get_filter():
+    return current_app.extensions['username_filter']
+
+
+def init_app(app):
+    usernames = UsernameFilter(ttl=app.config['USERNAME_FILTER_TTL'],
+                               error_rate=app.config['USERNAME_FILTER_ERROR_RATE'])
+    app.extensions['username_filter'] = usernames
+    app.extensions.setdefault('metric_sources', {})['username_filter'] = usernames.stats
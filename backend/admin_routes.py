@@ -1,8 +1,26 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
+from decimal import Decimal
 from functools import wraps
+import mysql.connector
+import audit
+import bulk_import
+import cache
+import changes
+import dashboard
 import db
+import feedback_writes
+import pagination
+import recommender
+import search
+import series_loader
+import series_deletion
+import series_stats
+import series_writes
+import streaming
+import viewer_growth
 
 bp = Blueprint('admin', __name__)
+bp.before_request(audit.watch_admin_writes)
 
 # Decorator to protect routes for logged-in admins
 def admin_required(f):
@@ -17,50 +35,37 @@ def admin_required(f):
 @bp.route('/stats', methods=['GET'])
 @admin_required
 def get_dashboard_stats():
+    """Serves the dashboard from memory; ``?refresh=1`` reloads it from MySQL."""
     try:
-        db_conn = db.get_db()
-        cursor = db_conn.cursor(dictionary=True)
-
-        # Total series
-        cursor.execute("SELECT COUNT(*) AS total_series FROM DRY_SERIES")
-        total_series = cursor.fetchone()['total_series']
-
-        # Total viewers
-        cursor.execute("SELECT COUNT(*) AS total_viewers FROM DRY_VIEWER")
-        total_viewers = cursor.fetchone()['total_viewers']
-        
-        # Total feedback
-        cursor.execute("SELECT COUNT(*) AS total_feedback FROM DRY_FEEDBACK")
-        total_feedback = cursor.fetchone()['total_feedback']
-
-        # Feedback in last 7 days
-        cursor.execute("SELECT COUNT(*) AS recent_feedback FROM DRY_FEEDBACK WHERE FDATE >= CURDATE() - INTERVAL 7 DAY")
-        recent_feedback = cursor.fetchone()['recent_feedback']
-        
-        # Top 5 series by average rating
-        cursor.execute("""
-            SELECT s.SNAME, AVG(f.RATE) as avg_rating
-            FROM DRY_FEEDBACK f
-            JOIN DRY_SERIES s ON f.SID = s.SID
-            GROUP BY s.SID
-            ORDER BY avg_rating DESC
-            LIMIT 5
-        """)
-        top_series = cursor.fetchall()
-
-        return jsonify({
-            "total_series": total_series,
-            "total_viewers": total_viewers,
-            "total_feedback": total_feedback,
-            "recent_feedback": recent_feedback,
-            "top_series": top_series
-        })
+        cursor = db.get_db().cursor()
+        return jsonify(dashboard.get_stats().get(cursor, refresh=pagination.flag('refresh')))
     except Exception as e:
         return jsonify({"error": "Database query failed", "details": str(e)}), 500
     finally:
         if 'cursor' in locals() and cursor:
             cursor.close()
 
+@bp.route('/db-pool', methods=['GET'])
+@admin_required
+def get_db_pool_stats():
+    """Returns connection pool usage for monitoring."""
+    return jsonify(db.pool_stats())
+
+@bp.route('/feedback-queue', methods=['GET'])
+@admin_required
+def get_feedback_queue_stats():
+    """Returns write-behind queue depth and flush timings (queue mode only)."""
+    writer = feedback_writes.get_writer()
+    if writer is None:
+        return jsonify({"mode": "sync"})
+    return jsonify({"mode": "queue", **writer.stats()})
+
+@bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Returns hit/miss counters of the in-process caches."""
+    return jsonify(cache.all_stats())
+
 # --- Series CRUD ---
 @bp.route('/series', methods=['GET', 'POST'])
 @admin_required
@@ -72,14 +77,15 @@ def handle_series():
             query = """
                 SELECT 
                     s.SID, s.SNAME, s.NEPISODES, s.ORI_LANG,
-                    AVG(f.RATE) as avg_rating,
+                    MAX({avg_rating}) as avg_rating,
                     GROUP_CONCAT(DISTINCT st.TNAME) as genres
                 FROM DRY_SERIES s
-                LEFT JOIN DRY_FEEDBACK f ON s.SID = f.SID
+                LEFT JOIN DRY_SERIES_STATS ss ON s.SID = ss.SID
                 LEFT JOIN DRY_SERIES_TYPE st ON s.SID = st.SID
+                WHERE {not_deleted}
                 GROUP BY s.SID
                 ORDER BY s.SID DESC
-            """
+            """.format(avg_rating=series_stats.AVG_RATING_SQL, not_deleted=series_deletion.not_deleted('s'))
             cursor.execute(query)
             return jsonify(cursor.fetchall())
         
@@ -104,6 +110,8 @@ def handle_series():
             # This part will be implemented in the PUT endpoint for simplicity of creation
             
             db_conn.commit()
+            changes.bump(changes.SERIES, key=sid)
+            dashboard.get_stats().series_saved(sid, sname)
             return jsonify({"message": "Series created successfully", "sid": sid}), 201
 
     except Exception as e:
@@ -118,69 +126,61 @@ def handle_single_series(sid):
     db_conn = db.get_db()
     cursor = db_conn.cursor(dictionary=True)
     try:
+        if request.method == 'GET':
+            # Series plus associated data for the edit form, in one round trip
+            series = series_loader.load_series(cursor, sid, include_episodes=False)
+            if not series:
+                return jsonify({"error": "Series not found"}), 404
+            return jsonify(series)
+
         # Check if series exists
         cursor.execute("SELECT * FROM DRY_SERIES WHERE SID = %s", (sid,))
         series = cursor.fetchone()
         if not series:
             return jsonify({"error": "Series not found"}), 404
 
-        if request.method == 'GET':
-             # Also fetch associated data for the edit form
-            cursor.execute("SELECT TNAME FROM DRY_SERIES_TYPE WHERE SID = %s", (sid,))
-            series['genres'] = [r['TNAME'] for r in cursor.fetchall()]
-            cursor.execute("SELECT LNAME FROM DRY_SERIES_SUBTITLE WHERE SID = %s", (sid,))
-            series['subtitles'] = [r['LNAME'] for r in cursor.fetchall()]
-            cursor.execute("SELECT LNAME FROM DRY_SERIES_DUBBING WHERE SID = %s", (sid,))
-            series['dubbings'] = [r['LNAME'] for r in cursor.fetchall()]
-            cursor.execute("SELECT CID, RELEASE_DATE FROM DRY_SERIES_RELEASE_COUNTRY WHERE SID = %s", (sid,))
-            series['release_countries'] = cursor.fetchall()
-            return jsonify(series)
-
-        elif request.method == 'PUT':
+        if request.method == 'PUT':
             data = request.get_json()
             sname = data.get('sname')
             nepisodes = data.get('nepisodes')
             ori_lang = data.get('ori_lang')
 
-            genres = data.get('genres', [])
-            subtitles = data.get('subtitles', [])
-            dubbings = data.get('dubbings', [])
-            release_countries = data.get('release_countries', []) # Expected format: [{"cid": 1, "release_date": "YYYY-MM-DD"}]
-
-            db_conn.start_transaction()
-            
-            # 1. Update DRY_SERIES table
-            cursor.execute("UPDATE DRY_SERIES SET SNAME = %s, NEPISODES = %s, ORI_LANG = %s WHERE SID = %s",
-                           (sname, nepisodes, ori_lang, sid))
-
-            # 2. Update Genres (delete all then re-insert)
-            cursor.execute("DELETE FROM DRY_SERIES_TYPE WHERE SID = %s", (sid,))
-            if genres:
-                genre_data = [(sid, g) for g in genres]
-                cursor.executemany("INSERT INTO DRY_SERIES_TYPE (SID, TNAME) VALUES (%s, %s)", genre_data)
-
-            # 3. Update Subtitles
-            cursor.execute("DELETE FROM DRY_SERIES_SUBTITLE WHERE SID = %s", (sid,))
-            if subtitles:
-                subtitle_data = [(sid, l) for l in subtitles]
-                cursor.executemany("INSERT INTO DRY_SERIES_SUBTITLE (SID, LNAME) VALUES (%s, %s)", subtitle_data)
-
-            # 4. Update Dubbings
-            cursor.execute("DELETE FROM DRY_SERIES_DUBBING WHERE SID = %s", (sid,))
-            if dubbings:
-                dubbing_data = [(sid, l) for l in dubbings]
-                cursor.executemany("INSERT INTO DRY_SERIES_DUBBING (SID, LNAME) VALUES (%s, %s)", dubbing_data)
-
-            # 5. Update Release Countries
-            cursor.execute("DELETE FROM DRY_SERIES_RELEASE_COUNTRY WHERE SID = %s", (sid,))
-            if release_countries:
-                country_data = [(sid, rc['cid'], rc['release_date']) for rc in release_countries]
-                cursor.executemany("INSERT INTO DRY_SERIES_RELEASE_COUNTRY (SID, CID, RELEASE_DATE) VALUES (%s, %s, %s)", country_data)
+            associations = {
+                'genres': data.get('genres', []),
+                'subtitles': data.get('subtitles', []),
+                'dubbings': data.get('dubbings', []),
+                'release_countries': data.get('release_countries', []),  # Expected format: [{"cid": 1, "release_date": "YYYY-MM-DD"}]
+            }
 
+            # Only the fields and associations that differ are written
+            write_cursor = db_conn.cursor()
+            try:
+                report = series_writes.update_series(
+                    write_cursor, sid, {'SNAME': sname, 'NEPISODES': nepisodes, 'ORI_LANG': ori_lang}, associations)
+            finally:
+                write_cursor.close()
+            if report is None:  # deleted since the check above
+                db_conn.rollback()
+                return jsonify({"error": "Series not found"}), 404
             db_conn.commit()
-            return jsonify({"message": f"Series {sid} updated successfully."})
+            if report:
+                changes.bump(changes.SERIES, key=sid)
+            if 'fields' in report:
+                dashboard.get_stats().series_saved(sid, sname)
+            return jsonify({"message": f"Series {sid} updated successfully.", "changes": report})
 
         elif request.method == 'DELETE':
+            deleter = series_deletion.get_deleter()
+            if deleter is not None:
+                # Hide the series now; dependent rows are removed in batches in the background
+                series_deletion.request_deletion(cursor, sid, series['SNAME'], session.get('user_id'))
+                db_conn.commit()
+                changes.bump(changes.SERIES, key=sid)
+                dashboard.get_stats().invalidate()
+                deleter.wake()
+                return jsonify({"message": f"Deletion of series {sid} started.",
+                                "deletion": series_deletion.get_progress(cursor, sid)}), 202
+
             try:
                 db_conn.start_transaction()
                 # Must delete from child tables first due to FK constraints
@@ -189,6 +189,7 @@ def handle_single_series(sid):
                 cursor.execute("DELETE FROM DRY_SERIES_DUBBING WHERE SID = %s", (sid,))
                 cursor.execute("DELETE FROM DRY_SERIES_RELEASE_COUNTRY WHERE SID = %s", (sid,))
                 cursor.execute("DELETE FROM DRY_FEEDBACK WHERE SID = %s", (sid,))
+                series_stats.remove_series(cursor, sid)
                 cursor.execute("DELETE FROM DRY_EPISODE WHERE SID = %s", (sid,))
                 # You might want to prevent deleting if a contract exists
                 cursor.execute("DELETE FROM DRY_CONTRACT WHERE SID = %s", (sid,))
@@ -196,6 +197,8 @@ def handle_single_series(sid):
                 # Finally, delete the series itself
                 cursor.execute("DELETE FROM DRY_SERIES WHERE SID = %s", (sid,))
                 db_conn.commit()
+                changes.bump(changes.SERIES, changes.EPISODE, changes.FEEDBACK, key=sid)
+                dashboard.get_stats().invalidate()
                 return jsonify({"message": f"Series {sid} and all related data deleted successfully."})
             except mysql.connector.Error as err:
                  db_conn.rollback()
@@ -207,6 +210,23 @@ def handle_single_series(sid):
     finally:
         cursor.close()
 
+@bp.route('/series/<int:sid>/deletion', methods=['GET'])
+@admin_required
+def get_series_deletion(sid):
+    """Progress of a background series deletion."""
+    try:
+        db_conn = db.get_db()
+        cursor = db_conn.cursor(dictionary=True)
+        deletion = series_deletion.get_progress(cursor, sid)
+        if deletion is None:
+            return jsonify({"error": "No deletion found for this series"}), 404
+        return jsonify(deletion)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if 'cursor' in locals() and cursor:
+            cursor.close()
+
 # Placeholder for other CRUD endpoints...
 
 # --- Episodes CRUD ---
@@ -237,6 +257,7 @@ def handle_episodes(sid):
             """
             cursor.execute(query, (e_num, sdate, edate, nviewers, sid, interruption))
             db_conn.commit()
+            changes.bump(changes.EPISODE, key=sid)
             return jsonify({"message": "Episode added"}), 201
 
     except Exception as e:
@@ -265,11 +286,13 @@ def handle_single_episode(eid):
             """
             cursor.execute(query, (e_num, sdate, edate, nviewers, interruption, eid))
             db_conn.commit()
+            changes.bump(changes.EPISODE)
             return jsonify({"message": "Episode updated"})
 
         elif request.method == 'DELETE':
             cursor.execute("DELETE FROM DRY_EPISODE WHERE EID = %s", (eid,))
             db_conn.commit()
+            changes.bump(changes.EPISODE)
             return jsonify({"message": "Episode deleted"})
     except Exception as e:
         db_conn.rollback()
@@ -446,6 +469,8 @@ def handle_contracts():
                 JOIN DRY_SERIES s ON con.SID = s.SID
                 JOIN DRY_PHOUSE p ON con.PHOUSE_ID = p.PHOUSE_ID
             """
+            if streaming.wants_stream():
+                return streaming.stream_query(query)
             cursor.execute(query)
             return jsonify(cursor.fetchall())
         if request.method == 'POST':
@@ -467,9 +492,26 @@ def handle_contracts():
 @bp.route('/history', methods=['GET'])
 @admin_required
 def list_history():
-    """List admin action history."""
+    """Returns one page of admin action history, newest first.
+
+    Pages are keyed on (ACTION_TS, HID) like /feedback; ``?admin_id=`` and
+    ``?table=`` filter by admin and target table. Entries older than the
+    retention window are in DRY_ADMIN_HISTORY_ARCHIVE.
+    """
     try:
         cursor = db.get_db().cursor(dictionary=True)
+        admin_id = request.args.get('admin_id')
+        table = request.args.get('table')
+
+        conditions = []
+        params = []
+        if admin_id:
+            conditions.append("h.ADMIN_ID = %s")
+            params.append(admin_id)
+        if table:
+            conditions.append("h.TARGET_TABLE = %s")
+            params.append(table.upper())
+
         query = """
             SELECT
                 h.HID,
@@ -479,12 +521,41 @@ def list_history():
                 h.TARGET_TABLE,
                 h.ACTION_TYPE,
                 h.SQL_TEXT
-            FROM DRY_HISTORY h
+            FROM DRY_ADMIN_HISTORY h
             LEFT JOIN DRY_ADMIN a ON h.ADMIN_ID = a.ADMIN_ID
-            ORDER BY h.ACTION_TS DESC, h.HID DESC
         """
-        cursor.execute(query)
-        return jsonify(cursor.fetchall())
+        if streaming.wants_stream():
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY h.ACTION_TS DESC, h.HID DESC"
+            return streaming.stream_query(query, tuple(params))
+
+        limit = pagination.page_size()
+        token = request.args.get('cursor')
+        if token:
+            try:
+                action_ts, last_hid = pagination.decode_cursor(token, 2)
+            except pagination.InvalidCursor as e:
+                return jsonify({"error": str(e)}), 400
+            conditions.append("(h.ACTION_TS < %s OR (h.ACTION_TS = %s AND h.HID < %s))")
+            params.extend([action_ts, action_ts, last_hid])
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # Fetch one extra row to know whether another page exists
+        query += " ORDER BY h.ACTION_TS DESC, h.HID DESC LIMIT %s"
+        params.append(limit + 1)
+
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = pagination.encode_cursor([last['ACTION_TS'], last['HID']])
+        return jsonify({"items": rows, "next_cursor": next_cursor, "has_more": has_more})
     except Exception as e:
         return jsonify({"error": "Failed to load history", "details": str(e)}), 500
     finally:
@@ -522,14 +593,17 @@ def handle_single_contract(cid):
 @bp.route('/viewers', methods=['GET'])
 @admin_required
 def get_viewers():
-    cursor = db.get_db().cursor(dictionary=True)
-    cursor.execute("""
+    query = """
         SELECT v.ACCOUNT, v.USERNAME, v.FNAME, v.LNAME, v.CITY, v.STATE, v.MCHARGE, v.OPEN_DATE, c.CNAME, COUNT(f.SID) as feedback_count
         FROM DRY_VIEWER v
         JOIN DRY_COUNTRY c ON v.CID = c.CID
         LEFT JOIN DRY_FEEDBACK f ON v.ACCOUNT = f.ACCOUNT
         GROUP BY v.ACCOUNT
-    """)
+    """
+    if streaming.wants_stream():
+        return streaming.stream_query(query)
+    cursor = db.get_db().cursor(dictionary=True)
+    cursor.execute(query)
     viewers = cursor.fetchall()
     cursor.close()
     return jsonify(viewers)
@@ -546,10 +620,17 @@ def handle_viewer(account_id):
             return jsonify(viewer)
         elif request.method == 'PUT':
             data = request.get_json()
+            cursor.execute("SELECT MCHARGE, OPEN_DATE FROM DRY_VIEWER WHERE ACCOUNT = %s FOR UPDATE", (account_id,))
+            current = cursor.fetchone()
+            if not current:
+                return jsonify({"error": "Viewer not found"}), 404
             query = "UPDATE DRY_VIEWER SET STREET=%s, CITY=%s, STATE=%s, ZIPCODE=%s, MCHARGE=%s, CID=%s WHERE ACCOUNT = %s"
             params = (data['street'], data['city'], data['state'], data['zipcode'], data['mcharge'], data['cid'], account_id)
             cursor.execute(query, params)
+            viewer_growth.record_charge_change(
+                cursor, current['OPEN_DATE'], Decimal(str(data['mcharge'])) - current['MCHARGE'])
             db_conn.commit()
+            changes.bump(changes.VIEWER, key=account_id)
             return jsonify({"message": "Viewer updated"})
     except Exception as e:
         db_conn.rollback()
@@ -561,6 +642,13 @@ def handle_viewer(account_id):
 @bp.route('/feedback', methods=['GET'])
 @admin_required
 def get_all_feedback():
+    """Returns one page of feedback, newest first.
+
+    Pages are keyed on (FDATE, SID, ACCOUNT) so each page is an index range
+    scan instead of an OFFSET. Pass the returned ``next_cursor`` back as
+    ``?cursor=`` to get the following page, and ``?include_total=1`` to also
+    count all matching rows.
+    """
     db_conn = db.get_db()
     cursor = db_conn.cursor(dictionary=True)
     try:
@@ -569,13 +657,8 @@ def get_all_feedback():
         rating = request.args.get('rating')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        limit = pagination.page_size()
 
-        query = """
-            SELECT f.*, s.SNAME, v.USERNAME
-            FROM DRY_FEEDBACK f
-            JOIN DRY_SERIES s ON f.SID = s.SID
-            JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
-        """
         conditions = []
         params = []
         if sid:
@@ -590,12 +673,76 @@ def get_all_feedback():
         if end_date:
             conditions.append("f.FDATE <= %s")
             params.append(end_date)
-        
+
+        total = None
+        if pagination.flag('include_total'):
+            count_query = "SELECT COUNT(*) AS total FROM DRY_FEEDBACK f"
+            if conditions:
+                count_query += " WHERE " + " AND ".join(conditions)
+            cursor.execute(count_query, tuple(params))
+            total = cursor.fetchone()['total']
+
+        token = request.args.get('cursor')
+        if token:
+            try:
+                fdate, last_sid, last_account = pagination.decode_cursor(token, 3)
+            except pagination.InvalidCursor as e:
+                return jsonify({"error": str(e)}), 400
+            conditions.append(
+                "(f.FDATE < %s OR (f.FDATE = %s AND (f.SID < %s OR (f.SID = %s AND f.ACCOUNT < %s))))"
+            )
+            params.extend([fdate, fdate, last_sid, last_sid, last_account])
+
+        query = """
+            SELECT f.*, s.SNAME, v.USERNAME
+            FROM DRY_FEEDBACK f
+            JOIN DRY_SERIES s ON f.SID = s.SID
+            JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
+        """
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        
+        # Fetch one extra row to know whether another page exists
+        query += " ORDER BY f.FDATE DESC, f.SID DESC, f.ACCOUNT DESC LIMIT %s"
+        params.append(limit + 1)
+
         cursor.execute(query, tuple(params))
-        return jsonify(cursor.fetchall())
+        rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = pagination.encode_cursor([last['FDATE'], last['SID'], last['ACCOUNT']])
+
+        result = {"items": rows, "next_cursor": next_cursor, "has_more": has_more}
+        if total is not None:
+            result["total"] = total
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+
+
+@bp.route('/feedback/search', methods=['GET'])
+@admin_required
+def search_feedback():
+    """Ranked prefix search over feedback text: ``?q=&sid=&limit=&cursor=``."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"error": "Query parameter q is required"}), 400
+    limit = pagination.page_size()
+    try:
+        offset = pagination.decode_offset(request.args['cursor']) if request.args.get('cursor') else 0
+    except pagination.InvalidCursor:
+        return jsonify({"error": "Malformed cursor"}), 400
+
+    cursor = db.get_db().cursor(dictionary=True)
+    try:
+        rows, has_more = search.search_feedback(cursor, q, limit, offset, sid=request.args.get('sid'))
+        next_cursor = pagination.encode_cursor([offset + limit]) if has_more else None
+        return jsonify({"items": rows, "next_cursor": next_cursor, "has_more": has_more})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -612,13 +759,24 @@ def delete_feedback():
     if not account or not sid:
         return jsonify({"error": "account and sid are required"}), 400
     
+    writer = feedback_writes.get_writer()
+    if writer is not None:
+        writer.discard(sid, account)
+
     db_conn = db.get_db()
     cursor = db_conn.cursor()
     try:
+        cursor.execute("SELECT RATE, FDATE FROM DRY_FEEDBACK WHERE ACCOUNT = %s AND SID = %s FOR UPDATE", (account, sid))
+        existing = cursor.fetchone()
+        if not existing:
+            return jsonify({"error": "Feedback not found"}), 404
+
         cursor.execute("DELETE FROM DRY_FEEDBACK WHERE ACCOUNT = %s AND SID = %s", (account, sid))
+        series_stats.apply_change(cursor, sid, old_rate=existing[0])
         db_conn.commit()
-        if cursor.rowcount == 0:
-            return jsonify({"error": "Feedback not found"}), 404
+        changes.bump(changes.FEEDBACK, key=sid)
+        dashboard.get_stats().feedback_changed(sid, old_rate=existing[0], old_date=existing[1])
+        recommender.get_recommender().rating_changed(int(account), int(sid), None)
         return jsonify({"message": "Feedback deleted"})
     except Exception as e:
         db_conn.rollback()
@@ -626,26 +784,50 @@ def delete_feedback():
     finally:
         cursor.close()
 
-#————————————————XYK——————————————————————
-@bp.route('/viewer-growth', methods=['GET'])
+# --- Bulk import ---
+@bp.route('/import/<entity>', methods=['POST'])
 @admin_required
-def viewer_growth():
+def bulk_import_data(entity):
+    """Bulk-loads series, episodes or feedback from a CSV or NDJSON upload.
+
+    The data is either the raw request body or a multipart ``file`` field;
+    ``?format=csv|ndjson`` and ``?batch_size=`` control parsing and the
+    number of rows per transaction.
+    """
+    if entity not in bulk_import.LOADERS:
+        return jsonify({"error": f"Unknown entity '{entity}'"}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
     try:
-        db_conn = db.get_db()
-        cursor = db_conn.cursor(dictionary=True)
+        batch_size = int(request.args.get('batch_size', current_app.config['BULK_IMPORT_BATCH_SIZE']))
+    except ValueError:
+        return jsonify({"error": "batch_size must be an integer"}), 400
+    batch_size = max(1, min(batch_size, current_app.config['BULK_IMPORT_MAX_BATCH_SIZE']))
 
-        query = """
-            SELECT 
-                DATE_FORMAT(OPEN_DATE, '%Y-%m') AS month,
-                COUNT(*) AS new_viewers
-            FROM DRY_VIEWER
-            GROUP BY DATE_FORMAT(OPEN_DATE, '%Y-%m')
-            ORDER BY month
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
 
-        return jsonify(data)
+    try:
+        report = bulk_import.run_import(db.get_db(), entity, bulk_import.iter_records(stream, fmt), batch_size)
+        return jsonify(report.to_dict())
+    except Exception as e:
+        return jsonify({"error": "Import failed", "details": str(e)}), 500
+
+
+#————————————————XYK——————————————————————
+@bp.route('/viewer-growth', methods=['GET'])
+@admin_required
+def get_viewer_growth():
+    """New viewers per ?granularity=day|week|month (default month), optionally within ?from=&to=."""
+    try:
+        granularity, start, end = viewer_growth.parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        cursor = db.get_db().cursor(dictionary=True)
+        return jsonify(viewer_growth.viewer_growth(cursor, granularity, start, end))
 
     except Exception as e:
         return jsonify({"error": "Failed to fetch viewer growth", "details": str(e)}), 500
@@ -657,40 +839,15 @@ def viewer_growth():
 
 @bp.route('/revenue-growth', methods=['GET'])
 @admin_required
-def revenue_growth():
+def get_revenue_growth():
+    """New monthly charges per bucket and their running total; same parameters as viewer-growth."""
     try:
-        db_conn = db.get_db()
-        cursor = db_conn.cursor(dictionary=True)
-
-        query = """
-            WITH monthly AS (
-                SELECT
-                    DATE_FORMAT(OPEN_DATE, '%Y-%m') AS month,
-                    SUM(MCHARGE) AS revenue_new
-                FROM DRY_VIEWER
-                GROUP BY DATE_FORMAT(OPEN_DATE, '%Y-%m')
-            ),
-            cumulative AS (
-                SELECT
-                    m1.month,
-                    (SELECT SUM(m2.revenue_new)
-                     FROM monthly m2
-                     WHERE m2.month <= m1.month
-                    ) AS revenue_total
-                FROM monthly m1
-            )
-            SELECT 
-                m.month,
-                m.revenue_new,
-                c.revenue_total
-            FROM monthly m
-            JOIN cumulative c ON m.month = c.month
-            ORDER BY m.month
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
-
-        return jsonify(data)
+        granularity, start, end = viewer_growth.parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        cursor = db.get_db().cursor(dictionary=True)
+        return jsonify(viewer_growth.revenue_growth(cursor, granularity, start, end))
 
     except Exception as e:
         return jsonify({"error": "Failed to fetch revenue growth", "details": str(e)}), 500
@@ -698,4 +855,3 @@ def revenue_growth():
     finally:
         if 'cursor' in locals():
             cursor.close()
-#######————————————————XYK——————————————————————
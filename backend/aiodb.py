@@ -0,0 +1,100 @@
+"""Async MySQL access for the ASGI serving mode (see asgi.py).
+
+``AsyncPool`` wraps an aiomysql pool of up to ``ASYNC_DB_POOL_SIZE``
+connections. The async handlers only read, so connections run in
+autocommit mode and every statement sees the latest committed data. Waiting
+for a connection is bounded by ``DB_POOL_TIMEOUT`` and raises
+``db.PoolTimeout`` like the sync pool. Statements are counted into a
+``db.QueryStats`` so the request metrics stay comparable with the sync path.
+"""
+import asyncio
+import time
+
+import aiomysql
+
+import db
+
+
+class AsyncPool:
+
+    def __init__(self, config):
+        self.connect_args = dict(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            db=config['MYSQL_DB'],
+            port=config['MYSQL_PORT'],
+        )
+        self.size = config['ASYNC_DB_POOL_SIZE']
+        self.recycle = config['DB_POOL_RECYCLE'] or -1
+        self.timeout = config['DB_POOL_TIMEOUT']
+        self._pool = None
+        self._lock = None  # created on the serving event loop
+
+    async def open(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    minsize=0, maxsize=self.size, pool_recycle=self.recycle,
+                    autocommit=True, **self.connect_args)
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    async def _acquire(self):
+        if self._pool is None:
+            await self.open()
+        try:
+            return await asyncio.wait_for(self._pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise db.PoolTimeout(f"No async database connection available within {self.timeout}s")
+
+    async def fetch(self, stats, sql, params=None, one=False):
+        """Runs a query on its own connection and returns dict rows (or the first row)."""
+        conn = await self._acquire()
+        try:
+            start = time.perf_counter()
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                if one:
+                    result = await cursor.fetchone()
+                    nrows = result is not None
+                else:
+                    result = list(await cursor.fetchall())
+                    nrows = len(result)
+            stats.queries += 1
+            stats.seconds += time.perf_counter() - start
+            stats.rows += nrows
+            return result
+        finally:
+            self._pool.release(conn)
+
+    async def callproc(self, stats, name, args=()):
+        """Calls a stored procedure and returns the rows of its last result set."""
+        conn = await self._acquire()
+        try:
+            start = time.perf_counter()
+            rows = []
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.callproc(name, args)
+                while True:
+                    if cursor.description:
+                        rows = await cursor.fetchall()
+                    if not await cursor.nextset():
+                        break
+            stats.queries += 1
+            stats.seconds += time.perf_counter() - start
+            stats.rows += len(rows)
+            return list(rows)
+        finally:
+            self._pool.release(conn)
+
+    def stats(self):
+        if self._pool is None:
+            return {"size": self.size, "open": 0, "idle": 0}
+        return {"size": self.size, "open": self._pool.size, "idle": self._pool.freesize}
@@ -1,12 +1,30 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from config import Config
+import accounts
+import audit
+import bulk_import
+import cache
+import dashboard
 import db
+import facets
+import feedback_writes
+import http_cache
+import json_provider
+import metrics
+import passwords
+import recommender
+import report_jobs
+import search
+import series_deletion
+import series_stats
+import viewer_growth
 import os
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    json_provider.init_app(app)
 
     # Enable CORS - support both local development and Docker environment
     allowed_origins = [
@@ -21,10 +39,37 @@ def create_app():
     if custom_origin:
         allowed_origins.append(custom_origin)
     
+    app.config['CORS_ORIGINS'] = allowed_origins  # also used by the async handlers in asgi.py
     CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": allowed_origins}})
 
     # Initialize DB
     db.init_app(app)
+    metrics.init_app(app)
+    passwords.init_app(app)
+    accounts.init_app(app)
+    audit.init_app(app)
+    series_stats.init_app(app)
+    viewer_growth.init_app(app)
+    bulk_import.init_app(app)
+    dashboard.init_app(app)
+    recommender.init_app(app)
+    series_deletion.init_app(app)
+    feedback_writes.init_app(app)
+    # The facet index subscribes first so it is marked dirty before the
+    # catalog cache is cleared
+    facets.init_app(app)
+    cache.init_app(app)
+    search.init_app(app)
+    report_jobs.init_app(app)
+    http_cache.init_app(app)
+
+    @app.errorhandler(db.PoolTimeout)
+    def handle_pool_timeout(e):
+        return jsonify({"error": "Database is busy, please retry", "details": str(e)}), 503
+
+    @app.errorhandler(passwords.HasherBusy)
+    def handle_hasher_busy(e):
+        return jsonify({"error": "Too many logins in progress, please retry", "details": str(e)}), 503, {"Retry-After": "1"}
 
     # Register blueprints
     from auth_routes import bp as auth_bp
@@ -0,0 +1,218 @@
+"""ASGI entry point with async handlers for the hot viewer endpoints.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+``GET /api/viewer/series`` (unfiltered), ``/series/<sid>``,
+``/series/<sid>/feedback`` and ``/recommendations`` run on the event loop
+with aiomysql (aiodb.py), so a process can keep hundreds of them in flight
+while they wait on MySQL; the three independent queries of the feedback
+endpoint run concurrently, and recommendations come from the in-memory
+model of recommender.py once it is built. Every other request, including
+filtered catalog searches, is passed to the Flask app, which runs on a pool
+of ``ASGI_WSGI_THREADS`` threads exactly as under a WSGI server.
+
+The async handlers read the same signed session cookie, share the Flask
+app's catalog cache and /metrics registry and encode with ``app.json``, so
+their responses match the WSGI ones. They do not run Flask's request hooks.
+The catalog, detail and recommendation handlers answer conditional GETs
+with the same ETags and remembered validators as the Flask views
+(http_cache.py).
+"""
+import asyncio
+import re
+import time
+from http.cookies import SimpleCookie
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+
+import aiodb
+import changes
+import db
+import http_cache
+import series_deletion
+import series_loader
+import series_stats
+import viewer_routes
+from app import create_app
+
+flask_app = create_app()
+wsgi_app = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])
+pool = aiodb.AsyncPool(flask_app.config)
+flask_app.extensions.setdefault('metric_sources', {})['async_db_pool'] = pool.stats
+
+_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+_catalog_lock = None  # one catalog load at a time, created on the event loop
+
+
+class Request:
+
+    def __init__(self, scope, params):
+        self.scope = scope
+        self.params = params
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self.stats = db.QueryStats()
+        session = self.session()
+        self.viewer_id = session['user_id'] if session.get('role') == 'viewer' else None
+
+    def session(self):
+        cookie = SimpleCookie(self.headers.get('cookie', ''))
+        morsel = cookie.get(flask_app.config['SESSION_COOKIE_NAME'])
+        if morsel is None:
+            return {}
+        try:
+            return _serializer.loads(morsel.value,
+                                     max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+
+
+async def series_list(request):
+    global _catalog_lock
+    catalog = flask_app.extensions['caches']['series_catalog']
+    generation = catalog.generation
+    hit, rows = catalog.get(None)
+    if hit:
+        return 200, rows
+    if _catalog_lock is None:
+        _catalog_lock = asyncio.Lock()
+    async with _catalog_lock:
+        # Loaded by the request we waited for?
+        hit, rows = catalog.get(None)
+        if not hit:
+            rows = await pool.fetch(request.stats, viewer_routes.SERIES_LIST_SQL)
+            catalog.set(None, rows, generation)
+    return 200, rows
+
+
+async def series_detail(request):
+    sid = request.params['sid']
+    series = await pool.fetch(request.stats, series_loader.series_query(), (sid,), one=True)
+    if not series:
+        return 404, {"error": "Series not found"}
+    return 200, series_loader.decode_series(series)
+
+
+async def series_feedback(request):
+    sid = request.params['sid']
+    visible, feedback_list, stats, user_feedback = await asyncio.gather(
+        pool.fetch(request.stats, series_deletion.visible_sql(), (sid,), one=True),
+        pool.fetch(request.stats, viewer_routes.FEEDBACK_LIST_SQL, (sid,)),
+        pool.fetch(request.stats, series_stats.STATS_SQL, (sid,), one=True),
+        pool.fetch(request.stats, viewer_routes.USER_FEEDBACK_SQL, (sid, request.viewer_id), one=True),
+    )
+    if not visible:
+        return 404, {"error": "Series not found"}
+    return 200, {
+        "feedback_list": feedback_list,
+        "stats": series_stats.stats_payload(stats),
+        "user_feedback": user_feedback,
+    }
+
+
+async def recommendations(request):
+    rows = flask_app.extensions['recommender'].recommend(request.viewer_id)
+    if rows is None:
+        rows = await pool.callproc(request.stats, 'GetTopSeriesByRating', (5,))
+    return 200, rows
+
+
+# (pattern, handler, route label as in the Flask url map, tables for ETags,
+# ETags per viewer); GET only, viewers only
+ROUTES = [
+    (re.compile(r'/api/viewer/series'), series_list, '/api/viewer/series',
+     (changes.SERIES, changes.EPISODE, changes.FEEDBACK), False),
+    (re.compile(r'/api/viewer/series/(?P<sid>\d+)'), series_detail, '/api/viewer/series/<int:sid>',
+     (changes.SERIES, changes.EPISODE), False),
+    (re.compile(r'/api/viewer/series/(?P<sid>\d+)/feedback'), series_feedback,
+     '/api/viewer/series/<int:sid>/feedback', (), False),
+    (re.compile(r'/api/viewer/recommendations'), recommendations, '/api/viewer/recommendations',
+     (changes.SERIES, changes.FEEDBACK, changes.RECOMMENDER), True),
+]
+
+
+def _match(scope):
+    # Filtered catalog requests need the facet index, which lives in Flask
+    if scope['method'] != 'GET' or scope['query_string']:
+        return None
+    for pattern, handler, route, tables, per_viewer in ROUTES:
+        match = pattern.fullmatch(scope['path'])
+        if match:
+            params = {k: int(v) for k, v in match.groupdict().items()}
+            return handler, route, params, tables, per_viewer
+    return None
+
+
+def _cors_headers(request):
+    origin = request.headers.get('origin')
+    if origin and origin in flask_app.config['CORS_ORIGINS']:
+        return [(b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin')]
+    return []
+
+
+def _validator_headers(etag, last_modified):
+    headers = http_cache.validator_headers(etag, last_modified, 'private, no-cache')
+    return [(k.lower().encode(), v.encode('latin-1')) for k, v in headers.items()]
+
+
+async def _handle(scope, send, handler, route, params, tables, per_viewer):
+    started = time.perf_counter()
+    request = Request(scope, params)
+    # Same key as in Flask (request.full_path), so both share remembered ETags
+    key = http_cache.cache_key(f"{scope['path']}?", request.viewer_id if per_viewer else None)
+    validators = flask_app.extensions['http_validators']
+    if_none_match = request.headers.get('if-none-match')
+    validator_headers = []
+    known = validators.lookup(key, tables) if tables else None
+
+    if request.viewer_id is None:
+        status, payload = 403, {"error": "Access denied. Viewer role required."}
+    elif known and http_cache.not_modified(if_none_match, known[0]):
+        status, payload, validator_headers = 304, None, _validator_headers(*known)
+    else:
+        versions = changes.version(*tables)
+        try:
+            status, payload = await handler(request)
+        except db.PoolTimeout as e:
+            status, payload = 503, {"error": "Database is busy, please retry", "details": str(e)}
+        except Exception as e:
+            flask_app.logger.exception("Async handler for %s failed", route)
+            status, payload = 500, {"error": "Database query failed", "details": str(e)}
+
+    body = b'' if status == 304 else f"{flask_app.json.dumps(payload)}\n".encode()
+    if status == 200 and tables:
+        etag, last_modified = validators.remember(key, versions, tables, body)
+        validator_headers = _validator_headers(etag, last_modified)
+        if http_cache.not_modified(if_none_match, etag):
+            status, body = 304, b''
+    headers = validator_headers + _cors_headers(request)
+    if status != 304:
+        headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+    request_metrics = flask_app.extensions.get('request_metrics')
+    if request_metrics is not None:
+        request_metrics.observe('GET', route, status, time.perf_counter() - started, request.stats, len(body))
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await pool.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    matched = _match(scope) if scope['type'] == 'http' else None
+    if matched is None:
+        return await wsgi_app(scope, receive, send)
+    await _handle(scope, send, *matched)
@@ -0,0 +1,209 @@
+"""Admin audit log: every committed admin write, recorded in DRY_ADMIN_HISTORY.
+
+Write requests (anything but GET / HEAD / OPTIONS) of a logged-in admin
+watch their request connection (``db.InstrumentedConnection.on_commit``).
+Each INSERT / UPDATE / DELETE that gets committed becomes one history row:
+admin, commit time, target table, action and the statement text with its
+parameters (cut to ``AUDIT_SQL_MAX`` characters). Rolled back statements
+are not recorded.
+
+Rows are not written on the request path. They go to an in-process buffer
+that a background thread flushes with multi-row INSERTs every
+``AUDIT_FLUSH_MS`` milliseconds, or as soon as ``AUDIT_FLUSH_ROWS`` rows are
+pending. Buffered rows are lost if the process is killed before the next
+flush (they are flushed on normal interpreter exit). Flushes that fail are
+retried; when more than ``AUDIT_QUEUE_MAX`` rows are pending new ones are
+dropped and counted in ``rows_dropped``.
+
+Writes to DERIVED_TABLES are maintained by the application, not chosen by
+the admin, and are left out.
+"""
+import atexit
+import datetime
+import logging
+import re
+import threading
+import time
+
+from flask import current_app, request, session
+
+import db
+
+logger = logging.getLogger(__name__)
+
+DERIVED_TABLES = frozenset({'DRY_SERIES_STATS', 'DRY_VIEWER_DAILY_STATS', 'DRY_ADMIN_HISTORY'})
+
+_TARGET = re.compile(
+    r"^\s*(INSERT|REPLACE|UPDATE|DELETE)\b(?:\s+(?:LOW_PRIORITY|IGNORE|QUICK|INTO|FROM))*\s+`?(\w+)`?",
+    re.IGNORECASE,
+)
+
+INSERT_SQL = """
+    INSERT INTO DRY_ADMIN_HISTORY (ADMIN_ID, ACTION_TS, TARGET_TABLE, ACTION_TYPE, SQL_TEXT)
+    VALUES {rows}
+"""
+
+
+def parse(statement):
+    """Returns ``(action, table)`` of a write statement, or None if unrecognized."""
+    match = _TARGET.match(statement)
+    if match is None:
+        return None
+    action = match.group(1).upper()
+    return 'INSERT' if action == 'REPLACE' else action, match.group(2).upper()
+
+
+class AuditLog:
+    """Buffer of history rows, flushed to DRY_ADMIN_HISTORY by a background thread."""
+
+    def __init__(self, pool, flush_ms=1000, flush_rows=500, max_pending=10000, sql_max=4000):
+        self.pool = pool
+        self.flush_interval = flush_ms / 1000
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+        self.sql_max = sql_max
+
+        self._pending = []  # (admin_id, action_ts, table, action, sql_text)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+
+        self._flushes = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._flush_failures = 0
+        self._flush_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def after_fork(self):
+        """Restarts the flush thread in a forked child, which does not inherit it."""
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+
+    def record(self, admin_id, statements):
+        """Buffers the history rows of one committed transaction of ``admin_id``."""
+        now = datetime.datetime.now().replace(microsecond=0)
+        rows = []
+        for statement in statements:
+            statement = statement.strip()
+            parsed = parse(statement)
+            if parsed is None or parsed[1] in DERIVED_TABLES:
+                continue
+            if len(statement) > self.sql_max:
+                statement = statement[:self.sql_max - 3] + '...'
+            rows.append((admin_id, now, parsed[1], parsed[0], statement))
+        if not rows:
+            return
+        with self._cond:
+            room = max(0, self.max_pending - len(self._pending))
+            if len(rows) > room:
+                self._rows_dropped += len(rows) - room
+                logger.warning("Audit buffer full, dropped %d history rows", len(rows) - room)
+                rows = rows[:room]
+            self._pending.extend(rows)
+            if len(self._pending) >= self.flush_rows:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._pending) < self.flush_rows:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped and not self._pending:
+                    return
+            if not self.flush() and not self._stopped:
+                # MySQL is unavailable: wait for the next interval
+                with self._cond:
+                    self._cond.wait(self.flush_interval)
+
+    def flush(self):
+        """Writes everything pending; returns False if it had to be requeued."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            start = time.monotonic()
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Audit flush failed, %d history rows requeued", len(batch))
+                with self._cond:
+                    self._flush_failures += 1
+                    room = max(0, self.max_pending - len(self._pending))
+                    self._rows_dropped += max(0, len(batch) - room)
+                    # Oldest first; newer rows recorded meanwhile stay behind them
+                    self._pending[:0] = batch[-room:] if room else []
+                return False
+            with self._cond:
+                self._flushes += 1
+                self._rows_written += len(batch)
+                self._flush_seconds += time.monotonic() - start
+            return True
+
+    def _write(self, batch):
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(batch), self.flush_rows):
+                chunk = batch[start:start + self.flush_rows]
+                cursor.execute(INSERT_SQL.format(rows=', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk))),
+                               tuple(v for row in chunk for v in row))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            self.pool.release(conn)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "flushes": self._flushes,
+                "rows_written": self._rows_written,
+                "rows_dropped": self._rows_dropped,
+                "flush_failures": self._flush_failures,
+                "flush_seconds_total": round(self._flush_seconds, 6),
+            }
+
+
+def get_audit_log():
+    return current_app.extensions['audit_log']
+
+
+def watch_admin_writes():
+    """before_request hook of the admin blueprint."""
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or session.get('role') != 'admin':
+        return
+    admin_id = session.get('user_id')
+    log = get_audit_log()
+    db.get_db().on_commit = lambda statements: log.record(admin_id, statements)
+
+
+def init_app(app):
+    log = AuditLog(app.extensions['db_pool'],
+                   flush_ms=app.config['AUDIT_FLUSH_MS'],
+                   flush_rows=app.config['AUDIT_FLUSH_ROWS'],
+                   max_pending=app.config['AUDIT_QUEUE_MAX'],
+                   sql_max=app.config['AUDIT_SQL_MAX'])
+    log.start()
+    app.extensions['audit_log'] = log
+    app.extensions.setdefault('fork_handlers', []).append(log.after_fork)
+    app.extensions.setdefault('metric_sources', {})['audit_log'] = log.stats
@@ -1,6 +1,14 @@
-from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, current_app, request, jsonify, session
+from mysql.connector import errorcode
+import mysql.connector
+from config import Config
+import accounts
+import changes
+import dashboard
 import db
+import http_cache
+import passwords
+import viewer_growth
 import datetime
 
 bp = Blueprint('auth', __name__)
@@ -25,21 +33,15 @@ def register():
 
     db_conn = db.get_db()
     cursor = db_conn.cursor()
+    try:
+        # Check if username already exists in DRY_VIEWER or DRY_ADMIN
+        if accounts.username_taken(cursor, username):
+            return jsonify({"error": "Username already exists"}), 409
 
-    # Check if username already exists in DRY_VIEWER or DRY_ADMIN
-    cursor.execute("SELECT USERNAME FROM DRY_VIEWER WHERE USERNAME = %s", (username,))
-    if cursor.fetchone():
-        return jsonify({"error": "Username already exists"}), 409
-    
-    cursor.execute("SELECT USERNAME FROM DRY_ADMIN WHERE USERNAME = %s", (username,))
-    if cursor.fetchone():
-        return jsonify({"error": "Username already exists"}), 409
-
-    # Hash password
-    password_hash = generate_password_hash(password, method="pbkdf2:sha256", salt_length=16)
+        # Hash password
+        password_hash = passwords.get_hasher().hash(password)
 
-    # Insert new viewer
-    try:
+        # Insert new viewer
         open_date = datetime.date.today().strftime('%Y-%m-%d')
         mcharge = 9.99  # Default monthly charge
 
@@ -48,10 +50,14 @@ def register():
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         cursor.execute(query, (username, password_hash, fname, lname, street, city, state, zipcode, open_date, mcharge, cid, security_question, security_answer))
+        user_id = cursor.lastrowid
+        viewer_growth.record_viewer(cursor, open_date, mcharge)
         db_conn.commit()
+        changes.bump(changes.VIEWER, key=user_id)
+        accounts.get_filter().add(username)
+        dashboard.get_stats().viewer_added()
         
         # Optionally, log the user in automatically after registration
-        user_id = cursor.lastrowid
         session['user_id'] = user_id
         session['role'] = 'viewer'
         session['username'] = username
@@ -67,12 +73,37 @@ def register():
             }
         }), 201
 
+    except mysql.connector.IntegrityError as e:
+        db_conn.rollback()
+        # Registered concurrently (possibly by another worker process)
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return jsonify({"error": "Username already exists"}), 409
+        return jsonify({"error": "Database error during registration", "details": str(e)}), 500
+    except passwords.HasherBusy:
+        raise
     except Exception as e:
         db_conn.rollback()
         return jsonify({"error": "Database error during registration", "details": str(e)}), 500
     finally:
         cursor.close()
 
+@bp.route('/username-available', methods=['GET'])
+def username_available():
+    """Tells the signup form whether a username is free (advisory; register re-checks)."""
+    username = request.args.get('username', '').strip()
+    if not username:
+        return jsonify({"error": "username is required"}), 400
+    try:
+        db_conn = db.get_db()
+        cursor = db_conn.cursor()
+        try:
+            available = not accounts.username_taken(cursor, username)
+        finally:
+            cursor.close()
+        return jsonify({"username": username, "available": available})
+    except Exception as e:
+        return jsonify({"error": "Database query failed", "details": str(e)}), 500
+
 @bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -85,19 +116,16 @@ def login():
     db_conn = db.get_db()
     cursor = db_conn.cursor(dictionary=True)
 
-    # Try to find user in DRY_ADMIN first
-    cursor.execute("SELECT ADMIN_ID, USERNAME, PASSWORD_HASH, FNAME, LNAME FROM DRY_ADMIN WHERE USERNAME = %s", (username,))
-    user = cursor.fetchone()
-    role = 'admin'
-
-    if not user:
-        # If not in admin, try DRY_VIEWER
-        cursor.execute("SELECT ACCOUNT, USERNAME, PASSWORD_HASH, FNAME, LNAME FROM DRY_VIEWER WHERE USERNAME = %s", (username,))
-        user = cursor.fetchone()
-        role = 'viewer'
+    # Admins and viewers in one query, admin first
+    user = accounts.find_account(cursor, username)
+    cursor.close()
 
-    if user and check_password_hash(user['PASSWORD_HASH'], password):
-        user_id = user.get('ADMIN_ID') or user.get('ACCOUNT')
+    hasher = passwords.get_hasher()
+    if user and hasher.verify(user['PASSWORD_HASH'], password):
+        user_id = user['USER_ID']
+        role = user['ROLE']
+        if hasher.needs_rehash(user['PASSWORD_HASH']):
+            _rehash(db_conn, role, user_id, user['PASSWORD_HASH'], password)
         display_name = f"{user['FNAME']} {user['LNAME']}"
         
         session.clear()
@@ -119,6 +147,26 @@ def login():
     return jsonify({"error": "Invalid username or password"}), 401
 
 
+def _rehash(db_conn, role, user_id, old_hash, password):
+    """Stores the password hashed with the current parameters; skipped when busy."""
+    table, key = ('DRY_ADMIN', 'ADMIN_ID') if role == 'admin' else ('DRY_VIEWER', 'ACCOUNT')
+    try:
+        new_hash = passwords.get_hasher().hash(password)
+    except passwords.HasherBusy:
+        return
+    cursor = db_conn.cursor()
+    try:
+        # Only if the password was not changed in the meantime
+        cursor.execute(f"UPDATE {table} SET PASSWORD_HASH = %s WHERE {key} = %s AND PASSWORD_HASH = %s",
+                       (new_hash, user_id, old_hash))
+        db_conn.commit()
+    except Exception as e:
+        db_conn.rollback()
+        current_app.logger.warning("Password rehash for %s %s failed: %s", role, user_id, e)
+    finally:
+        cursor.close()
+
+
 @bp.route('/me', methods=['GET'])
 def me():
     if 'user_id' in session:
@@ -139,6 +187,7 @@ def logout():
     return jsonify({"message": "Logout successful"}), 200
 
 @bp.route('/countries', methods=['GET'])
+@http_cache.conditional(changes.COUNTRY, cache_control=f"public, max-age={Config.COUNTRIES_MAX_AGE}")
 def get_countries():
     """Returns a list of all countries."""
     try:
@@ -0,0 +1,5 @@
+"""Performance benchmarks for the backend.
+
+Run from the ``backend`` directory, e.g. ``python -m benchmarks.series_detail``.
+Database settings are read from the same environment/.env as the app.
+"""
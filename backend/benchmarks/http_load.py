@@ -0,0 +1,301 @@
+"""HTTP-level load test of the API through Flask, JSON encoding and sessions.
+
+Usage: python -m benchmarks.http_load [--mix mixed] [--client test|wsgi]
+                                      [--url http://host:5000] [--concurrency 8]
+                                      [--duration 30] [--json out.json]
+                                      [--compare baseline.json]
+
+Seed the data first with ``python -m benchmarks.seed``. ``--client test``
+drives the app in process through the Flask test client (no network);
+``--client wsgi`` starts the app in a threaded Werkzeug server on a free
+port and sends real HTTP requests, and ``--url`` targets an already running
+server (e.g. gunicorn) instead. Every worker thread logs in with its own
+session. ``--json`` saves the results so runs on different commits can be
+compared with ``--compare``.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import percentile, print_table
+from benchmarks.seed import ADMIN_USERNAME, DEFAULT_PASSWORD, VIEWER_PREFIX
+
+SEARCH_TERMS = ('river', 'mid', 'empire', 'glass storm', 'sh')
+
+# name -> (weight, path template); {sid} and {q} are filled in per request
+VIEWER_MIX = {
+    'viewer series list': (25, '/api/viewer/series'),
+    'viewer series detail': (30, '/api/viewer/series/{sid}'),
+    'viewer series feedback': (20, '/api/viewer/series/{sid}/feedback'),
+    'viewer search': (10, '/api/viewer/search?q={q}'),
+    'viewer recommendations': (10, '/api/viewer/recommendations'),
+    'viewer my feedback': (5, '/api/viewer/my-feedback'),
+}
+ADMIN_MIX = {
+    'admin stats': (20, '/api/admin/stats'),
+    'admin series list': (25, '/api/admin/series'),
+    'admin series detail': (25, '/api/admin/series/{sid}'),
+    'admin feedback page': (20, '/api/admin/feedback?limit=50'),
+    'admin viewers': (10, '/api/admin/viewers'),
+}
+REPORTS_MIX = {f'report q{n}': (1, f'/api/admin/reports/q{n}') for n in range(1, 7)}
+CATALOG_MIX = {'viewer series list': (1, '/api/viewer/series')}
+
+MIXES = {
+    'viewer': ('viewer', VIEWER_MIX),
+    'admin': ('admin', ADMIN_MIX),
+    'reports': ('admin', REPORTS_MIX),
+    'catalog': ('viewer', CATALOG_MIX),
+}
+# Mixed traffic: share of workers per mix
+MIXED = (('viewer', 0.7), ('admin', 0.2), ('reports', 0.1))
+
+
+class TestClientSession:
+    """Sends requests through the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, len(response.get_data())
+
+    def get_json(self, path):
+        return self.client.get(path).get_json()
+
+
+class HttpSession:
+    """Sends real HTTP requests, keeping the session cookie."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as err:
+            return err.code, len(err.read())
+
+    def get_json(self, path):
+        with self.opener.open(self.base_url + path, timeout=60) as response:
+            return json.load(response)
+
+
+def login(session, username, password):
+    status, _ = session.request('POST', '/api/login', {'username': username, 'password': password})
+    if status != 200:
+        raise SystemExit(f"Login as {username} failed with HTTP {status}; run python -m benchmarks.seed first")
+
+
+def fetch_sids(session, password):
+    """Reads the series ids to request from the admin series list."""
+    login(session, ADMIN_USERNAME, password)
+    return [row['SID'] for row in session.get_json('/api/admin/series')] or [0]
+
+
+def worker(make_session, mix, username, password, sids, deadline, max_requests, rng, results, lock):
+    session = make_session()
+    login(session, username, password)
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    local = {}
+    sent = 0
+    while time.monotonic() < deadline and (not max_requests or sent < max_requests):
+        name = rng.choices(names, weights)[0]
+        path = mix[name][1].format(sid=rng.choice(sids), q=urllib.request.quote(rng.choice(SEARCH_TERMS)))
+        start = time.perf_counter()
+        try:
+            status, size = session.request('GET', path)
+        except Exception:
+            status, size = None, 0
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = local.setdefault(name, {'latencies': [], 'errors': 0, 'bytes': 0})
+        stats['latencies'].append(elapsed)
+        stats['bytes'] += size
+        if status is None or status >= 400:
+            stats['errors'] += 1
+        sent += 1
+    with lock:
+        for name, stats in local.items():
+            total = results.setdefault(name, {'latencies': [], 'errors': 0, 'bytes': 0})
+            total['latencies'].extend(stats['latencies'])
+            total['errors'] += stats['errors']
+            total['bytes'] += stats['bytes']
+
+
+def assign_mixes(mix, concurrency):
+    """Mix of each worker; ``mixed`` splits the workers by MIXED share, at least one per mix."""
+    if mix != 'mixed':
+        return [mix] * concurrency
+    if concurrency < len(MIXED):
+        raise ValueError(f"--mix mixed needs --concurrency of at least {len(MIXED)}")
+    # Largest remainder, then one worker moved to every mix left without any
+    exact = [share * concurrency for _, share in MIXED]
+    counts = [int(n) for n in exact]
+    by_remainder = sorted(range(len(MIXED)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:concurrency - sum(counts)]:
+        counts[i] += 1
+    for i, count in enumerate(counts):
+        if count == 0:
+            counts[counts.index(max(counts))] -= 1
+            counts[i] = 1
+    return [name for (name, _), count in zip(MIXED, counts) for _ in range(count)]
+
+
+def run(make_session, mixes, password, sids, duration, max_requests, seed, warmup):
+    def username(n, role):
+        return ADMIN_USERNAME if role == 'admin' else f'{VIEWER_PREFIX}{n + 1}'
+
+    # Unmeasured single-threaded pass to fill caches and indexes
+    for mix_name in set(mixes) if warmup else ():
+        role, mix = MIXES[mix_name]
+        worker(make_session, mix, username(0, role), password, sids, float('inf'), warmup,
+               random.Random(seed), {}, threading.Lock())
+
+    results, lock = {}, threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = []
+    for n, mix_name in enumerate(mixes):
+        role, mix = MIXES[mix_name]
+        threads.append(threading.Thread(target=worker, args=(
+            make_session, mix, username(n, role), password, sids, deadline, max_requests,
+            random.Random(seed + n), results, lock)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    summary = {}
+    everything = []
+    for name, stats in sorted(results.items()):
+        latencies = stats['latencies']
+        everything.extend(latencies)
+        summary[name] = {
+            'requests': len(latencies),
+            'errors': stats['errors'],
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'avg_kb': round(stats['bytes'] / len(latencies) / 1024, 1) if latencies else 0,
+        }
+    summary['TOTAL'] = {
+        'requests': len(everything),
+        'errors': sum(s['errors'] for s in results.values()),
+        'rps': round(len(everything) / elapsed, 1),
+        'p50_ms': round(percentile(everything, 50), 3),
+        'p95_ms': round(percentile(everything, 95), 3),
+        'p99_ms': round(percentile(everything, 99), 3),
+        'avg_kb': round(sum(s['bytes'] for s in results.values()) / len(everything) / 1024, 1) if everything else 0,
+    }
+    return summary
+
+
+def _delta(new, old):
+    if not old:
+        return 'n/a'
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def print_comparison(summary, baseline):
+    rows = []
+    for name, stats in summary.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        rows.append((name, _delta(stats['rps'], old['rps']), _delta(stats['p50_ms'], old['p50_ms']),
+                     _delta(stats['p95_ms'], old['p95_ms']), _delta(stats['p99_ms'], old['p99_ms'])))
+    print_table(['endpoint', 'req/s', 'p50', 'p95', 'p99'], rows)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', choices=sorted(MIXES) + ['mixed'], default='mixed')
+    parser.add_argument('--client', choices=['test', 'wsgi'], default='test')
+    parser.add_argument('--url', help="Benchmark a running server instead of starting one.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Worker threads, one session each.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run.")
+    parser.add_argument('--requests', type=int, default=0, help="Stop each worker after this many requests.")
+    parser.add_argument('--warmup', type=int, default=50, help="Warm-up requests per mix (not measured).")
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help="Write the results to this file.")
+    parser.add_argument('--compare', help="Print changes against a previous --json file.")
+    args = parser.parse_args()
+    try:
+        mixes = assign_mixes(args.mix, args.concurrency)
+    except ValueError as err:
+        parser.error(str(err))
+
+    app, server, base_url = None, None, args.url
+    if not base_url:
+        from app import create_app
+        app = create_app()
+        if args.client == 'wsgi':
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+    def make_session():
+        return HttpSession(base_url) if base_url else TestClientSession(app)
+
+    try:
+        sids = fetch_sids(make_session(), args.password)
+        results, elapsed = run(make_session, mixes, args.password, sids, args.duration,
+                               args.requests, args.seed, args.warmup)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    summary = summarize(results, elapsed)
+    target = base_url or 'flask test client'
+    print(f"{args.mix} mix against {target}: {len(mixes)} workers, {elapsed:.1f}s, revision {git_revision()}")
+    print_table(['endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'avg KB'],
+                [(name, s['requests'], s['errors'], s['rps'], s['p50_ms'], s['p95_ms'], s['p99_ms'], s['avg_kb'])
+                 for name, s in summary.items()])
+
+    baseline = None
+    if args.compare:
+        # Read before --json, which may overwrite the same file
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'revision': git_revision(), 'mix': args.mix, 'target': target,
+                       'workers': len(mixes), 'elapsed_seconds': round(elapsed, 3),
+                       'results': summary}, f, indent=2)
+    if baseline is not None:
+        print(f"\nChange against {args.compare} (revision {baseline.get('revision')}):")
+        print_comparison(summary, baseline['results'])
+
+
+if __name__ == '__main__':
+    main()
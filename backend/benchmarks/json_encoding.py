@@ -0,0 +1,105 @@
+"""Encode time and size of the heaviest JSON responses, Flask's encoder vs orjson.
+
+Usage: python -m benchmarks.json_encoding [--iterations 50] [--feedback-limit 500]
+                                          [--no-db --synthetic 2000,500,5000]
+
+Reads the rows behind the series list, one page of admin feedback and the
+Q1 / Q3 reports from MySQL (seed them first with ``python -m benchmarks.seed``)
+and times encoding them with Flask's default JSON provider and with
+``json_provider.OrjsonProvider``. With ``--no-db`` the rows are random:
+--synthetic gives the numbers of series, feedback rows and report rows.
+"""
+import argparse
+import datetime
+import random
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+import reports_routes
+from benchmarks.common import connect, percentile, print_table, time_calls
+from viewer_routes import SERIES_LIST_SQL
+
+FEEDBACK_SQL = """
+    SELECT f.*, s.SNAME, v.USERNAME
+    FROM DRY_FEEDBACK f
+    JOIN DRY_SERIES s ON f.SID = s.SID
+    JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
+    ORDER BY f.FDATE DESC, f.SID DESC, f.ACCOUNT DESC
+    LIMIT %s
+"""
+
+
+def from_db(feedback_limit):
+    conn = connect()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        payloads = {}
+        cursor.execute(SERIES_LIST_SQL)
+        payloads['series list'] = cursor.fetchall()
+        cursor.execute(FEEDBACK_SQL, (feedback_limit,))
+        payloads['feedback page'] = {"items": cursor.fetchall(), "next_cursor": "x", "has_more": True}
+        for name, sql in (('report q1', reports_routes.Q1_SQL), ('report q3', reports_routes.Q3_SQL)):
+            cursor.execute(sql)
+            payloads[name] = {"query": sql.strip(), "result": cursor.fetchall()}
+        cursor.close()
+        return payloads
+    finally:
+        conn.close()
+
+
+def synthetic(series, feedback, report):
+    rng = random.Random(0)
+    day = datetime.date(2025, 1, 1)
+    series_rows = [{
+        "SID": sid, "SNAME": f"Series {sid}", "NEPISODES": rng.randint(6, 40), "ORI_LANG": "English",
+        "genres": "Drama, Romance", "countries": '[{"CID": 1, "CNAME": "USA"}]',
+        "avg_rating": Decimal(rng.randint(100, 500)) / 100, "feedback_count": rng.randint(0, 5000),
+    } for sid in range(1, series + 1)]
+    feedback_rows = [{
+        "SID": rng.randint(1, series), "ACCOUNT": rng.randint(1, 100000), "RATE": rng.randint(1, 5),
+        "FTEXT": "Great pacing and a strong cast. " * 3, "FDATE": day - datetime.timedelta(days=rng.randint(0, 900)),
+        "SNAME": "Series", "USERNAME": f"viewer{n}",
+    } for n in range(feedback)]
+    report_rows = [{
+        "SNAME": f"Series {n}", "Genre": "Drama", "ReleaseCountry": "USA",
+        "RELEASE_DATE": day - datetime.timedelta(days=n % 900),
+    } for n in range(report)]
+    return {
+        'series list': series_rows,
+        'feedback page': {"items": feedback_rows, "next_cursor": "x", "has_more": True},
+        'report q1': {"query": "SELECT ...", "result": report_rows},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50, help="Encodes to time per payload and encoder.")
+    parser.add_argument('--feedback-limit', type=int, default=500, help="Rows on the feedback page.")
+    parser.add_argument('--no-db', action='store_true', help="Use random rows instead of MySQL.")
+    parser.add_argument('--synthetic', default='2000,500,5000', help="series,feedback,report rows for --no-db.")
+    args = parser.parse_args()
+
+    if args.no_db:
+        payloads = synthetic(*(int(n) for n in args.synthetic.split(',')))
+    else:
+        payloads = from_db(args.feedback_limit)
+
+    app = Flask(__name__)
+    encoders = {
+        'flask': lambda obj, provider=DefaultJSONProvider(app): provider.dumps(obj).encode(),
+        'orjson': json_provider.dumps_bytes,
+    }
+    rows = []
+    for name, payload in payloads.items():
+        for encoder, dumps in encoders.items():
+            size = len(dumps(payload))
+            samples = time_calls(lambda: dumps(payload), args.iterations, warmup=3)
+            rows.append((name, encoder, size, round(percentile(samples, 50), 3), round(percentile(samples, 95), 3)))
+    print_table(['payload', 'encoder', 'bytes', 'p50 ms', 'p95 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Login throughput against the number of password hashing processes.
+
+Usage: python -m benchmarks.password_hashing [--pool-sizes 0,1,2,4] [--concurrency 16]
+                                             [--duration 10] [--no-db]
+
+For every pool size the app's hasher is replaced by one with that many
+worker processes (0 = hash on the request thread) and --concurrency threads
+log in as ``bench_viewer_<n>`` through the Flask test client for --duration
+seconds; seed the accounts first with ``python -m benchmarks.seed``. The
+wait queue is sized so no login is rejected unless --queue is given.
+``--no-db`` times the password checks alone, without the app or MySQL.
+"""
+import argparse
+import os
+import threading
+import time
+
+import passwords
+from benchmarks.common import percentile, print_table
+from benchmarks.seed import DEFAULT_PASSWORD, VIEWER_PREFIX
+from config import Config
+
+
+def run(call, concurrency, duration):
+    """Runs ``call(n)`` from ``concurrency`` threads.
+
+    Returns the latencies (ms) of successful calls and the number of failed ones.
+    """
+    latencies, failures, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(n):
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if call(n):
+                local.append((time.perf_counter() - start) * 1000)
+            else:
+                failed += 1
+                time.sleep(0.01)  # back off after a 503
+        with lock:
+            latencies.extend(local)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0], time.perf_counter() - started
+
+
+def login_call(app, password):
+    clients = {}
+
+    def call(n):
+        client = clients.setdefault(n, app.test_client())
+        response = client.post('/api/login', json={'username': f'{VIEWER_PREFIX}{n + 1}', 'password': password})
+        return response.status_code == 200
+    return call
+
+
+def verify_call(hasher, password):
+    pwhash = passwords.hash_password(password, hasher.method, hasher.salt_length)
+
+    def call(n):
+        try:
+            return hasher.verify(pwhash, password)
+        except passwords.HasherBusy:
+            return False
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', default=f'0,1,2,{os.cpu_count() or 1}')
+    parser.add_argument('--concurrency', type=int, default=16, help="Threads logging in concurrently.")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per pool size.")
+    parser.add_argument('--queue', type=int, help="Wait queue size (default: --concurrency).")
+    parser.add_argument('--method', default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--no-db', action='store_true', help="Only time password checks.")
+    args = parser.parse_args()
+
+    app = None
+    if not args.no_db:
+        from app import create_app
+        app = create_app()
+
+    print(f"{args.method}, {args.concurrency} concurrent logins, {os.cpu_count()} CPUs")
+    rows = []
+    for size in (int(s) for s in args.pool_sizes.split(',')):
+        hasher = passwords.PasswordHasher(method=args.method, salt_length=Config.PASSWORD_SALT_LENGTH,
+                                          workers=size, max_pending=args.queue if args.queue is not None
+                                          else args.concurrency)
+        if app is not None:
+            app.extensions['password_hasher'] = hasher
+            call = login_call(app, args.password)
+        else:
+            call = verify_call(hasher, args.password)
+        run(call, args.concurrency, 1)  # start the worker processes outside the measurement
+        latencies, failures, elapsed = run(call, args.concurrency, args.duration)
+        hasher.shutdown()
+        rows.append((size or 'inline', len(latencies), failures, round(len(latencies) / elapsed, 1),
+                     round(percentile(latencies, 50), 1), round(percentile(latencies, 95), 1),
+                     round(percentile(latencies, 99), 1)))
+    print_table(['workers', 'logins', 'failed', 'logins/s', 'p50 ms', 'p95 ms', 'p99 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
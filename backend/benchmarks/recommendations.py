@@ -0,0 +1,75 @@
+"""Build time and per-viewer latency of the item-item recommendation model.
+
+Usage: python -m benchmarks.recommendations [--neighbours 20] [--viewers 200] [--iterations 2000]
+                                            [--no-db --synthetic 50000,2000,1000000]
+
+Loads all series and ratings from MySQL (seed them first with
+``python -m benchmarks.seed``), builds the model the way the background
+rebuild does and times ``recommend`` for --viewers random viewers. With
+``--no-db`` the ratings are random: --synthetic gives the numbers of
+viewers, series and ratings.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import recommender
+from benchmarks.common import connect, percentile, print_table, time_calls
+
+
+def synthetic(viewers, series, ratings):
+    rng = np.random.default_rng(0)
+    # Popularity is skewed towards low SIDs, like real catalogs
+    pairs = np.unique(np.stack([rng.integers(1, viewers + 1, ratings),
+                                np.minimum(rng.zipf(1.3, ratings), series)], axis=1), axis=0)
+    rates = rng.integers(1, 6, len(pairs))
+    rows = {sid: {"SID": sid, "SNAME": f"Series {sid}", "ORI_LANG": "English", "avg_rating": 3.0}
+            for sid in range(1, series + 1)}
+    return rows, np.column_stack([pairs, rates])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--neighbours', type=int, default=20, help="Similar series kept per series.")
+    parser.add_argument('--viewers', type=int, default=200, help="Viewers to time recommendations for.")
+    parser.add_argument('--iterations', type=int, default=2000, help="recommend() calls to time.")
+    parser.add_argument('--no-db', action='store_true', help="Use random ratings instead of MySQL.")
+    parser.add_argument('--synthetic', default='50000,2000,1000000', help="viewers,series,ratings for --no-db.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.no_db:
+        series, ratings = synthetic(*(int(n) for n in args.synthetic.split(',')))
+    else:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            series, ratings = recommender.load(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+    loaded = time.perf_counter()
+    model = recommender.Model(series, ratings, args.neighbours)
+    built = time.perf_counter()
+
+    accounts = random.Random(0).sample(sorted(model.account_rows), min(args.viewers, len(model.account_rows)))
+    if not accounts:
+        raise SystemExit("No ratings found; seed the database or use --no-db")
+    calls = iter(accounts * (args.iterations // len(accounts) + 11))
+    samples = time_calls(lambda: model.recommend(next(calls), 5), args.iterations)
+
+    print(f"{len(model.account_rows)} viewers, {len(model.sids)} rated series, {len(ratings)} ratings, "
+          f"{args.neighbours} neighbours")
+    print_table(['step', 'ms'], [
+        ('load', round((loaded - start) * 1000, 1)),
+        ('build', round((built - loaded) * 1000, 1)),
+        ('recommend p50', round(percentile(samples, 50), 4)),
+        ('recommend p95', round(percentile(samples, 95), 4)),
+        ('recommend p99', round(percentile(samples, 99), 4)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
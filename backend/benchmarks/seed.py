@@ -0,0 +1,172 @@
+"""Seeds a synthetic dataset of configurable size for the HTTP benchmarks.
+
+Usage: python -m benchmarks.seed [--series 200] [--viewers 1000] [--feedback 5000]
+                                 [--reset] [--seed 42]
+
+Synthetic series get SIDs from --sid-start upwards and synthetic accounts
+are named ``bench_viewer_<n>`` / ``bench_admin``, all with --password, so a
+run can be repeated or removed with --reset without touching the sample
+data. The same --seed always produces the same dataset.
+"""
+import argparse
+import datetime
+import random
+import time
+
+import passwords
+from benchmarks.common import connect
+from config import Config
+
+SID_START = 900000
+ADMIN_USERNAME = 'bench_admin'
+VIEWER_PREFIX = 'bench_viewer_'
+DEFAULT_PASSWORD = 'bench-pass'
+
+WORDS = ('Silent', 'River', 'Empire', 'Midnight', 'Garden', 'Echo', 'Crown', 'Harbor',
+         'Shadow', 'Summer', 'Signal', 'Winter', 'Glass', 'Iron', 'Paper', 'Storm')
+COMMENTS = ('Loved every episode', 'Great acting and story', 'Too slow for me',
+            'The ending was perfect', 'Would watch again', 'Not my kind of show',
+            'Solid season overall', 'Beautiful cinematography')
+
+CHUNK = 1000
+
+
+def _insert(cursor, query, rows):
+    for i in range(0, len(rows), CHUNK):
+        cursor.executemany(query, rows[i:i + CHUNK])
+
+
+def _random_date(rng, start, end):
+    return start + datetime.timedelta(days=rng.randint(0, (end - start).days))
+
+
+def reset(conn, sid_start):
+    cursor = conn.cursor()
+    viewers = f"SELECT ACCOUNT FROM DRY_VIEWER WHERE USERNAME LIKE '{VIEWER_PREFIX}%'"
+    cursor.execute(f"DELETE FROM DRY_FEEDBACK WHERE SID >= %s OR ACCOUNT IN ({viewers})", (sid_start,))
+    for table in ('DRY_SERIES_STATS', 'DRY_EPISODE', 'DRY_SERIES_TYPE', 'DRY_SERIES_SUBTITLE',
+                  'DRY_SERIES_DUBBING', 'DRY_SERIES_RELEASE_COUNTRY', 'DRY_SERIES'):
+        cursor.execute(f"DELETE FROM {table} WHERE SID >= %s", (sid_start,))
+    cursor.execute(f"DELETE FROM DRY_VIEWER WHERE USERNAME LIKE '{VIEWER_PREFIX}%'")
+    cursor.execute("""
+        DELETE FROM DRY_ADMIN_HISTORY
+        WHERE ADMIN_ID IN (SELECT ADMIN_ID FROM DRY_ADMIN WHERE USERNAME = %s)
+    """, (ADMIN_USERNAME,))
+    cursor.execute("DELETE FROM DRY_ADMIN WHERE USERNAME = %s", (ADMIN_USERNAME,))
+    conn.commit()
+    cursor.close()
+
+
+def rebuild_rollups(conn):
+    """Refreshes the summary tables the app normally maintains on each write."""
+    cursor = conn.cursor()
+    for procedure in ('RebuildSeriesStats', 'RebuildViewerDailyStats'):
+        cursor.callproc(procedure)
+        conn.commit()
+    cursor.close()
+
+
+def seed(conn, n_series, n_viewers, n_feedback, password, sid_start, rng):
+    cursor = conn.cursor()
+    cursor.execute("SELECT CID FROM DRY_COUNTRY")
+    countries = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT LNAME FROM DRY_LANGUAGE")
+    languages = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT TNAME FROM DRY_GENRE_TYPE")
+    genres = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT COALESCE(MAX(EID), 0) FROM DRY_EPISODE")
+    next_eid = cursor.fetchone()[0] + 1
+
+    # One hash for every account: hashing is deliberately slow. Using the
+    # configured parameters means logins do not rehash
+    password_hash = passwords.hash_password(password, Config.PASSWORD_HASH_METHOD, Config.PASSWORD_SALT_LENGTH)
+    cursor.execute("""
+        INSERT INTO DRY_ADMIN (USERNAME, PASSWORD_HASH, FNAME, LNAME, EMAIL)
+        VALUES (%s, %s, 'Bench', 'Admin', 'bench_admin@example.com')
+    """, (ADMIN_USERNAME, password_hash))
+
+    first_day, last_day = datetime.date(2015, 1, 1), datetime.date(2025, 6, 30)
+    series, types, subtitles, dubbings, releases, episodes = [], [], [], [], [], []
+    for sid in range(sid_start, sid_start + n_series):
+        nepisodes = rng.randint(1, 12)
+        name = ' '.join(rng.sample(WORDS, rng.randint(1, 3))) + f' {sid - sid_start + 1}'
+        series.append((sid, name, nepisodes, rng.choice(languages)))
+        types.extend((sid, g) for g in rng.sample(genres, rng.randint(1, min(3, len(genres)))))
+        subtitles.extend((sid, l) for l in rng.sample(languages, rng.randint(0, min(3, len(languages)))))
+        dubbings.extend((sid, l) for l in rng.sample(languages, rng.randint(0, min(2, len(languages)))))
+        release = _random_date(rng, first_day, last_day)
+        releases.extend((release, sid, c) for c in rng.sample(countries, rng.randint(1, min(4, len(countries)))))
+        for e_num in range(1, nepisodes + 1):
+            start = release + datetime.timedelta(weeks=e_num - 1)
+            episodes.append((next_eid, e_num, start, start + datetime.timedelta(days=1),
+                             rng.randint(0, 5000000), sid, 'Y' if rng.random() < 0.05 else 'N'))
+            next_eid += 1
+
+    _insert(cursor, "INSERT INTO DRY_SERIES (SID, SNAME, NEPISODES, ORI_LANG) VALUES (%s, %s, %s, %s)", series)
+    _insert(cursor, "INSERT INTO DRY_SERIES_TYPE (SID, TNAME) VALUES (%s, %s)", types)
+    _insert(cursor, "INSERT INTO DRY_SERIES_SUBTITLE (SID, LNAME) VALUES (%s, %s)", subtitles)
+    _insert(cursor, "INSERT INTO DRY_SERIES_DUBBING (SID, LNAME) VALUES (%s, %s)", dubbings)
+    _insert(cursor, "INSERT INTO DRY_SERIES_RELEASE_COUNTRY (RELEASE_DATE, SID, CID) VALUES (%s, %s, %s)", releases)
+    _insert(cursor, """
+        INSERT INTO DRY_EPISODE (EID, E_NUM, SCHEDULE_SDATE, SCHEDULE_EDATE, NVIEWERS, SID, INTERRUPTION)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, episodes)
+
+    viewers = [
+        (f'{VIEWER_PREFIX}{n}', password_hash, 'Bench', f'Viewer{n}', f'{n} Main St', 'New York', 'NY',
+         '10001', _random_date(rng, first_day, last_day), rng.choice((9.99, 14.99, 19.99)),
+         rng.choice(countries), 'What is your favorite color?', 'blue')
+        for n in range(1, n_viewers + 1)
+    ]
+    _insert(cursor, """
+        INSERT INTO DRY_VIEWER (USERNAME, PASSWORD_HASH, FNAME, LNAME, STREET, CITY, STATE, ZIPCODE,
+                                OPEN_DATE, MCHARGE, CID, SECURITY_QUESTION, SECURITY_ANSWER)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, viewers)
+    cursor.execute(f"SELECT ACCOUNT FROM DRY_VIEWER WHERE USERNAME LIKE '{VIEWER_PREFIX}%'")
+    accounts = [row[0] for row in cursor.fetchall()]
+
+    # Distinct (account, series) pairs, at most one feedback row each
+    n_feedback = min(n_feedback, len(accounts) * n_series)
+    pairs = set()
+    while len(pairs) < n_feedback:
+        pairs.add((rng.choice(accounts), rng.randrange(sid_start, sid_start + n_series)))
+    feedback = [(rng.choice(COMMENTS), rng.randint(1, 5), _random_date(rng, first_day, last_day), sid, account)
+                for account, sid in sorted(pairs)]
+    _insert(cursor, "INSERT INTO DRY_FEEDBACK (FTEXT, RATE, FDATE, SID, ACCOUNT) VALUES (%s, %s, %s, %s, %s)",
+            feedback)
+
+    conn.commit()
+    rebuild_rollups(conn)
+    cursor.close()
+    return len(series), len(episodes), len(viewers), len(feedback)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=200)
+    parser.add_argument('--viewers', type=int, default=1000)
+    parser.add_argument('--feedback', type=int, default=5000)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--sid-start', type=int, default=SID_START)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="Only remove previously seeded data.")
+    args = parser.parse_args()
+
+    conn = connect()
+    start = time.perf_counter()
+    reset(conn, args.sid_start)
+    if args.reset:
+        rebuild_rollups(conn)
+        print("Removed seeded benchmark data.")
+    else:
+        counts = seed(conn, args.series, args.viewers, args.feedback, args.password,
+                      args.sid_start, random.Random(args.seed))
+        print("Seeded {} series, {} episodes, {} viewers, {} feedback rows in {:.1f}s".format(
+            *counts, time.perf_counter() - start))
+        print(f"Logins: {ADMIN_USERNAME} / {VIEWER_PREFIX}1..{args.viewers}, password '{args.password}'")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
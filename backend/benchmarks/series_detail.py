@@ -0,0 +1,72 @@
+"""Compares the legacy six-query series detail load with series_loader.
+
+Usage: python -m benchmarks.series_detail [--sid 3001] [--iterations 500]
+"""
+import argparse
+
+import series_loader
+from benchmarks.common import connect, percentile, print_table, time_calls
+
+
+class CountingCursor:
+    """Wraps a cursor and counts execute() calls, i.e. network round trips."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.round_trips = 0
+
+    def execute(self, *args, **kwargs):
+        self.round_trips += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def legacy_load(cursor, sid):
+    """The per-association queries get_series_detail used to issue."""
+    cursor.execute("SELECT * FROM DRY_SERIES WHERE SID = %s", (sid,))
+    series = cursor.fetchone()
+    cursor.execute("SELECT TNAME FROM DRY_SERIES_TYPE WHERE SID = %s", (sid,))
+    series['genres'] = [row['TNAME'] for row in cursor.fetchall()]
+    cursor.execute("SELECT LNAME FROM DRY_SERIES_SUBTITLE WHERE SID = %s", (sid,))
+    series['subtitles'] = [row['LNAME'] for row in cursor.fetchall()]
+    cursor.execute("SELECT LNAME FROM DRY_SERIES_DUBBING WHERE SID = %s", (sid,))
+    series['dubbings'] = [row['LNAME'] for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT c.CNAME, src.RELEASE_DATE
+        FROM DRY_SERIES_RELEASE_COUNTRY src
+        JOIN DRY_COUNTRY c ON src.CID = c.CID
+        WHERE src.SID = %s
+    """, (sid,))
+    series['release_countries'] = cursor.fetchall()
+    cursor.execute("SELECT EID, E_NUM, SCHEDULE_SDATE, SCHEDULE_EDATE, NVIEWERS, INTERRUPTION FROM DRY_EPISODE WHERE SID = %s ORDER BY E_NUM", (sid,))
+    series['episodes'] = cursor.fetchall()
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sid', type=int, default=3001)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    conn = connect()
+    rows = []
+    for name, loader in (('legacy (6 queries)', legacy_load),
+                         ('series_loader', series_loader.load_series)):
+        cursor = CountingCursor(conn.cursor(dictionary=True))
+        loader(cursor, args.sid)
+        round_trips = cursor.round_trips
+        samples = time_calls(lambda: loader(cursor, args.sid), args.iterations)
+        rows.append((name, round_trips,
+                     f"{percentile(samples, 50):.3f}", f"{percentile(samples, 99):.3f}"))
+        cursor.close()
+    conn.close()
+
+    print(f"Series detail load, SID={args.sid}, {args.iterations} iterations")
+    print_table(['loader', 'round trips', 'p50 ms', 'p99 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compares gunicorn worker models on the viewer catalog endpoint.
+
+Usage: python -m benchmarks.worker_models [--models sync,gthread,gevent] [--workers 4]
+                                          [--threads 4] [--concurrency 32] [--duration 20]
+
+For every worker class a gunicorn server is started with gunicorn.conf.py
+(same preload, pool sizing and recycling as production) on a free port, and
+--concurrency clients request GET /api/viewer/series for --duration seconds
+with the http_load machinery. Seed the data first with
+``python -m benchmarks.seed``. Extra environment (e.g. CATALOG_CACHE_TTL=0
+to measure the uncached query) is passed on to the servers.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks import http_load
+from benchmarks.common import print_table
+from benchmarks.seed import DEFAULT_PASSWORD
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(model, workers, threads, port):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=model, GUNICORN_WORKERS=str(workers),
+               GUNICORN_THREADS=str(threads), GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_ACCESS_LOG='')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit(f"gunicorn ({model}) exited:\n{server.stderr.read().decode()}")
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"gunicorn ({model}) did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', default='sync,gthread,gevent')
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes.")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per gthread worker.")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients.")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per worker model.")
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    args = parser.parse_args()
+
+    rows = []
+    for model in args.models.split(','):
+        port = free_port()
+        server = start_server(model, args.workers, args.threads, port)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            results, elapsed = http_load.run(lambda: http_load.HttpSession(base_url),
+                                             ['catalog'] * args.concurrency, args.password, [0],
+                                             args.duration, 0, 1, 50)
+        finally:
+            server.terminate()
+            server.wait()
+        total = http_load.summarize(results, elapsed)['TOTAL']
+        rows.append((model, total['requests'], total['errors'], total['rps'],
+                     total['p50_ms'], total['p95_ms'], total['p99_ms']))
+
+    print(f"GET /api/viewer/series, {args.workers} workers, {args.concurrency} clients, "
+          f"{args.duration:.0f}s each, revision {http_load.git_revision()}")
+    print_table(['worker class', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Batched bulk loading of series, episodes and feedback from CSV or NDJSON.
+
+Records are validated one by one, grouped into batches of ``batch_size`` and
+inserted with multi-row ``executemany`` statements, one transaction per
+batch. If a batch fails (e.g. a duplicate key or a foreign key violation)
+it is rolled back and retried row by row, so a bad row is reported without
+losing the rest of its batch.
+
+CSV list columns (genres, subtitles, dubbings) are ``;``-separated and
+release_countries is written like in the admin edit form:
+``CID:YYYY-MM-DD;CID:YYYY-MM-DD``. In NDJSON they are plain JSON lists, with
+release_countries as ``[{"cid": 1, "release_date": "2024-01-10"}]``.
+
+Used by POST /api/admin/import/<entity> and ``flask import-data``.
+"""
+import csv
+import datetime
+import io
+import json
+import time
+
+import click
+import mysql.connector
+
+import changes
+import dashboard
+import db
+import series_stats
+
+MAX_REPORTED_ERRORS = 1000
+
+
+# --- parsing ---
+
+class InvalidRecord(ValueError):
+    """Yielded (not raised) for an input line that could not be parsed."""
+
+
+class _ReadOnly(io.RawIOBase):
+    """Raw stream over any object with ``read()``, for TextIOWrapper."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def iter_records(stream, fmt):
+    """Yields dict records from a binary stream in ``csv`` or ``ndjson`` format.
+
+    Unparseable NDJSON lines are yielded as InvalidRecord instances so the
+    import can report them and carry on.
+    """
+    if not hasattr(stream, 'readable'):
+        # Werkzeug spools uploads in a SpooledTemporaryFile, which has no
+        # readable() before Python 3.11
+        stream = io.BufferedReader(_ReadOnly(stream))
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    elif fmt == 'ndjson':
+        for line in text:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield InvalidRecord(f"Invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [v.strip() for v in str(value).split(';') if v.strip()]
+
+
+def _release_countries(value):
+    result = []
+    for item in _list(value):
+        if isinstance(item, dict):
+            cid, release_date = item['cid'], item['release_date']
+        else:
+            cid, _, release_date = item.partition(':')
+        result.append((int(cid), datetime.date.fromisoformat(str(release_date).strip())))
+    return result
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        raise ValueError(f"Missing {field}")
+    return value
+
+
+def _date(value):
+    return datetime.date.fromisoformat(str(value).strip())
+
+
+# --- entities ---
+
+class SeriesLoader:
+    tables = (changes.SERIES,)
+
+    def validate(self, record):
+        return {
+            'sid': int(_required(record, 'sid')),
+            'sname': str(_required(record, 'sname')),
+            'nepisodes': int(_required(record, 'nepisodes')),
+            'ori_lang': str(_required(record, 'ori_lang')),
+            'genres': _list(record.get('genres')),
+            'subtitles': _list(record.get('subtitles')),
+            'dubbings': _list(record.get('dubbings')),
+            'release_countries': _release_countries(record.get('release_countries')),
+        }
+
+    def insert(self, cursor, rows):
+        cursor.executemany(
+            "INSERT INTO DRY_SERIES (SID, SNAME, NEPISODES, ORI_LANG) VALUES (%s, %s, %s, %s)",
+            [(r['sid'], r['sname'], r['nepisodes'], r['ori_lang']) for r in rows])
+        for table, column, field in (('DRY_SERIES_TYPE', 'TNAME', 'genres'),
+                                     ('DRY_SERIES_SUBTITLE', 'LNAME', 'subtitles'),
+                                     ('DRY_SERIES_DUBBING', 'LNAME', 'dubbings')):
+            values = [(r['sid'], v) for r in rows for v in r[field]]
+            if values:
+                cursor.executemany(f"INSERT INTO {table} (SID, {column}) VALUES (%s, %s)", values)
+        countries = [(r['sid'], cid, d) for r in rows for cid, d in r['release_countries']]
+        if countries:
+            cursor.executemany(
+                "INSERT INTO DRY_SERIES_RELEASE_COUNTRY (SID, CID, RELEASE_DATE) VALUES (%s, %s, %s)",
+                countries)
+
+
+class EpisodeLoader:
+    tables = (changes.EPISODE,)
+
+    def validate(self, record):
+        interruption = str(record.get('interruption') or 'N').upper()
+        if interruption not in ('Y', 'N'):
+            raise ValueError("interruption must be Y or N")
+        return (
+            int(_required(record, 'eid')),
+            int(_required(record, 'e_num')),
+            _date(_required(record, 'schedule_sdate')),
+            _date(_required(record, 'schedule_edate')),
+            int(record.get('nviewers') or 0),
+            int(_required(record, 'sid')),
+            interruption,
+        )
+
+    def insert(self, cursor, rows):
+        cursor.executemany("""
+            INSERT INTO DRY_EPISODE (EID, E_NUM, SCHEDULE_SDATE, SCHEDULE_EDATE, NVIEWERS, SID, INTERRUPTION)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+
+
+class FeedbackLoader:
+    tables = (changes.FEEDBACK,)
+
+    def validate(self, record):
+        rate = _required(record, 'rate')
+        # Same rule as the API: whole numbers only, no 4.7 or true
+        if isinstance(rate, str) and rate.strip().isdigit():
+            rate = int(rate)
+        if not isinstance(rate, int) or isinstance(rate, bool):
+            raise ValueError("rate must be a whole number")
+        ftext = str(_required(record, 'ftext'))
+        if not 1 <= rate <= 5:
+            raise ValueError("rate must be 1-5")
+        if len(ftext.strip()) < 5:
+            raise ValueError("ftext must be at least 5 characters")
+        fdate = _date(record['fdate']) if record.get('fdate') else datetime.date.today()
+        return (ftext, rate, fdate, int(_required(record, 'sid')), int(_required(record, 'account')))
+
+    def insert(self, cursor, rows):
+        cursor.executemany(
+            "INSERT INTO DRY_FEEDBACK (FTEXT, RATE, FDATE, SID, ACCOUNT) VALUES (%s, %s, %s, %s, %s)",
+            rows)
+        # Keep DRY_SERIES_STATS in step within the same transaction
+        series_stats.apply_changes(cursor, [(sid, None, rate) for _, rate, _, sid, _ in rows])
+
+
+LOADERS = {
+    'series': SeriesLoader,
+    'episodes': EpisodeLoader,
+    'feedback': FeedbackLoader,
+}
+
+
+# --- driver ---
+
+class ImportReport:
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.errors = []
+        self._started = time.perf_counter()
+
+    def error(self, row_number, message):
+        self.rows_failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self._started
+        return {
+            "entity": self.entity,
+            "rows_read": self.rows_read,
+            "rows_inserted": self.rows_inserted,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_inserted / elapsed, 1) if elapsed > 0 else None,
+            "errors": self.errors,
+            "errors_truncated": self.rows_failed > len(self.errors),
+        }
+
+
+def _flush(db_conn, loader, batch, report):
+    """Inserts one batch; on failure retries its rows one at a time."""
+    cursor = db_conn.cursor()
+    try:
+        db_conn.start_transaction()
+        loader.insert(cursor, [row for _, row in batch])
+        db_conn.commit()
+        report.rows_inserted += len(batch)
+    except mysql.connector.Error:
+        db_conn.rollback()
+        for row_number, row in batch:
+            try:
+                db_conn.start_transaction()
+                loader.insert(cursor, [row])
+                db_conn.commit()
+                report.rows_inserted += 1
+            except mysql.connector.Error as err:
+                db_conn.rollback()
+                report.error(row_number, err.msg)
+    finally:
+        cursor.close()
+        report.batches += 1
+
+
+def run_import(db_conn, entity, records, batch_size):
+    """Loads an iterable of dict records and returns an ImportReport."""
+    loader = LOADERS[entity]()
+    report = ImportReport(entity)
+    if db_conn.in_transaction:
+        db_conn.rollback()
+
+    batch = []
+    for row_number, record in enumerate(records, start=1):
+        report.rows_read += 1
+        try:
+            if isinstance(record, InvalidRecord):
+                raise record
+            batch.append((row_number, loader.validate(record)))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            report.error(row_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            _flush(db_conn, loader, batch, report)
+            batch = []
+    if batch:
+        _flush(db_conn, loader, batch, report)
+
+    if report.rows_inserted:
+        changes.bump(*loader.tables)
+        dashboard.get_stats().invalidate()
+    return report
+
+
+@click.command('import-data')
+@click.argument('entity', type=click.Choice(sorted(LOADERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help="Defaults to the file extension.")
+@click.option('--batch-size', type=int, default=None, help="Rows per transaction.")
+def import_command(entity, path, fmt, batch_size):
+    """Bulk-load series, episodes or feedback from a CSV/NDJSON file."""
+    from flask import current_app
+
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    batch_size = batch_size or current_app.config['BULK_IMPORT_BATCH_SIZE']
+    with open(path, 'rb') as stream:
+        report = run_import(db.get_db(), entity, iter_records(stream, fmt), batch_size)
+    result = report.to_dict()
+    click.echo(f"{result['rows_inserted']} of {result['rows_read']} {entity} rows imported "
+               f"in {result['elapsed_seconds']}s ({result['rows_per_second']} rows/s), "
+               f"{result['rows_failed']} failed.")
+    for error in result['errors']:
+        click.echo(f"  row {error['row']}: {error['error']}", err=True)
+
+
+def init_app(app):
+    app.cli.add_command(import_command)
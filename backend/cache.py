@@ -0,0 +1,98 @@
+"""In-process read-through caches with TTL and LRU eviction."""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+import changes
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        """Pass to ``set`` to drop values loaded before a later ``clear``."""
+        return self._generation
+
+    def get(self, key):
+        """Returns ``(True, value)`` on a fresh hit, ``(False, None)`` otherwise."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Invalidated while the value was being loaded: drop it
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for ``key``, calling ``loader()`` on a miss."""
+        generation = self.generation
+        hit, value = self.get(key)
+        if not hit:
+            value = loader()
+            self.set(key, value, generation)
+        return value
+
+    def clear(self, *_):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def get_cache(name):
+    return current_app.extensions['caches'][name]
+
+
+def all_stats():
+    return {name: c.stats() for name, c in current_app.extensions['caches'].items()}
+
+
+def init_app(app):
+    caches = app.extensions.setdefault('caches', {})
+
+    # Viewer series catalog, keyed by the (genre, language, country) filter
+    catalog = TTLCache(maxsize=app.config['CATALOG_CACHE_SIZE'],
+                       ttl=app.config['CATALOG_CACHE_TTL'])
+    changes.subscribe((changes.SERIES, changes.EPISODE, changes.FEEDBACK), catalog.clear)
+    caches['series_catalog'] = catalog
@@ -0,0 +1,62 @@
+"""Per-table change counters used to invalidate in-process caches.
+
+Write paths call ``bump`` with the tables they modified *after* committing.
+Each bump increments that table's version and runs the listeners registered
+for it with ``subscribe``. Versions and listeners are per process, so caches
+built on top of them must also bound staleness with a TTL when the app runs
+with several worker processes.
+
+Association tables (DRY_SERIES_TYPE, DRY_SERIES_SUBTITLE, ...) are reported
+as DRY_SERIES.
+"""
+import threading
+import time
+from collections import defaultdict
+
+SERIES = 'DRY_SERIES'
+EPISODE = 'DRY_EPISODE'
+FEEDBACK = 'DRY_FEEDBACK'
+VIEWER = 'DRY_VIEWER'
+COUNTRY = 'DRY_COUNTRY'  # only changed by SQL scripts, never bumped
+RECOMMENDER = 'recommender'  # not a table: bumped when the recommendation model is rebuilt
+
+_lock = threading.Lock()
+_versions = defaultdict(int)
+_listeners = defaultdict(list)
+_started_at = time.time()
+_modified = {}  # table -> time of the last bump
+
+
+def subscribe(tables, listener):
+    """Calls ``listener(table, key)`` whenever one of ``tables`` is bumped."""
+    with _lock:
+        for table in tables:
+            _listeners[table].append(listener)
+
+
+def bump(*tables, key=None):
+    """Records that ``tables`` changed and notifies their listeners.
+
+    ``key`` optionally identifies the changed entity (e.g. the series id) so
+    listeners can refresh just that part; ``None`` means "anything".
+    """
+    with _lock:
+        now = time.time()
+        for table in tables:
+            _versions[table] += 1
+            _modified[table] = now
+        listeners = [(table, fn) for table in tables for fn in _listeners[table]]
+    for table, fn in listeners:
+        fn(table, key)
+
+
+def version(*tables):
+    """Returns the current versions of ``tables`` as a tuple."""
+    with _lock:
+        return tuple(_versions[table] for table in tables)
+
+
+def last_modified(*tables):
+    """Time of the last bump of any of ``tables`` (process start if none)."""
+    with _lock:
+        return max([_modified.get(table, _started_at) for table in tables])
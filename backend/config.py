@@ -10,3 +10,100 @@ class Config:
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', 'your_mysql_password')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'dry_news_db')
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
+    # Pure-Python driver, required for gevent workers (set by gunicorn.conf.py)
+    MYSQL_USE_PURE = os.environ.get('MYSQL_USE_PURE', 'false').lower() in ('1', 'true', 'yes')
+
+    # Password hashing: werkzeug method string with its cost parameters. Hashes
+    # made with other parameters are replaced on the next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000000')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # processes per app process, 0 hashes inline
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))  # waiting hashes beyond the workers, then 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 30))  # seconds
+
+    # Bloom filter of usernames for signup availability checks (per worker process);
+    # names registered by other processes show up after the next rebuild
+    USERNAME_FILTER_TTL = float(os.environ.get('USERNAME_FILTER_TTL', 300))  # seconds between rebuilds
+    USERNAME_FILTER_ERROR_RATE = float(os.environ.get('USERNAME_FILTER_ERROR_RATE', 0.01))  # false positive rate
+
+    # Connection pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))  # seconds, 0 disables
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+
+    # ASGI serving mode (uvicorn asgi:app): async connections for the hot
+    # viewer endpoints and threads for the requests handed to Flask
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 20))
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+    # Rows fetched per round trip when streaming large listings (?format=ndjson|stream)
+    STREAM_FETCH_SIZE = int(os.environ.get('STREAM_FETCH_SIZE', 500))
+
+    # Viewer series catalog cache (per worker process)
+    CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 30))  # seconds
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 256))  # distinct filter combinations
+
+    # Genre / language / country facet index: full rebuild interval, bounds
+    # staleness of writes handled by other worker processes
+    FACET_INDEX_TTL = float(os.environ.get('FACET_INDEX_TTL', 30))  # seconds
+
+    # Full-text search: 'fulltext' (MySQL FULLTEXT indexes) or 'memory'
+    # (in-process index, series names only)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'fulltext')
+
+    # Admin dashboard stats: served from memory, reloaded at least this often
+    DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 60))  # seconds
+
+    # Feedback writes: 'sync' (commit per request) or 'queue' (write-behind,
+    # acknowledged before commit, see feedback_writes.py)
+    FEEDBACK_WRITE_MODE = os.environ.get('FEEDBACK_WRITE_MODE', 'sync')
+    FEEDBACK_FLUSH_MS = int(os.environ.get('FEEDBACK_FLUSH_MS', 200))  # flush interval
+    FEEDBACK_FLUSH_ROWS = int(os.environ.get('FEEDBACK_FLUSH_ROWS', 500))  # flush early at this many pending
+    FEEDBACK_QUEUE_MAX = int(os.environ.get('FEEDBACK_QUEUE_MAX', 10000))  # beyond this, write synchronously
+
+    # Response JSON encoding: 'orjson' (see json_provider.py; dates as ISO 8601,
+    # decimals as numbers) or 'default' (Flask's provider)
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+    # Admin audit log (DRY_ADMIN_HISTORY): buffered in memory and written by
+    # a background thread, see audit.py
+    AUDIT_FLUSH_MS = int(os.environ.get('AUDIT_FLUSH_MS', 1000))  # flush interval
+    AUDIT_FLUSH_ROWS = int(os.environ.get('AUDIT_FLUSH_ROWS', 500))  # flush early at this many pending, rows per INSERT
+    AUDIT_QUEUE_MAX = int(os.environ.get('AUDIT_QUEUE_MAX', 10000))  # beyond this, history rows are dropped
+    AUDIT_SQL_MAX = int(os.environ.get('AUDIT_SQL_MAX', 4000))  # characters of statement text kept
+
+    # Background report jobs (/api/admin/reports/jobs)
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))  # concurrent report queries per process
+    REPORT_RESULT_TTL = float(os.environ.get('REPORT_RESULT_TTL', 300))  # seconds results and jobs are kept
+    REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 32))  # cached (report, params) results
+    REPORT_MAX_WAIT = float(os.environ.get('REPORT_MAX_WAIT', 30))  # longest ?wait= for long-polling
+
+    # Bulk import (POST /api/admin/import/<entity>, flask import-data)
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 1000))  # rows per transaction
+    BULK_IMPORT_MAX_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_MAX_BATCH_SIZE', 10000))
+
+    # Request metrics (GET /metrics, Prometheus text format)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # lets scrapers authenticate without an admin session
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))  # log slower requests, 0 disables
+
+    # Series deletion: 'job' (tombstone, then delete dependent rows in
+    # batches in the background, see series_deletion.py) or 'sync' (one transaction)
+    SERIES_DELETE_MODE = os.environ.get('SERIES_DELETE_MODE', 'job')
+    SERIES_DELETE_BATCH_SIZE = int(os.environ.get('SERIES_DELETE_BATCH_SIZE', 1000))  # rows per transaction
+    SERIES_DELETE_PAUSE_MS = int(os.environ.get('SERIES_DELETE_PAUSE_MS', 100))  # sleep between batches
+    SERIES_DELETE_LEASE = int(os.environ.get('SERIES_DELETE_LEASE', 60))  # seconds before a stalled job is taken over
+    SERIES_DELETE_POLL = float(os.environ.get('SERIES_DELETE_POLL', 10))  # seconds between checks for pending jobs
+
+    # Item-item recommendation model (see recommender.py), rebuilt in the
+    # background at least this often
+    RECOMMENDER_REBUILD_INTERVAL = float(os.environ.get('RECOMMENDER_REBUILD_INTERVAL', 300))  # seconds
+    RECOMMENDER_NEIGHBOURS = int(os.environ.get('RECOMMENDER_NEIGHBOURS', 20))  # similar series kept per series
+
+    # Conditional GETs (ETag / If-None-Match): how long a worker answers 304
+    # from its remembered ETag without running the query, bounds staleness of
+    # writes handled by other worker processes
+    HTTP_ETAG_TTL = float(os.environ.get('HTTP_ETAG_TTL', 30))  # seconds
+    COUNTRIES_MAX_AGE = int(os.environ.get('COUNTRIES_MAX_AGE', 3600))  # browser/proxy cache of /api/countries
@@ -0,0 +1,158 @@
+"""In-memory admin dashboard statistics.
+
+The dashboard payload (totals, feedback of the last 7 days, top 5 series by
+average rating) is loaded once from MySQL and then kept up to date by the
+write paths through ``DashboardStats.viewer_added``, ``series_saved`` and
+``feedback_changed``, so serving it needs no queries at all. The top 5 is
+computed from a per-series copy of DRY_SERIES_STATS.
+
+Counters live in each worker process, so writes handled by other workers
+are only picked up when the snapshot is reloaded, at the latest
+``DASHBOARD_STATS_TTL`` seconds after it was loaded (or on ``?refresh=1``).
+Changes without a cheap delta (series deletion, bulk imports) just
+invalidate the snapshot.
+"""
+import datetime
+import heapq
+import threading
+import time
+
+from flask import current_app
+
+RECENT_DAYS = 7
+
+
+class DashboardStats:
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._stale = False  # reload on the next read, whatever its age
+        self._generation = 0  # bumped by every change
+        self._loading = False
+
+    # --- loading ---
+
+    def _load(self, cursor):
+        snapshot = {}
+        for key, table in (('total_series', 'DRY_SERIES'),
+                           ('total_viewers', 'DRY_VIEWER'),
+                           ('total_feedback', 'DRY_FEEDBACK')):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            snapshot[key] = cursor.fetchone()[0]
+
+        cursor.execute("""
+            SELECT FDATE, COUNT(*) FROM DRY_FEEDBACK
+            WHERE FDATE >= CURDATE() - INTERVAL %s DAY
+            GROUP BY FDATE
+        """, (RECENT_DAYS,))
+        snapshot['feedback_by_date'] = dict(cursor.fetchall())
+
+        cursor.execute("""
+            SELECT s.SID, s.SNAME, COALESCE(ss.RATING_SUM, 0), COALESCE(ss.RATING_COUNT, 0)
+            FROM DRY_SERIES s
+            LEFT JOIN DRY_SERIES_STATS ss ON ss.SID = s.SID
+        """)
+        snapshot['series'] = {sid: [name, int(total), count] for sid, name, total, count in cursor.fetchall()}
+        return snapshot
+
+    def get(self, cursor, refresh=False):
+        """Returns the dashboard payload; ``cursor`` must be a tuple cursor."""
+        with self._lock:
+            expired = self._stale or time.monotonic() - self._loaded_at > self.ttl
+            if self._snapshot is not None and not refresh and (not expired or self._loading):
+                # Another request is already reloading an expired snapshot
+                return self._payload()
+            self._loading = True
+            generation = self._generation
+
+        # Queried without the lock, so writers and other readers are not
+        # held up while MySQL counts
+        loaded_at = time.monotonic()
+        try:
+            snapshot = self._load(cursor)
+        finally:
+            with self._lock:
+                self._loading = False
+
+        with self._lock:
+            if generation == self._generation or self._snapshot is None:
+                self._snapshot = snapshot
+                # A change recorded while loading may be missing from (or
+                # counted twice in) the snapshot: reload on the next read
+                self._loaded_at = loaded_at
+                self._stale = generation != self._generation
+            return self._payload()
+
+    def _payload(self):
+        snapshot = self._snapshot
+        since = datetime.date.today() - datetime.timedelta(days=RECENT_DAYS)
+        rated = ((total / count, name) for name, total, count in snapshot['series'].values() if count)
+        top = heapq.nsmallest(5, rated, key=lambda item: (-item[0], item[1]))
+        return {
+            "total_series": snapshot['total_series'],
+            "total_viewers": snapshot['total_viewers'],
+            "total_feedback": snapshot['total_feedback'],
+            "recent_feedback": sum(n for day, n in snapshot['feedback_by_date'].items() if day >= since),
+            "top_series": [{"SNAME": name, "avg_rating": round(avg, 4)} for avg, name in top],
+            "as_of_seconds_ago": round(time.monotonic() - self._loaded_at, 1),
+        }
+
+    # --- maintenance ---
+
+    def _update(self, fn):
+        with self._lock:
+            self._generation += 1
+            if self._snapshot is not None:
+                fn(self._snapshot)
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def viewer_added(self):
+        def apply(s):
+            s['total_viewers'] += 1
+        self._update(apply)
+
+    def series_saved(self, sid, sname):
+        def apply(s):
+            if sid not in s['series']:
+                s['total_series'] += 1
+                s['series'][sid] = [sname, 0, 0]
+            else:
+                s['series'][sid][0] = sname
+        self._update(apply)
+
+    def feedback_changed(self, sid, old_rate=None, new_rate=None, old_date=None, new_date=None):
+        """Records an insert (new only), update (both) or delete (old only)."""
+        def apply(s):
+            if old_rate is None and new_rate is not None:
+                s['total_feedback'] += 1
+            elif new_rate is None and old_rate is not None:
+                s['total_feedback'] -= 1
+            by_date = s['feedback_by_date']
+            if old_date is not None and by_date.get(old_date):
+                by_date[old_date] -= 1
+            if new_date is not None:
+                by_date[new_date] = by_date.get(new_date, 0) + 1
+            series = s['series'].get(sid)
+            if series is not None:
+                if old_rate is not None:
+                    series[1] -= old_rate
+                    series[2] -= 1
+                if new_rate is not None:
+                    series[1] += new_rate
+                    series[2] += 1
+        self._update(apply)
+
+
+def get_stats():
+    return current_app.extensions['dashboard_stats']
+
+
+def init_app(app):
+    app.extensions['dashboard_stats'] = DashboardStats(ttl=app.config['DASHBOARD_STATS_TTL'])
@@ -1,21 +1,354 @@
+import threading
+import time
+from collections import deque
+
 import mysql.connector
-from flask import current_app, g
+from flask import current_app, g, has_app_context
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be acquired within the pool timeout."""
+
+
+class ConnectionPool:
+    """A small thread-safe MySQL connection pool.
+
+    Keeps up to ``size`` idle connections around and allows ``max_overflow``
+    extra connections under load. Connections older than ``recycle`` seconds
+    are closed instead of being reused, and idle connections can be pinged
+    before being handed out (``pre_ping``).
+    """
+
+    def __init__(self, connect_args, size=5, max_overflow=10, recycle=3600,
+                 pre_ping=True, timeout=10.0):
+        self.connect_args = connect_args
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+
+        self._idle = deque()  # (connection, created_at)
+        self._created_at = {}  # id(connection) -> created_at
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        # Monitoring counters
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._connects = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.connect_args)
+        self._connects += 1
+        return conn
+
+    def _total(self):
+        return self._in_use + len(self._idle)
+
+    def _is_stale(self, created_at):
+        return self.recycle > 0 and time.monotonic() - created_at > self.recycle
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool has capacity."""
+        deadline = None
+        waited_since = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._total() < self.size + self.max_overflow:
+                    conn, created_at = None, None
+                    self._in_use += 1
+                    break
+
+                # Pool exhausted: wait for a connection to be released
+                now = time.monotonic()
+                if waited_since is None:
+                    waited_since = now
+                    deadline = now + self.timeout
+                    self._waits += 1
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += now - waited_since
+                    raise PoolTimeout(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._wait_time += time.monotonic() - waited_since
+
+        # Network work (ping / connect) happens outside the lock
+        try:
+            if conn is not None and self._is_stale(created_at):
+                self._recycled += 1
+                self._discard(conn)
+                conn = None
+            if conn is not None and self.pre_ping:
+                try:
+                    conn.ping(reconnect=False)
+                except mysql.connector.Error:
+                    self._ping_failures += 1
+                    self._discard(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+                created_at = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self._created_at[id(conn)] = created_at
+        return conn
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool."""
+        created_at = self._created_at.pop(id(conn), time.monotonic())
+        reusable = not self._is_stale(created_at)
+        if reusable:
+            try:
+                # End any open transaction (including the implicit one
+                # started by a plain SELECT) so the next borrower does not
+                # inherit locks or a stale snapshot.
+                if conn.in_transaction:
+                    conn.rollback()
+            except mysql.connector.Error:
+                reusable = False
+        else:
+            self._recycled += 1
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((conn, created_at))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """Close all idle connections."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def after_fork(self):
+        """Forgets the connections inherited from the parent process.
+
+        Call in a forked child before using the pool. The inherited sockets
+        are shared with the parent, so they are dropped without being closed.
+        """
+        self._idle.clear()
+        self._created_at.clear()
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waits": self._waits,
+                "wait_time_seconds": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+                "connects": self._connects,
+                "recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+            }
+
+
+class QueryStats:
+    """SQL statements, time spent in the driver and rows fetched."""
+
+    __slots__ = ('queries', 'seconds', 'rows')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+def query_stats():
+    """Returns the QueryStats of the current app context (request or CLI)."""
+    if 'query_stats' not in g:
+        g.query_stats = QueryStats()
+    return g.query_stats
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that adds statement count, time and rows to query_stats().
+
+    Fetches are timed too, since unbuffered cursors read rows lazily. When
+    the connection is watched (see InstrumentedConnection) write statements
+    are also remembered until the transaction ends.
+    """
+
+    def __init__(self, cursor, connection=None):
+        self._cursor = cursor
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield row
+            self._record(0, 0.0, 1)
+
+    def _record(self, queries, seconds, rows):
+        if has_app_context():
+            stats = query_stats()
+            stats.queries += queries
+            stats.seconds += seconds
+            stats.rows += rows
+
+    def _timed(self, fn, *args, queries=0):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record(queries, time.perf_counter() - start, 0)
+
+    def _track_write(self, operation):
+        conn = self._connection
+        if conn is not None and conn.on_commit is not None and is_write(operation):
+            statement = self._cursor.statement
+            if isinstance(statement, (bytes, bytearray)):
+                statement = statement.decode('utf-8', 'replace')
+            conn.writes.append(statement or operation)
+
+    def execute(self, operation, params=None):
+        result = self._timed(self._cursor.execute, operation, params, queries=1)
+        self._track_write(operation)
+        return result
+
+    def executemany(self, operation, seq_params):
+        result = self._timed(self._cursor.executemany, operation, seq_params, queries=1)
+        self._track_write(operation)
+        return result
+
+    def callproc(self, procname, args=()):
+        return self._timed(self._cursor.callproc, procname, args, queries=1)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._record(0, 0.0, 1)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._timed(self._cursor.fetchmany, size)
+        self._record(0, 0.0, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._record(0, 0.0, len(rows))
+        return rows
+
+
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def is_write(operation):
+    """True for INSERT / UPDATE / DELETE / REPLACE statements."""
+    if isinstance(operation, (bytes, bytearray)):
+        operation = operation.decode('utf-8', 'replace')
+    return operation.lstrip()[:7].upper().startswith(_WRITE_PREFIXES)
+
+
+class InstrumentedConnection:
+    """Connection wrapper handing out InstrumentedCursors.
+
+    Setting ``on_commit`` watches the connection: the write statements of
+    each committed transaction (with their parameters interpolated) are
+    passed to it as a list after the commit; rolled back ones are forgotten.
+    """
+
+    def __init__(self, conn):
+        self.raw = conn
+        self.on_commit = None
+        self.writes = []
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw.cursor(*args, **kwargs), self)
+
+    def commit(self):
+        self.raw.commit()
+        writes, self.writes = self.writes, []
+        if writes and self.on_commit is not None:
+            self.on_commit(writes)
+
+    def rollback(self):
+        self.writes = []
+        self.raw.rollback()
+
+
+def create_pool(config):
+    connect_args = dict(
+        host=config['MYSQL_HOST'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        database=config['MYSQL_DB'],
+        port=config['MYSQL_PORT'],
+    )
+    if config['MYSQL_USE_PURE']:
+        # The C extension blocks the whole process under gevent
+        connect_args['use_pure'] = True
+    return ConnectionPool(
+        connect_args,
+        size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_POOL_MAX_OVERFLOW'],
+        recycle=config['DB_POOL_RECYCLE'],
+        pre_ping=config['DB_POOL_PRE_PING'],
+        timeout=config['DB_POOL_TIMEOUT'],
+    )
+
+
+def get_pool():
+    return current_app.extensions['db_pool']
+
 
 def get_db():
     if 'db' not in g:
-        g.db = mysql.connector.connect(
-            host=current_app.config['MYSQL_HOST'],
-            user=current_app.config['MYSQL_USER'],
-            password=current_app.config['MYSQL_PASSWORD'],
-            database=current_app.config['MYSQL_DB'],
-            port=current_app.config['MYSQL_PORT']
-        )
+        g.db = InstrumentedConnection(get_pool().acquire())
     return g.db
 
+
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        get_pool().release(db.raw)
+
+
+def pool_stats():
+    return get_pool().stats()
+
 
 def init_app(app):
+    app.extensions['db_pool'] = create_pool(app.config)
+    app.extensions.setdefault('fork_handlers', []).append(app.extensions['db_pool'].after_fork)
     app.teardown_appcontext(close_db)
@@ -0,0 +1,193 @@
+"""In-memory inverted index for the genre / language / country filters.
+
+Each facet value maps to the set of SIDs carrying it, built from
+DRY_SERIES_TYPE, DRY_SERIES.ORI_LANG and DRY_SERIES_RELEASE_COUNTRY.
+Filtering the catalog then becomes set algebra instead of extra joins, and
+the countries listed for a series are no longer narrowed by the country
+filter. Values match case-insensitively (``?genre=drama`` finds Drama).
+
+Series being deleted (see series_deletion) are left out. Admin series
+writes, including a deletion request, mark the affected SID dirty (via
+``changes``); dirty series are reloaded on the next query. The whole index
+is rebuilt after ``FACET_INDEX_TTL`` seconds to pick up writes handled by
+other workers.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+import changes
+
+FACETS = ('genre', 'language', 'country')
+
+_FACET_QUERIES = {
+    'genre': "SELECT SID, TNAME FROM DRY_SERIES_TYPE",
+    'language': "SELECT SID, ORI_LANG FROM DRY_SERIES",
+    'country': "SELECT SID, CID FROM DRY_SERIES_RELEASE_COUNTRY",
+}
+
+
+class FacetIndex:
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Values are indexed casefolded, like the case-insensitive collation
+        # the filters used to be compared under; _labels keeps how they are shown
+        self._postings = {facet: defaultdict(set) for facet in FACETS}
+        self._labels = {facet: {} for facet in FACETS}
+        self._series = {}  # sid -> {facet: set(casefolded values)}
+        self._built_at = None
+        self._generation = 0  # bumped when the whole index must be rebuilt
+        self._built_generation = 0
+        self._dirty = set()
+        self._loading = False
+
+    # --- maintenance ---
+
+    def mark_dirty(self, table, sid=None):
+        with self._lock:
+            if sid is None:
+                self._generation += 1
+            else:
+                self._dirty.add(int(sid))
+
+    def _load(self, cursor, sids=None):
+        """Reads facet values for ``sids`` (all series when None)."""
+        loaded = defaultdict(lambda: {facet: set() for facet in FACETS})
+        if sids is None:
+            cursor.execute("SELECT SID FROM DRY_SERIES")
+            for (sid,) in cursor.fetchall():
+                loaded[sid]
+            where, params = '', ()
+        else:
+            placeholders = ', '.join(['%s'] * len(sids))
+            where, params = f" WHERE SID IN ({placeholders})", tuple(sids)
+        for facet, query in _FACET_QUERIES.items():
+            cursor.execute(query + where, params)
+            for sid, value in cursor.fetchall():
+                loaded[sid][facet].add(str(value))
+        # Tombstoned series are hidden from viewers and so from the counts
+        pending = "SELECT SID FROM DRY_SERIES_DELETION WHERE FINISHED_AT IS NULL"
+        cursor.execute(pending + where.replace(' WHERE ', ' AND '), params)
+        for (sid,) in cursor.fetchall():
+            loaded.pop(sid, None)
+        return loaded
+
+    def _unindex(self, sid):
+        for facet, keys in self._series.pop(sid, {}).items():
+            for key in keys:
+                posting = self._postings[facet].get(key)
+                if posting is not None:
+                    posting.discard(sid)
+                    if not posting:
+                        del self._postings[facet][key]
+                        self._labels[facet].pop(key, None)
+
+    def _index(self, sid, facet_values):
+        self._series[sid] = {facet: set() for facet in facet_values}
+        for facet, values in facet_values.items():
+            for value in values:
+                key = value.casefold()
+                self._series[sid][facet].add(key)
+                self._postings[facet][key].add(sid)
+                self._labels[facet].setdefault(key, value)
+
+    def ensure_fresh(self, cursor):
+        """Rebuilds the index or reloads dirty series as needed.
+
+        ``cursor`` must be a tuple (non-dictionary) cursor. MySQL is queried
+        without the lock; while one request reloads, the others filter with
+        the index as it is.
+        """
+        with self._lock:
+            if self._loading and self._built_at is not None:
+                return
+            rebuild = (self._built_at is None or self._built_generation != self._generation
+                       or time.monotonic() - self._built_at > self.ttl)
+            if not rebuild and not self._dirty:
+                return
+            generation = self._generation
+            dirty = sorted(self._dirty)
+            self._dirty.clear()
+            self._loading = True
+
+        started = time.monotonic()
+        try:
+            if rebuild:
+                fresh = FacetIndex(self.ttl)
+                for sid, facet_values in self._load(cursor).items():
+                    fresh._index(sid, facet_values)
+            else:
+                loaded = self._load(cursor, dirty)
+        except Exception:
+            with self._lock:
+                self._dirty.update(dirty)
+                self._loading = False
+            raise
+
+        with self._lock:
+            self._loading = False
+            if rebuild:
+                # Series marked dirty while loading stay dirty for the next query
+                self._postings, self._labels, self._series = fresh._postings, fresh._labels, fresh._series
+                self._built_at = started
+                self._built_generation = generation
+            else:
+                for sid in dirty:
+                    self._unindex(sid)
+                    # Series that no longer exist have no row in DRY_SERIES
+                    if sid in loaded and loaded[sid]['language']:
+                        self._index(sid, loaded[sid])
+
+    # --- queries ---
+
+    def _match(self, facet, values, mode):
+        postings = [self._postings[facet].get(str(v).casefold(), set()) for v in values]
+        if mode == 'and':
+            return set.intersection(*postings)
+        return set().union(*postings)
+
+    def search(self, selection, modes=None):
+        """Returns ``(sids, facet_counts)`` for a selection.
+
+        ``selection`` maps a facet to the list of requested values; values
+        of one facet are OR-ed unless ``modes[facet] == 'and'``, and
+        different facets are AND-ed. ``facet_counts`` gives, for every value
+        of every facet, how many series carry that value and match the
+        selections of the other facets; the selection of the value's own
+        facet is ignored, so it is not the result size of adding the value
+        to an OR (or AND) selection.
+        """
+        modes = modes or {}
+        with self._lock:
+            matches = {
+                facet: self._match(facet, values, modes.get(facet, 'or'))
+                for facet, values in selection.items() if values
+            }
+            universe = set(self._series)
+
+            sids = universe.intersection(*matches.values()) if matches else universe
+
+            facet_counts = {}
+            for facet in FACETS:
+                others = [m for f, m in matches.items() if f != facet]
+                base = universe.intersection(*others) if others else universe
+                labels = self._labels[facet]
+                facet_counts[facet] = {
+                    labels[key]: len(posting & base)
+                    for key, posting in sorted(self._postings[facet].items(), key=lambda item: labels[item[0]])
+                }
+        return sids, facet_counts
+
+
+def get_index():
+    return current_app.extensions['facet_index']
+
+
+def init_app(app):
+    index = FacetIndex(ttl=app.config['FACET_INDEX_TTL'])
+    changes.subscribe((changes.SERIES,), index.mark_dirty)
+    app.extensions['facet_index'] = index
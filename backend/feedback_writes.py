@@ -0,0 +1,300 @@
+"""Feedback submission writes: one multi-row upsert, optionally write-behind.
+
+``write_feedback`` stores any number of submissions with a single
+``INSERT ... ON DUPLICATE KEY UPDATE``. DRY_SERIES_STATS and the dashboard
+need the rating delta, so the stored rows are first read with
+``SELECT ... FOR UPDATE``, in primary key order. For submissions without a
+row yet that read takes gap locks, and two batches inserting into the same
+gap can still deadlock; the queue retries those (see ``lock_conflict``).
+
+With ``FEEDBACK_WRITE_MODE=queue`` submissions are acknowledged with 202 and
+put on an in-process queue, which a background thread flushes as one
+transaction every ``FEEDBACK_FLUSH_MS`` milliseconds or as soon as
+``FEEDBACK_FLUSH_ROWS`` submissions are pending. Repeated submissions of the
+same viewer for the same series within a batch collapse to the last one.
+
+Durability in queue mode: an acknowledged submission is only in memory until
+its batch commits, so it is lost if the process is killed before the next
+flush (pending items are flushed on normal interpreter exit). Batches that
+cannot get a connection, lose it or hit a lock conflict are requeued (only
+the rows not yet committed). A batch that fails for any other reason is
+retried one row at a time; rows that still fail (e.g. the series was
+deleted) are dropped, logged and counted in ``rows_failed``, so one bad row
+cannot block the queue. Until the flush a viewer may not see their own
+submission. When the queue is full submissions fall back to the synchronous
+path.
+"""
+import atexit
+import logging
+import threading
+import time
+
+import mysql.connector
+from flask import current_app
+
+import changes
+import db
+import series_stats
+
+logger = logging.getLogger(__name__)
+
+
+UPSERT_SQL = """
+    INSERT INTO DRY_FEEDBACK (SID, ACCOUNT, RATE, FTEXT, FDATE)
+    VALUES {rows} AS new
+    ON DUPLICATE KEY UPDATE RATE = new.RATE, FTEXT = new.FTEXT, FDATE = new.FDATE
+"""
+
+PREVIOUS_SQL = """
+    SELECT SID, ACCOUNT, RATE, FDATE FROM DRY_FEEDBACK
+    WHERE (ACCOUNT, SID) IN ({keys})
+    FOR UPDATE
+"""
+
+
+def _previous(cursor, items):
+    """Locks the stored rows of ``items``; returns (sid, account) -> (rate, fdate)."""
+    cursor.execute(PREVIOUS_SQL.format(keys=', '.join(['(%s, %s)'] * len(items))),
+                   tuple(v for sid, account, *_ in items for v in (account, sid)))
+    return {(sid, account): (rate, fdate) for sid, account, rate, fdate in cursor.fetchall()}
+
+
+def write_feedback(cursor, items):
+    """Upserts ``(sid, account, rate, ftext, fdate)`` items in the current transaction.
+
+    ``cursor`` must be a tuple (non-dictionary) cursor and the items must
+    have distinct (sid, account) pairs. Returns ``(sid, account, old_rate,
+    new_rate, old_date, new_date)`` per item for ``after_commit``.
+    """
+    # Rows are locked in primary key order so concurrent batches cannot deadlock on them
+    items = sorted(items, key=lambda item: (item[1], item[0]))
+    existing = _previous(cursor, items)
+    cursor.execute(UPSERT_SQL.format(rows=', '.join(['(%s, %s, %s, %s, %s)'] * len(items))),
+                   tuple(v for item in items for v in item))
+
+    result = []
+    for sid, account, rate, _, fdate in items:
+        old_rate, old_date = existing.get((sid, account), (None, None))
+        result.append((sid, account, old_rate, rate, old_date, fdate))
+    series_stats.apply_changes(cursor, [(sid, old, new) for sid, _, old, new, _, _ in result])
+    return result
+
+
+def after_commit(written, dashboard_stats, recommender):
+    """Invalidates caches and updates the dashboard and recommender for committed writes."""
+    for sid in sorted({w[0] for w in written}):
+        changes.bump(changes.FEEDBACK, key=sid)
+    for sid, account, old_rate, new_rate, old_date, new_date in written:
+        dashboard_stats.feedback_changed(sid, old_rate=old_rate, new_rate=new_rate,
+                                         old_date=old_date, new_date=new_date)
+        recommender.rating_changed(account, sid, new_rate)
+
+
+def connection_error(err):
+    """True if ``err`` is about the connection (MySQL down or restarting), not the rows written."""
+    if isinstance(err, db.PoolTimeout) or isinstance(err, mysql.connector.InterfaceError):
+        return True
+    # Client errors (2000-2999): can't connect, server gone away, lost connection
+    return isinstance(err, mysql.connector.Error) and 2000 <= (err.errno or 0) < 3000
+
+
+def lock_conflict(err):
+    """True for a deadlock or lock wait timeout, after which the transaction can just be retried.
+
+    The locking read takes gap locks for submissions that have no row yet,
+    so two batches inserting into the same gap can deadlock on each other.
+    """
+    return isinstance(err, mysql.connector.Error) and err.errno in (1205, 1213)
+
+
+def _rollback(conn):
+    try:
+        conn.rollback()
+    except mysql.connector.Error:
+        pass
+
+
+class FeedbackWriter:
+    """Write-behind queue of feedback submissions, flushed in batches."""
+
+    def __init__(self, pool, dashboard_stats, recommender, flush_ms=200, flush_rows=500, max_pending=10000):
+        self.pool = pool
+        self.dashboard_stats = dashboard_stats
+        self.recommender = recommender
+        self.flush_interval = flush_ms / 1000
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+
+        self._pending = {}  # (sid, account) -> (item, queued_at); dicts keep insertion order
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # held while a batch is written
+        self._stopped = False
+        self._thread = None
+
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._rows_failed = 0
+        self._fallbacks = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def after_fork(self):
+        """Restarts the flush thread in a forked child, which does not inherit it."""
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queues a submission; returns False (caller writes it directly) if the queue is full."""
+        key = (item[0], item[1])
+        with self._cond:
+            if self._stopped or (len(self._pending) >= self.max_pending and key not in self._pending):
+                self._fallbacks += 1
+                return False
+            self._pending.pop(key, None)
+            self._pending[key] = (item, time.monotonic())
+            if len(self._pending) >= self.flush_rows:
+                self._cond.notify()
+        return True
+
+    def discard(self, sid, account):
+        """Drops a pending submission, waiting for a batch being written to commit.
+
+        Called before a synchronous delete so a queued submission cannot
+        re-create the row afterwards.
+        """
+        with self._flush_lock, self._cond:
+            self._pending.pop((sid, account), None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._pending) < self.flush_rows:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped and not self._pending:
+                    return
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            if not batch:
+                return
+            start = time.monotonic()
+            try:
+                written, unwritten = self._write([item for item, _ in batch])
+            except Exception as err:
+                if connection_error(err) or lock_conflict(err):
+                    written, unwritten = [], [item for item, _ in batch]
+                else:
+                    logger.exception("Feedback flush failed, %d submissions dropped", len(batch))
+                    written, unwritten = [], []
+            if unwritten:
+                # No connection (pool timeout, MySQL down) or a lock conflict:
+                # requeue what was not written, keeping any newer submission,
+                # and retry later
+                logger.warning("Feedback flush interrupted, %d submissions requeued", len(unwritten))
+                queued_at = {(item[0], item[1]): t for item, t in batch}
+                with self._cond:
+                    for item in unwritten:
+                        key = (item[0], item[1])
+                        self._pending.setdefault(key, (item, queued_at[key]))
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self._flushes += len(unwritten) < len(batch)
+                self._rows_flushed += len(written)
+                self._rows_failed += len(batch) - len(written) - len(unwritten)
+                self._flush_seconds += elapsed
+                self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                self._max_wait_seconds = max(self._max_wait_seconds, start - min(t for _, t in batch))
+        if written:
+            after_commit(written, self.dashboard_stats, self.recommender)
+
+    def _write(self, items):
+        """Writes ``items``; returns ``(written, unwritten)``.
+
+        Rows that fail for any other reason than the connection or a lock
+        conflict are dropped; after one of those the rows not yet written
+        are returned.
+        """
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        try:
+            try:
+                written = write_feedback(cursor, items)
+                conn.commit()
+                return written, []
+            except Exception as err:
+                _rollback(conn)
+                if connection_error(err) or lock_conflict(err):
+                    logger.error("Feedback flush interrupted: %s", err)
+                    return [], items
+            written = []
+            for i, item in enumerate(items):
+                try:
+                    written.extend(write_feedback(cursor, [item]))
+                    conn.commit()
+                except Exception as err:
+                    _rollback(conn)
+                    if connection_error(err) or lock_conflict(err):
+                        logger.error("Feedback flush interrupted: %s", err)
+                        return written, items[i:]
+                    logger.error("Dropped queued feedback for SID %s, account %s: %r", item[0], item[1], err)
+            return written, []
+        finally:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+            self.pool.release(conn)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def stats(self):
+        with self._cond:
+            oldest = min((t for _, t in self._pending.values()), default=None)
+            return {
+                "queue_depth": len(self._pending),
+                "oldest_pending_seconds": round(time.monotonic() - oldest, 3) if oldest else 0.0,
+                "flushes": self._flushes,
+                "rows_flushed": self._rows_flushed,
+                "rows_failed": self._rows_failed,
+                "sync_fallbacks": self._fallbacks,
+                "flush_seconds_total": round(self._flush_seconds, 6),
+                "flush_seconds_max": round(self._max_flush_seconds, 6),
+                "queue_wait_seconds_max": round(self._max_wait_seconds, 6),
+            }
+
+
+def get_writer():
+    """The write-behind queue, or None in synchronous mode."""
+    return current_app.extensions.get('feedback_writer')
+
+
+def init_app(app):
+    if app.config['FEEDBACK_WRITE_MODE'] != 'queue':
+        return
+    writer = FeedbackWriter(app.extensions['db_pool'], app.extensions['dashboard_stats'],
+                            app.extensions['recommender'],
+                            flush_ms=app.config['FEEDBACK_FLUSH_MS'],
+                            flush_rows=app.config['FEEDBACK_FLUSH_ROWS'],
+                            max_pending=app.config['FEEDBACK_QUEUE_MAX'])
+    writer.start()
+    app.extensions['feedback_writer'] = writer
+    app.extensions.setdefault('fork_handlers', []).append(writer.after_fork)
+    app.extensions.setdefault('metric_sources', {})['feedback_queue'] = writer.stats
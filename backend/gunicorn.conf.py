@@ -0,0 +1,78 @@
+"""Gunicorn settings for production: ``gunicorn -c gunicorn.conf.py``.
+
+Everything is tunable through environment variables:
+
+- GUNICORN_WORKER_CLASS: ``gthread`` (default), ``sync`` or ``gevent``
+- GUNICORN_WORKERS: processes (default 2 x CPUs + 1, at most 8)
+- GUNICORN_THREADS: threads per gthread worker (default 4)
+- GUNICORN_WORKER_CONNECTIONS: concurrent requests per gevent worker
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle a worker
+  after this many requests (0 disables)
+- GUNICORN_PRELOAD: import the app once in the master and fork workers
+  from it (faster start, shared memory); default true
+
+Each worker gets its own MySQL pool. Unless DB_POOL_SIZE is set, it is
+sized to the requests a worker can run at once (1 for sync, the thread
+count for gthread, 20 for gevent, which then waits for a connection), and
+the total across workers is checked against MYSQL_MAX_CONNECTIONS at start.
+
+``kill -HUP <master>`` replaces the workers gracefully, finishing
+in-flight requests first. With preload the new workers fork from the
+already loaded app, so code changes need a restart (or ``kill -USR2``).
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Patch before the app (and its locks and sockets) is imported in the master
+    from gevent import monkey
+    monkey.patch_all()
+    os.environ.setdefault('MYSQL_USE_PURE', 'true')
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))  # avoid recycling all at once
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# Connections per worker, read by config.Config when the app is loaded
+_concurrency = {'sync': 1, 'gthread': threads, 'gevent': 20}.get(worker_class, threads)
+os.environ.setdefault('DB_POOL_SIZE', str(_concurrency))
+
+
+def when_ready(server):
+    pool_size = int(os.environ['DB_POOL_SIZE'])
+    overflow = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+    limit = int(os.environ.get('MYSQL_MAX_CONNECTIONS', 151))
+    total = workers * (pool_size + overflow)
+    server.log.info("%d %s workers, up to %d MySQL connections each (%d total)",
+                    workers, worker_class, pool_size + overflow, total)
+    if total > limit:
+        server.log.warning("Workers may open %d MySQL connections, more than MYSQL_MAX_CONNECTIONS=%d; "
+                           "lower DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW or GUNICORN_WORKERS", total, limit)
+
+
+def post_worker_init(worker):
+    # With preload the worker forked from the master's app: connections,
+    # threads and process pools created there are not usable here
+    if worker.cfg.preload_app:
+        for handler in worker.wsgi.extensions.get('fork_handlers', ()):
+            handler()
+
+
+def worker_exit(server, worker):
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        app.extensions['db_pool'].dispose()
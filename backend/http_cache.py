@@ -0,0 +1,107 @@
+"""Conditional GETs (ETag / Last-Modified) for read-mostly endpoints.
+
+The ETag is a hash of the response body, so every worker process produces
+the same ETag for the same data. Each process also remembers, per URL, the
+ETag it last served together with the ``changes`` versions of the tables
+the response is built from. While those versions are unchanged, a request
+whose ``If-None-Match`` matches is answered with 304 before the view runs,
+i.e. without MySQL or JSON encoding. Otherwise the view runs and a matching
+ETag still turns the response into a 304.
+
+Versions only see writes made by the same process, so a remembered ETag is
+trusted for at most ``HTTP_ETAG_TTL`` seconds; that bounds how long a write
+handled by another worker can go unnoticed. Comparison is weak because
+nginx weakens ETags of the responses it gzips.
+
+``Last-Modified`` is the last change of those tables seen by the process.
+It differs between worker processes, so ``If-Modified-Since`` is not used
+to answer 304s; clients revalidate with the ETag.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from werkzeug.http import http_date, parse_etags
+
+import changes
+from cache import TTLCache
+
+
+class Validators:
+    """Per-process map of URL -> (table versions, ETag, Last-Modified)."""
+
+    def __init__(self, ttl=30, maxsize=1024):
+        self._known = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def lookup(self, key, tables):
+        """Returns ``(etag, last_modified)`` if still valid for the current versions."""
+        hit, entry = self._known.get(key)
+        if hit and entry[0] == changes.version(*tables):
+            return entry[1], entry[2]
+        return None
+
+    def remember(self, key, versions, tables, body):
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        last_modified = int(changes.last_modified(*tables))
+        self._known.set(key, (versions, etag, last_modified))
+        return etag, last_modified
+
+
+def not_modified(if_none_match, etag):
+    """True if the raw ``If-None-Match`` header matches ``etag``."""
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(etag)
+
+
+def validator_headers(etag, last_modified, cache_control):
+    return {
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+    }
+
+
+def cache_key(path, viewer_id=None):
+    """Key of a remembered ETag; per viewer for personalized responses."""
+    return path if viewer_id is None else f"{viewer_id}:{path}"
+
+
+def get_validators():
+    return current_app.extensions['http_validators']
+
+
+def conditional(*tables, cache_control='private, no-cache', per_viewer=False):
+    """Adds ETag / Last-Modified to a GET view built from ``tables`` and answers 304s.
+
+    ``per_viewer`` is needed when the response depends on the logged-in
+    viewer, so that one viewer's ETag never validates another's response.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            validators = get_validators()
+            key = cache_key(request.full_path, session.get('user_id') if per_viewer else None)
+            if_none_match = request.headers.get('If-None-Match')
+
+            known = validators.lookup(key, tables)
+            if known and not_modified(if_none_match, known[0]):
+                return current_app.response_class(
+                    status=304, headers=validator_headers(*known, cache_control))
+
+            # Versions from before the view runs: a concurrent write makes
+            # the remembered entry outdated rather than wrongly current
+            versions = changes.version(*tables)
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            etag, last_modified = validators.remember(key, versions, tables, response.get_data())
+            response.headers.update(validator_headers(etag, last_modified, cache_control))
+            if not_modified(if_none_match, etag):
+                response.status_code = 304
+                response.set_data(b'')
+            return response
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    app.extensions['http_validators'] = Validators(ttl=app.config['HTTP_ETAG_TTL'])
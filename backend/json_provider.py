@@ -0,0 +1,65 @@
+"""JSON encoding of responses with orjson.
+
+Flask's default provider encodes with the standard library and calls back
+into Python for every ``Decimal`` (turned into a string) and ``date``
+(turned into an HTTP date). ``OrjsonProvider`` encodes in C:
+
+* ``date`` / ``datetime`` as ISO 8601 (``2025-01-15``, ``2024-08-20T10:15:32``),
+  the format the API accepts back and ``<input type="date">`` expects;
+* ``Decimal`` (``AVG(RATE)``, ``EPISODE_PRICE``, ``MCHARGE``) as a JSON number,
+  like every other number, instead of a string;
+* ``bytes`` as UTF-8 text (base64 if not valid UTF-8);
+* NumPy scalars and arrays natively; dict keys that are not strings as strings.
+
+Only Decimal and bytes go through the Python ``default`` hook. Keys are not
+sorted. ``JSON_PROVIDER=default`` switches back to Flask's provider.
+"""
+import base64
+import datetime
+from decimal import Decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(value):
+    """Encodes the types orjson does not handle itself."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return base64.b64encode(raw).decode('ascii')
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    return orjson.dumps(obj, default=default, option=OPTIONS)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson; keyword arguments of dumps are ignored."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=default, option=OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+def init_app(app):
+    if app.config['JSON_PROVIDER'] == 'orjson':
+        app.json = OrjsonProvider(app)
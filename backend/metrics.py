@@ -0,0 +1,174 @@
+"""Per-endpoint request metrics in Prometheus text format.
+
+Every request records its latency, the number of SQL statements it ran,
+the time spent in the MySQL driver, the rows it fetched and the response
+size, labelled by HTTP method and route pattern. SQL figures come from the
+cursor wrapper in ``db`` (``db.query_stats()``).
+
+For streamed responses (?format=ndjson|stream) the latency is the time to
+the first byte and the size is unknown, so only the statements executed
+before the body starts count.
+
+Metrics are kept per worker process. ``GET /metrics`` needs an admin
+session or ``Authorization: Bearer <METRICS_TOKEN>`` when a token is set.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, jsonify, request, session
+
+import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        # Buckets are stored non-cumulatively and summed when exported
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def expose(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{_labels(label_names, labels)}}} {_number(value)}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    """Thread-safe registry of the per-route request metrics."""
+
+    LABELS = ('method', 'route')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter('http_requests_total', "HTTP requests by status code.")
+        self.histograms = (
+            Histogram('http_request_duration_seconds', "Request latency.", LATENCY_BUCKETS),
+            Histogram('http_request_sql_queries', "SQL statements per request.", QUERY_BUCKETS),
+            Histogram('http_request_sql_duration_seconds', "Time spent in SQL per request.", LATENCY_BUCKETS),
+            Histogram('http_request_sql_rows', "Rows fetched from MySQL per request.", ROW_BUCKETS),
+            Histogram('http_response_size_bytes', "Response body size (non-streamed responses).", SIZE_BUCKETS),
+        )
+
+    def observe(self, method, route, status, seconds, stats, size):
+        labels = (method, route)
+        duration, queries, sql_seconds, rows, response_size = self.histograms
+        with self._lock:
+            self.requests.inc((method, route, str(status)))
+            duration.observe(labels, seconds)
+            queries.observe(labels, stats.queries)
+            sql_seconds.observe(labels, stats.seconds)
+            rows.observe(labels, stats.rows)
+            if size is not None:
+                response_size.observe(labels, size)
+
+    def expose(self):
+        with self._lock:
+            lines = self.requests.expose(self.LABELS + ('status',))
+            for histogram in self.histograms:
+                lines.extend(histogram.expose(self.LABELS))
+        # Other components' counters, exported as gauges named <source>_<key>
+        for source, collect in current_app.extensions.get('metric_sources', {}).items():
+            for key, value in collect().items():
+                name = f"{source}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    stats = db.query_stats()
+    # Route patterns, not raw paths, to keep label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    size = None if response.is_streamed else response.calculate_content_length()
+
+    current_app.extensions['request_metrics'].observe(
+        request.method, route, response.status_code, elapsed, stats, size)
+
+    threshold = current_app.config['SLOW_REQUEST_MS']
+    if threshold and elapsed * 1000 >= threshold:
+        current_app.logger.warning(
+            "Slow request %s %s: %.1f ms, %d SQL statements (%.1f ms), %d rows",
+            request.method, request.full_path.rstrip('?'), elapsed * 1000,
+            stats.queries, stats.seconds * 1000, stats.rows)
+    return response
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    authorized = session.get('role') == 'admin' or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"))
+    if not authorized:
+        return jsonify({"error": "Access denied. Admin role required."}), 403
+    return Response(current_app.extensions['request_metrics'].expose(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.extensions.setdefault('metric_sources', {})['db_pool'] = app.extensions['db_pool'].stats
+    app.before_request(_start_timer)
+    app.after_request(_record)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,61 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor token we did not issue."""
+
+
+def _to_json(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    """Encodes the sort key of the last row on a page into an opaque token."""
+    raw = json.dumps([_to_json(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decodes a token produced by encode_cursor into a list of ``size`` values."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def decode_offset(token):
+    """Decodes the cursor of an offset-paginated listing into a non-negative int."""
+    offset = decode_cursor(token, 1)[0]
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise InvalidCursor("Malformed cursor")
+    return offset
+
+
+def page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Reads ``?limit=`` from the request, clamped to [1, maximum]."""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def flag(name):
+    """Reads a boolean query flag such as ``?include_total=1``."""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
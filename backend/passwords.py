@@ -0,0 +1,172 @@
+"""Password hashing and verification on a process pool.
+
+PBKDF2/scrypt cost a large, fixed amount of CPU per call. Running them on the
+request thread ties up a worker for the whole hash and lets a burst of
+logins use every core the app has. ``PasswordHasher`` runs them on
+``PASSWORD_HASH_WORKERS`` separate processes instead, admitting at most
+``PASSWORD_HASH_QUEUE`` calls beyond the busy workers. Any further call is
+rejected immediately with ``HasherBusy`` (HTTP 503) rather than piling up.
+With 0 workers hashes are computed on the calling thread, as before.
+
+The cost parameters come from ``PASSWORD_HASH_METHOD`` (a werkzeug method
+string, e.g. ``pbkdf2:sha256:1000000`` or ``scrypt:32768:8:1``) and
+``PASSWORD_SALT_LENGTH``. Stored hashes made with other parameters still
+verify, and ``needs_rehash`` tells login to replace them.
+
+The pool is started on first use in each process (so gunicorn workers each
+get their own) using the ``spawn`` start method, which is safe next to the
+threads the app already runs but re-imports the main module in the workers:
+scripts that create the app must use an ``if __name__ == '__main__'`` guard.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Parameters werkzeug fills in when a method string leaves them out
+_METHOD_DEFAULTS = {
+    'pbkdf2': ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)],
+    'scrypt': ['scrypt', '32768', '8', '1'],
+}
+
+
+class HasherBusy(Exception):
+    """Every hashing worker is busy and the wait queue is full."""
+
+
+def normalize_method(method):
+    """Spells out the default parameters, as they appear in stored hashes."""
+    parts = method.split(':')
+    if parts[0] not in _METHOD_DEFAULTS:
+        raise ValueError(f"Unsupported password hash method: {method}")
+    defaults = _METHOD_DEFAULTS[parts[0]]
+    return ':'.join(parts + defaults[len(parts):])
+
+
+def hash_password(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def verify_password(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+
+    def __init__(self, method='pbkdf2:sha256', salt_length=16, workers=2, max_pending=32, timeout=30):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout  # seconds a caller waits for its result
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self._calls = 0
+        self._rejected = 0
+        self._in_flight = 0
+        self._seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            if not self.workers:
+                return fn(*args)
+            if not self._slots.acquire(blocking=False):
+                with self._lock:
+                    self._rejected += 1
+                raise HasherBusy(f"{self.workers + self.max_pending} password hashes already in progress")
+            with self._lock:
+                self._in_flight += 1
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died: start a fresh pool on the next call
+                with self._lock:
+                    self._executor = None
+                self._release()
+                raise HasherBusy("Password hashing workers restarted")
+            except BaseException:
+                self._release()
+                raise
+            # The slot stays taken until the worker is done, even if we stop waiting
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise HasherBusy(f"Password hashing took longer than {self.timeout}s")
+            except BrokenProcessPool:
+                with self._lock:
+                    self._executor = None
+                raise HasherBusy("Password hashing workers restarted")
+        finally:
+            with self._lock:
+                self._calls += 1
+                self._seconds += time.perf_counter() - start
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(verify_password, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with other parameters than the configured ones."""
+        method, _, rest = pwhash.partition('$')
+        return method != self.method or len(rest.partition('$')[0]) != self.salt_length
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "calls": self._calls,
+                "rejected": self._rejected,
+                "seconds_total": round(self._seconds, 6),
+            }
+
+    def after_fork(self):
+        """Drops a process pool inherited from the parent; a new one starts on first use."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending) if self.workers else None
+        self._in_flight = 0
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def init_app(app):
+    hasher = PasswordHasher(method=app.config['PASSWORD_HASH_METHOD'],
+                            salt_length=app.config['PASSWORD_SALT_LENGTH'],
+                            workers=app.config['PASSWORD_HASH_WORKERS'],
+                            max_pending=app.config['PASSWORD_HASH_QUEUE'],
+                            timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    app.extensions['password_hasher'] = hasher
+    app.extensions.setdefault('fork_handlers', []).append(hasher.after_fork)
+    app.extensions.setdefault('metric_sources', {})['password_hasher'] = hasher.stats
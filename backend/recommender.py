@@ -0,0 +1,283 @@
+"""Personalized series recommendations from an item-item similarity model.
+
+A background thread rebuilds the model from every rating in DRY_FEEDBACK:
+
+1. a sparse viewer x series matrix (SciPy CSR) of the ratings, with each
+   viewer's ratings centred on their mean;
+2. the cosine similarity of every pair of series columns, computed as
+   sparse matrix products over blocks of series and shrunk towards 0 when
+   few viewers rated both (``sim * common / (common + SHRINKAGE)``);
+3. per series, only its ``RECOMMENDER_NEIGHBOURS`` most similar series
+   with a positive similarity.
+
+A viewer's score for a series is the sum, over the series they rated, of
+the neighbour similarity times how far their rating is from the global mean
+rating. That is two NumPy operations over at most (rated x neighbours)
+entries and no MySQL. Series the viewer already rated are excluded; viewers
+without ratings (cold start) or with too few scored series are filled up
+from the global top by average rating. Until the first model is built,
+``GetTopSeriesByRating`` is used as before.
+
+Ratings written or deleted through this process apply to the viewer's own
+exclusions right away. New similarities, and ratings written by other
+worker processes, arrive with the next rebuild, at most
+``RECOMMENDER_REBUILD_INTERVAL`` seconds later; series changes trigger an
+earlier one.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from scipy import sparse
+
+import changes
+import series_deletion
+
+logger = logging.getLogger(__name__)
+
+SHRINKAGE = 10  # common raters at which a similarity keeps half its value
+BLOCK_SIZE = 1024  # series per similarity block, bounds memory to BLOCK_SIZE x series
+FETCH_SIZE = 10000
+RETRY_AFTER = 30  # seconds before retrying a failed rebuild
+
+SERIES_SQL = f"""
+    SELECT s.SID, s.SNAME, s.ORI_LANG, ss.RATING_SUM / ss.RATING_COUNT AS avg_rating
+    FROM DRY_SERIES s
+    LEFT JOIN DRY_SERIES_STATS ss ON ss.SID = s.SID AND ss.RATING_COUNT > 0
+    WHERE {series_deletion.not_deleted('s')}
+"""
+RATINGS_SQL = "SELECT ACCOUNT, SID, RATE FROM DRY_FEEDBACK"
+
+
+def load(cursor):
+    """Reads series and ratings; ``cursor`` must be a tuple cursor.
+
+    Returns ``(series, ratings)``: SID -> response row, and an int array of
+    (account, sid, rate) rows.
+    """
+    cursor.execute(SERIES_SQL)
+    series = {
+        sid: {"SID": sid, "SNAME": name, "ORI_LANG": lang,
+              "avg_rating": None if avg is None else round(float(avg), 4)}
+        for sid, name, lang, avg in cursor.fetchall()
+    }
+    cursor.execute(RATINGS_SQL)
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    ratings = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    return series, ratings
+
+
+class Model:
+    """Top-K neighbours per series plus each viewer's ratings, read-only once built."""
+
+    def __init__(self, series, ratings, neighbours=20):
+        self.series = series
+        rated_series = [row for row in series.values() if row['avg_rating'] is not None]
+        self.top = [row['SID'] for row in sorted(rated_series, key=lambda row: (-row['avg_rating'], row['SID']))]
+
+        accounts, rows = np.unique(ratings[:, 0], return_inverse=True)
+        self.sids, cols = np.unique(ratings[:, 1], return_inverse=True)
+        rates = ratings[:, 2].astype(np.float32)
+        self.account_rows = {int(a): i for i, a in enumerate(accounts)}
+        self.col_of = {int(sid): i for i, sid in enumerate(self.sids)}
+        self.mean = float(rates.mean()) if len(rates) else 0.0
+        self.ratings = sparse.csr_matrix((rates, (rows.ravel(), cols.ravel())),
+                                         shape=(len(accounts), len(self.sids)))
+        self.neighbours, self.similarities = self._neighbours(neighbours)
+
+    def _neighbours(self, k):
+        ratings = self.ratings
+        n = ratings.shape[1]
+        k = max(0, min(k, n - 1))
+        neighbours = np.zeros((n, k), dtype=np.int32)
+        similarities = np.zeros((n, k), dtype=np.float32)
+        if k == 0:
+            return neighbours, similarities
+
+        counts = np.diff(ratings.indptr)
+        means = np.asarray(ratings.sum(axis=1)).ravel() / np.maximum(counts, 1)
+        centred = ratings.copy()
+        centred.data -= np.repeat(means, counts).astype(np.float32)
+        norms = np.sqrt(np.asarray(centred.multiply(centred).sum(axis=0)).ravel())
+        inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        normalized = (centred @ sparse.diags(inverse.astype(np.float32))).tocsc()
+        rated = ratings.copy().tocsc()
+        rated.data[:] = 1
+
+        for start in range(0, n, BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, n)
+            sim = (normalized[:, start:stop].T @ normalized).toarray()
+            common = (rated[:, start:stop].T @ rated).toarray()
+            sim *= common / (common + SHRINKAGE)
+            sim[np.arange(stop - start), np.arange(start, stop)] = 0  # a series is not its own neighbour
+            top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+            top_sim = np.take_along_axis(sim, top, axis=1)
+            order = np.argsort(-top_sim, axis=1)
+            neighbours[start:stop] = np.take_along_axis(top, order, axis=1)
+            similarities[start:stop] = np.maximum(np.take_along_axis(top_sim, order, axis=1), 0)
+        return neighbours, similarities
+
+    def recommend(self, account, limit, changed=None):
+        """Returns up to ``limit`` series rows for ``account``.
+
+        ``changed`` maps SIDs to the viewer's ratings written since the
+        model was built (``None`` for deleted ones).
+        """
+        rated = {}
+        row = self.account_rows.get(account)
+        if row is not None:
+            lo, hi = self.ratings.indptr[row], self.ratings.indptr[row + 1]
+            rated = dict(zip(self.sids[self.ratings.indices[lo:hi]].tolist(),
+                             self.ratings.data[lo:hi].tolist()))
+        for sid, rate in (changed or {}).items():
+            if rate is None:
+                rated.pop(sid, None)
+            else:
+                rated[sid] = rate
+
+        picks = []
+        known = [(self.col_of[sid], rate) for sid, rate in rated.items() if sid in self.col_of]
+        if known and self.neighbours.shape[1]:
+            cols = np.array([col for col, _ in known], dtype=np.int64)
+            weights = np.array([rate for _, rate in known], dtype=np.float32) - self.mean
+            scores = np.bincount(self.neighbours[cols].ravel(),
+                                 weights=(self.similarities[cols] * weights[:, None]).ravel(),
+                                 minlength=len(self.sids))
+            scores[cols] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            picks = [sid for sid in self.sids[candidates].tolist() if sid in self.series]
+
+        for sid in self.top:
+            if len(picks) >= limit:
+                break
+            if sid not in rated and sid not in picks:
+                picks.append(sid)
+        return [self.series[sid] for sid in picks]
+
+
+class Recommender:
+    """Serves recommendations from the current model and rebuilds it in the background."""
+
+    def __init__(self, pool, neighbours=20, rebuild_interval=300, limit=5):
+        self.pool = pool
+        self.neighbours = neighbours
+        self.rebuild_interval = rebuild_interval
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._model = None
+        self._next_build = 0.0  # monotonic time of the next rebuild
+        self._generation = 0  # bumped by invalidate()
+        self._thread = None
+        self._changed = {}  # account -> {sid: (rate or None, monotonic time)}
+
+        self._built_at = None
+        self._builds = 0
+        self._failures = 0
+        self._build_seconds = 0.0
+
+    def rating_changed(self, account, sid, rate):
+        """Records a committed rating (``None`` if deleted) of ``account``."""
+        with self._lock:
+            self._changed.setdefault(account, {})[sid] = (rate, time.monotonic())
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._generation += 1
+            self._next_build = 0.0
+
+    def recommend(self, account):
+        """Returns the viewer's recommendations, or None while no model is built yet."""
+        with self._lock:
+            if self._next_build <= time.monotonic() and self._thread is None:
+                self._thread = threading.Thread(target=self._build, name='recommender', daemon=True)
+                self._thread.start()
+            model = self._model
+            changed = {sid: rate for sid, (rate, _) in self._changed.get(account, {}).items()}
+        if model is None:
+            return None
+        return model.recommend(account, self.limit, changed)
+
+    def _build(self):
+        with self._lock:
+            started = time.monotonic()
+            generation = self._generation
+        try:
+            conn = self.pool.acquire()
+            try:
+                cursor = conn.cursor()
+                try:
+                    series, ratings = load(cursor)
+                finally:
+                    cursor.close()
+            finally:
+                self.pool.release(conn)
+            model = Model(series, ratings, self.neighbours)
+        except Exception:
+            logger.exception("Rebuilding the recommendation model failed")
+            with self._lock:
+                self._failures += 1
+                self._next_build = time.monotonic() + RETRY_AFTER
+                self._thread = None
+            return
+
+        with self._lock:
+            self._model = model
+            self._built_at = time.monotonic()
+            self._builds += 1
+            self._build_seconds = self._built_at - started
+            # Invalidated while loading: rebuild again on the next request
+            if generation == self._generation:
+                self._next_build = started + self.rebuild_interval
+            # Ratings committed before the load started are in the model
+            for account in list(self._changed):
+                pending = {sid: v for sid, v in self._changed[account].items() if v[1] >= started}
+                if pending:
+                    self._changed[account] = pending
+                else:
+                    del self._changed[account]
+            self._thread = None
+        changes.bump(changes.RECOMMENDER)
+
+    def after_fork(self):
+        """Resets the rebuild state in a forked child, which does not inherit the thread."""
+        self._lock = threading.Lock()
+        self._thread = None
+        self._changed = {}
+
+    def stats(self):
+        with self._lock:
+            model = self._model
+            return {
+                "built": int(model is not None),
+                "series": len(model.sids) if model else 0,
+                "viewers": len(model.account_rows) if model else 0,
+                "model_age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else 0.0,
+                "builds": self._builds,
+                "build_failures": self._failures,
+                "build_seconds_last": round(self._build_seconds, 6),
+                "pending_viewer_changes": len(self._changed),
+            }
+
+
+def get_recommender():
+    return current_app.extensions['recommender']
+
+
+def init_app(app):
+    recommender = Recommender(app.extensions['db_pool'],
+                              neighbours=app.config['RECOMMENDER_NEIGHBOURS'],
+                              rebuild_interval=app.config['RECOMMENDER_REBUILD_INTERVAL'])
+    changes.subscribe((changes.SERIES,), recommender.invalidate)
+    app.extensions['recommender'] = recommender
+    app.extensions.setdefault('fork_handlers', []).append(recommender.after_fork)
+    app.extensions.setdefault('metric_sources', {})['recommender'] = recommender.stats
@@ -0,0 +1,144 @@
+"""Background execution of admin reports with a TTL result cache.
+
+A job runs one report query on a small thread pool with its own pooled
+connection, so slow reports no longer hold a request worker. Results are
+cached by report id + parameters for ``REPORT_RESULT_TTL`` seconds (and
+dropped on writes to the reported tables made through this process, see
+``changes``); submitting a report whose result is cached, or which is
+already running, reuses it instead of querying again.
+
+Jobs and results live in the memory of the worker process that accepted the
+job, so polling must reach the same process (a single multi-threaded worker,
+or sticky sessions) and finished jobs are forgotten after the TTL.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+import changes
+from cache import TTLCache
+
+
+class Job:
+
+    def __init__(self, report_id, params):
+        self.id = uuid.uuid4().hex
+        self.report_id = report_id
+        self.params = params
+        self.status = 'queued'  # queued -> running -> done | failed
+        self.cached = False
+        self.error = None
+        self.result = None  # {"columns": [...], "rows": [...]}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.finished.set()
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "report": self.report_id,
+            "params": self.params,
+            "status": self.status,
+            "cached": self.cached,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == 'done':
+            data["row_count"] = len(self.result['rows'])
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class ReportJobs:
+
+    def __init__(self, pool, workers=2, ttl=300, cache_size=32, max_wait=30):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_wait = max_wait  # cap for long-polling
+        self.results = TTLCache(maxsize=cache_size, ttl=ttl)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> Job
+        self._running = {}  # cache key -> Job still queued or running
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, report_id, query, params):
+        key = (report_id, tuple(sorted(params.items())))
+        with self._lock:
+            self._prune()
+            running = self._running.get(key)
+            if running is not None:
+                return running
+
+            job = Job(report_id, params)
+            self._jobs[job.id] = job
+            generation = self.results.generation
+            hit, result = self.results.get(key)
+            if hit:
+                job.cached = True
+                job.finish('done', result)
+                return job
+            self._running[key] = job
+
+        self._executor.submit(self._run, job, key, query, generation)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, key, query, generation):
+        job.started_at = time.time()
+        job.status = 'running'
+        conn = None
+        try:
+            conn = self.pool.acquire()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(query, job.params)
+                result = {"columns": list(cursor.column_names), "rows": cursor.fetchall()}
+            finally:
+                cursor.close()
+            self.results.set(key, result, generation)
+            job.finish('done', result)
+        except Exception as e:
+            job.finish('failed', error=str(e))
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+            with self._lock:
+                self._running.pop(key, None)
+
+
+def get_jobs():
+    return current_app.extensions['report_jobs']
+
+
+def init_app(app):
+    jobs = ReportJobs(app.extensions['db_pool'],
+                      workers=app.config['REPORT_WORKERS'],
+                      ttl=app.config['REPORT_RESULT_TTL'],
+                      cache_size=app.config['REPORT_CACHE_SIZE'],
+                      max_wait=app.config['REPORT_MAX_WAIT'])
+    changes.subscribe((changes.SERIES, changes.EPISODE, changes.FEEDBACK, changes.VIEWER),
+                      jobs.results.clear)
+    app.extensions['report_jobs'] = jobs
+    app.extensions.setdefault('caches', {})['report_results'] = jobs.results
@@ -1,10 +1,126 @@
-from flask import Blueprint, jsonify
+import csv
+import io
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from admin_routes import admin_required
 import db
+import pagination
+import report_jobs
+import streaming
 
 bp = Blueprint('reports', __name__)
 
+# Q1: JOIN with at least 3 tables.
+# Business Question: List all series with their genres and release countries.
+Q1_SQL = """
+    SELECT s.SNAME, gt.TNAME as Genre, c.CNAME as ReleaseCountry, src.RELEASE_DATE
+    FROM DRY_SERIES s
+    JOIN DRY_SERIES_TYPE st ON s.SID = st.SID
+    JOIN DRY_GENRE_TYPE gt ON st.TNAME = gt.TNAME
+    JOIN DRY_SERIES_RELEASE_COUNTRY src ON s.SID = src.SID
+    JOIN DRY_COUNTRY c ON src.CID = c.CID
+    ORDER BY s.SNAME, c.CNAME;
+"""
+
+# Q2: Multi-row subquery (IN).
+# Business Question: Find all viewers who have written feedback for any 'Drama' series
+# (?genre= picks another genre).
+Q2_SQL = """
+    SELECT v.USERNAME, v.FNAME, v.LNAME
+    FROM DRY_VIEWER v
+    WHERE v.ACCOUNT IN (
+        SELECT f.ACCOUNT
+        FROM DRY_FEEDBACK f
+        JOIN DRY_SERIES_TYPE st ON f.SID = st.SID
+        WHERE st.TNAME = %(genre)s
+    );
+"""
+
+# Q3: Correlated subquery.
+# Business Question: Find feedback entries whose rating is above the average rating for that specific series.
+Q3_SQL = """
+    SELECT s.SNAME, v.USERNAME, f.RATE, f.FTEXT
+    FROM DRY_FEEDBACK f
+    JOIN DRY_SERIES s ON f.SID = s.SID
+    JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
+    WHERE f.RATE > (
+        SELECT AVG(f2.RATE)
+        FROM DRY_FEEDBACK f2
+        WHERE f2.SID = f.SID
+    )
+    ORDER BY s.SNAME, f.RATE DESC;
+"""
+
+# Q4: SET operator (UNION).
+# Business Question: List all series that have either English subtitles or English dubbing
+# (?language= picks another language).
+Q4_SQL = """
+    (SELECT SID, SNAME FROM DRY_SERIES WHERE SID IN (
+        SELECT SID FROM DRY_SERIES_SUBTITLE WHERE LNAME = %(language)s
+    ))
+    UNION
+    (SELECT SID, SNAME FROM DRY_SERIES WHERE SID IN (
+        SELECT SID FROM DRY_SERIES_DUBBING WHERE LNAME = %(language)s
+    ));
+"""
+
+# Q5: Inline view or WITH clause.
+# Business Question: Find high-rated series (avg rating > 4) that have at least 2 feedbacks.
+# Ratings come from the incrementally maintained DRY_SERIES_STATS summary.
+Q5_SQL = """
+    WITH SeriesRatings AS (
+        SELECT
+            SID,
+            RATING_SUM / RATING_COUNT as avg_rating,
+            RATING_COUNT as feedback_count
+        FROM DRY_SERIES_STATS
+        WHERE RATING_COUNT > 0
+    )
+    SELECT s.SNAME, sr.avg_rating, sr.feedback_count
+    FROM SeriesRatings sr
+    JOIN DRY_SERIES s ON sr.SID = s.SID
+    WHERE sr.avg_rating > 4.0 AND sr.feedback_count >= 2
+    ORDER BY sr.avg_rating DESC;
+"""
+
+# Q6: TOP-N query.
+# Business Question: Who are the top 3 most active viewers (by number of feedbacks given)?
+Q6_SQL = """
+    SELECT v.USERNAME, v.FNAME, v.LNAME, COUNT(f.SID) AS total_feedback
+    FROM DRY_VIEWER v
+    JOIN DRY_FEEDBACK f ON v.ACCOUNT = f.ACCOUNT
+    GROUP BY v.ACCOUNT
+    ORDER BY total_feedback DESC
+    LIMIT 3;
+"""
+
+REPORTS = {
+    'q1': Q1_SQL,
+    'q2': Q2_SQL,
+    'q3': Q3_SQL,
+    'q4': Q4_SQL,
+    'q5': Q5_SQL,
+    'q6': Q6_SQL,
+}
+
+# Named query parameters of each report and their default values
+REPORT_PARAMS = {
+    'q2': {'genre': 'Drama'},
+    'q4': {'language': 'English'},
+}
+
+
+def report_params(report_id, values=None):
+    """Parameter defaults of a report, overridden by ``values`` (default: the query string)."""
+    values = request.args if values is None else values
+    return {name: str(values.get(name, default)) for name, default in REPORT_PARAMS.get(report_id, {}).items()}
+
 def run_query(query, params=None):
+    if streaming.wants_stream():
+        try:
+            return streaming.stream_query(query, params, head={"query": query.strip()})
+        except Exception as e:
+            return jsonify({"error": "Query failed", "details": str(e)}), 500
     try:
         db_conn = db.get_db()
         cursor = db_conn.cursor(dictionary=True)
@@ -20,104 +136,99 @@ def run_query(query, params=None):
 @bp.route('/q1', methods=['GET'])
 @admin_required
 def report_q1():
-    # Q1: JOIN with at least 3 tables.
-    # Business Question: List all series with their genres and release countries.
-    query = """
-        SELECT s.SNAME, gt.TNAME as Genre, c.CNAME as ReleaseCountry, src.RELEASE_DATE
-        FROM DRY_SERIES s
-        JOIN DRY_SERIES_TYPE st ON s.SID = st.SID
-        JOIN DRY_GENRE_TYPE gt ON st.TNAME = gt.TNAME
-        JOIN DRY_SERIES_RELEASE_COUNTRY src ON s.SID = src.SID
-        JOIN DRY_COUNTRY c ON src.CID = c.CID
-        ORDER BY s.SNAME, c.CNAME;
-    """
-    return run_query(query)
+    return run_query(REPORTS['q1'], report_params('q1'))
 
 @bp.route('/q2', methods=['GET'])
 @admin_required
 def report_q2():
-    # Q2: Multi-row subquery (IN).
-    # Business Question: Find all viewers who have written feedback for any 'Drama' series.
-    query = """
-        SELECT v.USERNAME, v.FNAME, v.LNAME
-        FROM DRY_VIEWER v
-        WHERE v.ACCOUNT IN (
-            SELECT f.ACCOUNT
-            FROM DRY_FEEDBACK f
-            JOIN DRY_SERIES_TYPE st ON f.SID = st.SID
-            WHERE st.TNAME = 'Drama'
-        );
-    """
-    return run_query(query)
+    return run_query(REPORTS['q2'], report_params('q2'))
 
 @bp.route('/q3', methods=['GET'])
 @admin_required
 def report_q3():
-    # Q3: Correlated subquery.
-    # Business Question: Find feedback entries whose rating is above the average rating for that specific series.
-    query = """
-        SELECT s.SNAME, v.USERNAME, f.RATE, f.FTEXT
-        FROM DRY_FEEDBACK f
-        JOIN DRY_SERIES s ON f.SID = s.SID
-        JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
-        WHERE f.RATE > (
-            SELECT AVG(f2.RATE)
-            FROM DRY_FEEDBACK f2
-            WHERE f2.SID = f.SID
-        )
-        ORDER BY s.SNAME, f.RATE DESC;
-    """
-    return run_query(query)
+    return run_query(REPORTS['q3'], report_params('q3'))
 
 @bp.route('/q4', methods=['GET'])
 @admin_required
 def report_q4():
-    # Q4: SET operator (UNION).
-    # Business Question: List all series that have either English subtitles or English dubbing.
-    query = """
-        (SELECT SID, SNAME FROM DRY_SERIES WHERE SID IN (
-            SELECT SID FROM DRY_SERIES_SUBTITLE WHERE LNAME = 'English'
-        ))
-        UNION
-        (SELECT SID, SNAME FROM DRY_SERIES WHERE SID IN (
-            SELECT SID FROM DRY_SERIES_DUBBING WHERE LNAME = 'English'
-        ));
-    """
-    return run_query(query)
+    return run_query(REPORTS['q4'], report_params('q4'))
 
 @bp.route('/q5', methods=['GET'])
 @admin_required
 def report_q5():
-    # Q5: Inline view or WITH clause.
-    # Business Question: Find high-rated series (avg rating > 4) that have at least 2 feedbacks.
-    query = """
-        WITH SeriesRatings AS (
-            SELECT
-                SID,
-                AVG(RATE) as avg_rating,
-                COUNT(ACCOUNT) as feedback_count
-            FROM DRY_FEEDBACK
-            GROUP BY SID
-        )
-        SELECT s.SNAME, sr.avg_rating, sr.feedback_count
-        FROM SeriesRatings sr
-        JOIN DRY_SERIES s ON sr.SID = s.SID
-        WHERE sr.avg_rating > 4.0 AND sr.feedback_count >= 2
-        ORDER BY sr.avg_rating DESC;
-    """
-    return run_query(query)
+    return run_query(REPORTS['q5'], report_params('q5'))
 
 @bp.route('/q6', methods=['GET'])
 @admin_required
 def report_q6():
-    # Q6: TOP-N query.
-    # Business Question: Who are the top 3 most active viewers (by number of feedbacks given)?
-    query = """
-        SELECT v.USERNAME, v.FNAME, v.LNAME, COUNT(f.SID) AS total_feedback
-        FROM DRY_VIEWER v
-        JOIN DRY_FEEDBACK f ON v.ACCOUNT = f.ACCOUNT
-        GROUP BY v.ACCOUNT
-        ORDER BY total_feedback DESC
-        LIMIT 3;
-    """
-    return run_query(query)
+    return run_query(REPORTS['q6'], report_params('q6'))
+
+# --- Background report jobs ---
+@bp.route('/jobs', methods=['POST'])
+@admin_required
+def submit_report_job():
+    """Queues a report: ``{"report": "q1", "params": {...}}``. Returns the job (202)."""
+    data = request.get_json(silent=True) or {}
+    report_id = data.get('report')
+    if report_id not in REPORTS:
+        return jsonify({"error": f"Unknown report, expected one of {', '.join(REPORTS)}"}), 400
+    params = report_params(report_id, data.get('params') or {})
+    job = report_jobs.get_jobs().submit(report_id, REPORTS[report_id], params)
+    return jsonify(job.to_dict()), 202
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_report_job(job_id):
+    """Job status; ``?wait=N`` long-polls up to N seconds for it to finish."""
+    jobs = report_jobs.get_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    try:
+        wait = min(float(request.args.get('wait', 0)), jobs.max_wait)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    if wait > 0:
+        job.finished.wait(wait)
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+@admin_required
+def get_report_job_result(job_id):
+    """Result rows as paginated JSON (``?offset=&limit=``) or ``?format=csv``."""
+    job = report_jobs.get_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+
+    columns, rows = job.result['columns'], job.result['rows']
+    if request.args.get('format') == 'csv':
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for start in range(0, len(rows), 1000):
+                writer.writerows([row[c] for c in columns] for row in rows[start:start + 1000])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        return Response(stream_with_context(generate()), mimetype='text/csv', headers={
+            "Content-Disposition": f"attachment; filename=report-{job.report_id}-{job.id}.csv"})
+
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({"error": "offset must be an integer"}), 400
+    limit = pagination.page_size()
+    end = offset + limit
+    return jsonify({
+        "job_id": job.id,
+        "report": job.report_id,
+        "columns": columns,
+        "items": rows[offset:end],
+        "offset": offset,
+        "total": len(rows),
+        "next_offset": end if end < len(rows) else None,
+    })
@@ -0,0 +1,154 @@
+"""Ranked prefix search over series names and feedback text.
+
+Both searches use the FULLTEXT indexes on DRY_SERIES.SNAME and
+DRY_FEEDBACK.FTEXT in boolean mode, where every query word must match as a
+prefix (``+word*``). Series names can also be searched with an in-process
+inverted index (SEARCH_BACKEND=memory), which is also used automatically
+when the FULLTEXT index is missing. Feedback is too large to index in
+process, so feedback search always needs the FULLTEXT index.
+"""
+import bisect
+import re
+import threading
+import time
+from collections import defaultdict
+
+import mysql.connector
+from flask import current_app
+
+import changes
+import series_deletion
+
+ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [w.lower() for w in _WORD_RE.findall(text or '')]
+
+
+def boolean_query(q):
+    """Turns free text into a boolean-mode query requiring every word as a prefix."""
+    return ' '.join(f'+{word}*' for word in tokenize(q))
+
+
+class NameIndex:
+    """Inverted index of series-name words with prefix lookup."""
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stale = True
+        self._built_at = 0.0
+        self._postings = defaultdict(set)  # word -> SIDs
+        self._words = []  # sorted vocabulary, for prefix ranges
+        self._rows = {}  # sid -> row
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._stale = True
+
+    def _ensure_fresh(self, cursor):
+        if not self._stale and time.monotonic() - self._built_at <= self.ttl:
+            return
+        cursor.execute(f"SELECT SID, SNAME, NEPISODES, ORI_LANG FROM DRY_SERIES s WHERE {series_deletion.not_deleted('s')}")
+        postings = defaultdict(set)
+        rows = {}
+        for row in cursor.fetchall():
+            rows[row['SID']] = row
+            for word in tokenize(row['SNAME']):
+                postings[word].add(row['SID'])
+        self._postings, self._rows = postings, rows
+        self._words = sorted(postings)
+        self._stale = False
+        self._built_at = time.monotonic()
+
+    def _prefix_matches(self, prefix):
+        start = bisect.bisect_left(self._words, prefix)
+        sids = set()
+        for word in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            sids |= self._postings[word]
+        return sids
+
+    def search(self, cursor, q, limit, offset):
+        """Returns ``(rows, has_more)``; ``cursor`` must be a dictionary cursor."""
+        words = tokenize(q)
+        with self._lock:
+            self._ensure_fresh(cursor)
+            if not words:
+                return [], False
+            matched = None
+            for word in words:
+                sids = self._prefix_matches(word)
+                matched = sids if matched is None else matched & sids
+            # Rank exact word hits above prefix-only hits, then by name
+            ranked = []
+            for sid in matched:
+                row = self._rows[sid]
+                name_words = set(tokenize(row['SNAME']))
+                score = sum(2 if w in name_words else 1 for w in words)
+                ranked.append((-score, row['SNAME'], sid))
+            ranked.sort()
+            page = ranked[offset:offset + limit + 1]
+            rows = [dict(self._rows[sid], score=-neg) for neg, _, sid in page[:limit]]
+            return rows, len(page) > limit
+
+
+def search_series(cursor, q, limit, offset):
+    """Ranked series-name search. Returns ``(rows, has_more)``."""
+    index = current_app.extensions['series_name_index']
+    if current_app.config['SEARCH_BACKEND'] == 'memory':
+        return index.search(cursor, q, limit, offset)
+
+    terms = boolean_query(q)
+    if not terms:
+        return [], False
+    try:
+        cursor.execute(f"""
+            SELECT SID, SNAME, NEPISODES, ORI_LANG,
+                   MATCH(SNAME) AGAINST (%s IN BOOLEAN MODE) AS score
+            FROM DRY_SERIES s
+            WHERE MATCH(SNAME) AGAINST (%s IN BOOLEAN MODE) AND {series_deletion.not_deleted('s')}
+            ORDER BY score DESC, SNAME, SID
+            LIMIT %s OFFSET %s
+        """, (terms, terms, limit + 1, offset))
+    except mysql.connector.Error as err:
+        if err.errno != ER_FT_MATCHING_KEY_NOT_FOUND:
+            raise
+        return index.search(cursor, q, limit, offset)
+    rows = cursor.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def search_feedback(cursor, q, limit, offset, sid=None):
+    """Ranked feedback-text search, optionally within one series."""
+    terms = boolean_query(q)
+    if not terms:
+        return [], False
+    query = """
+        SELECT f.SID, f.ACCOUNT, f.RATE, f.FTEXT, f.FDATE, s.SNAME, v.USERNAME,
+               MATCH(f.FTEXT) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM DRY_FEEDBACK f
+        JOIN DRY_SERIES s ON f.SID = s.SID
+        JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
+        WHERE MATCH(f.FTEXT) AGAINST (%s IN BOOLEAN MODE)
+    """
+    params = [terms, terms]
+    if sid:
+        query += " AND f.SID = %s"
+        params.append(sid)
+    query += " ORDER BY score DESC, f.FDATE DESC, f.SID, f.ACCOUNT LIMIT %s OFFSET %s"
+    params.extend([limit + 1, offset])
+    cursor.execute(query, tuple(params))
+    rows = cursor.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def init_app(app):
+    # Rebuilt on series writes, and periodically for other workers' writes
+    index = NameIndex(ttl=app.config['FACET_INDEX_TTL'])
+    changes.subscribe((changes.SERIES,), index.invalidate)
+    app.extensions['series_name_index'] = index
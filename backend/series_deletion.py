@@ -0,0 +1,301 @@
+"""Background deletion of a series and everything that references it.
+
+A popular series can have hundreds of thousands of feedback rows; deleting
+them in the request's transaction holds their row locks for a long time
+and stalls viewer writes. With ``SERIES_DELETE_MODE=job`` a delete instead
+inserts a tombstone row into DRY_SERIES_DELETION and returns 202. Viewer
+queries skip tombstoned series (``not_deleted``) from then on.
+
+A thread in each worker process claims pending deletions through a lease
+(OWNER / HEARTBEAT_AT) and removes DRY_FEEDBACK, then DRY_EPISODE rows in
+batches of ``SERIES_DELETE_BATCH_SIZE``. Each batch commits together with
+its progress counters, and the thread sleeps ``SERIES_DELETE_PAUSE_MS``
+between batches so other writers get the locks. A last short transaction
+deletes the stragglers, associations, contracts, stats and the series row
+and marks the deletion done.
+
+After a crash nothing is lost: a deletion whose lease has not been renewed
+for ``SERIES_DELETE_LEASE`` seconds is claimed again (by any process) and
+continues where its last committed batch stopped. Failed attempts are
+retried the same way.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+import mysql.connector
+from flask import current_app
+
+import changes
+import series_stats
+
+logger = logging.getLogger(__name__)
+
+# Dependent rows removed in batches, in this order
+BATCHED = (
+    ('FEEDBACK', 'DRY_FEEDBACK'),
+    ('EPISODES', 'DRY_EPISODE'),
+)
+
+
+def not_deleted(alias):
+    """SQL condition excluding series that are being deleted."""
+    return (f"NOT EXISTS (SELECT 1 FROM DRY_SERIES_DELETION d "
+            f"WHERE d.SID = {alias}.SID AND d.FINISHED_AT IS NULL)")
+
+
+def visible_sql():
+    """Query (parameter: SID) returning a row if the series exists and is not being deleted."""
+    return f"SELECT 1 FROM DRY_SERIES s WHERE s.SID = %s AND {not_deleted('s')}"
+
+
+def is_visible(cursor, sid):
+    """True if series ``sid`` exists and is not being deleted; ``cursor`` may be any cursor."""
+    cursor.execute(visible_sql(), (sid,))
+    return cursor.fetchone() is not None
+
+
+def request_deletion(cursor, sid, sname, admin_id):
+    """Tombstones series ``sid`` in the current transaction.
+
+    A finished deletion of a reused SID is replaced; a pending one is left
+    as it is. ``cursor`` may be any cursor.
+    """
+    cursor.execute("""
+        INSERT INTO DRY_SERIES_DELETION (SID, SNAME, REQUESTED_BY)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            SNAME = IF(FINISHED_AT IS NULL, SNAME, VALUES(SNAME)),
+            REQUESTED_BY = IF(FINISHED_AT IS NULL, REQUESTED_BY, VALUES(REQUESTED_BY)),
+            STATUS = IF(FINISHED_AT IS NULL, STATUS, 'queued'),
+            REQUESTED_AT = IF(FINISHED_AT IS NULL, REQUESTED_AT, NOW()),
+            STARTED_AT = IF(FINISHED_AT IS NULL, STARTED_AT, NULL),
+            OWNER = IF(FINISHED_AT IS NULL, OWNER, NULL),
+            HEARTBEAT_AT = IF(FINISHED_AT IS NULL, HEARTBEAT_AT, NULL),
+            FEEDBACK_TOTAL = IF(FINISHED_AT IS NULL, FEEDBACK_TOTAL, NULL),
+            FEEDBACK_DELETED = IF(FINISHED_AT IS NULL, FEEDBACK_DELETED, 0),
+            EPISODES_TOTAL = IF(FINISHED_AT IS NULL, EPISODES_TOTAL, NULL),
+            EPISODES_DELETED = IF(FINISHED_AT IS NULL, EPISODES_DELETED, 0),
+            BATCHES = IF(FINISHED_AT IS NULL, BATCHES, 0),
+            ATTEMPTS = IF(FINISHED_AT IS NULL, ATTEMPTS, 0),
+            LAST_ERROR = IF(FINISHED_AT IS NULL, LAST_ERROR, NULL),
+            FINISHED_AT = NULL
+    """, (sid, sname, admin_id))
+
+
+def get_progress(cursor, sid):
+    """Returns the deletion of ``sid`` as a dict, or None; ``cursor`` must be a dict cursor."""
+    cursor.execute("SELECT * FROM DRY_SERIES_DELETION WHERE SID = %s", (sid,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    total = (row['FEEDBACK_TOTAL'] or 0) + (row['EPISODES_TOTAL'] or 0)
+    deleted = row['FEEDBACK_DELETED'] + row['EPISODES_DELETED']
+    if row['FINISHED_AT'] is not None:
+        row['progress'] = 1.0
+    else:
+        row['progress'] = round(min(deleted / total, 1.0), 4) if total else 0.0
+    return row
+
+
+class SeriesDeleter:
+    """Runs pending series deletions in a background thread of this process."""
+
+    def __init__(self, pool, dashboard_stats, batch_size=1000, pause_ms=100, lease=60, poll=10):
+        self.pool = pool
+        self.dashboard_stats = dashboard_stats
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self.lease = lease
+        self.poll = poll
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"[:100]
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+        self._batches = 0
+        self._rows_deleted = 0
+        self._completed = 0
+        self._failures = 0
+
+    def ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='series-deleter', daemon=True)
+                    self._thread.start()
+
+    def wake(self):
+        """Starts looking for work now instead of at the next poll."""
+        self.ensure_started()
+        self._wake.set()
+
+    def after_fork(self):
+        """The thread is not inherited; the first request of the child starts a new one."""
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"[:100]
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                while not self._stopped and self._run_one():
+                    pass
+            except Exception:
+                logger.exception("Series deletion worker error")
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    # --- one deletion ---
+
+    def _run_one(self):
+        """Claims and runs one pending deletion; False if there is none."""
+        conn = self.pool.acquire()
+        try:
+            sid = self._claim(conn)
+            if sid is None:
+                return False
+            try:
+                self._delete(conn, sid)
+            except Exception as e:
+                conn.rollback()
+                logger.exception("Deleting series %s failed; it will be retried", sid)
+                self._failures += 1
+                self._release(conn, sid, str(e))
+                return False  # retry after the poll interval
+            return True
+        finally:
+            self.pool.release(conn)
+
+    def _claim(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT SID FROM DRY_SERIES_DELETION
+                WHERE FINISHED_AT IS NULL
+                  AND (OWNER IS NULL OR OWNER = %s OR HEARTBEAT_AT < NOW() - INTERVAL %s SECOND)
+                ORDER BY REQUESTED_AT
+                LIMIT 1
+            """, (self.owner, self.lease))
+            row = cursor.fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            sid = row[0]
+            # Conditional update: only one process wins the lease
+            cursor.execute("""
+                UPDATE DRY_SERIES_DELETION
+                SET OWNER = %s, HEARTBEAT_AT = NOW(), STATUS = 'running',
+                    STARTED_AT = COALESCE(STARTED_AT, NOW()), ATTEMPTS = ATTEMPTS + 1
+                WHERE SID = %s AND FINISHED_AT IS NULL
+                  AND (OWNER IS NULL OR OWNER = %s OR HEARTBEAT_AT < NOW() - INTERVAL %s SECOND)
+            """, (self.owner, sid, self.owner, self.lease))
+            claimed = cursor.rowcount == 1
+            if claimed:
+                cursor.execute("""
+                    UPDATE DRY_SERIES_DELETION
+                    SET FEEDBACK_TOTAL = COALESCE(FEEDBACK_TOTAL, (SELECT COUNT(*) FROM DRY_FEEDBACK WHERE SID = %s)),
+                        EPISODES_TOTAL = COALESCE(EPISODES_TOTAL, (SELECT COUNT(*) FROM DRY_EPISODE WHERE SID = %s))
+                    WHERE SID = %s
+                """, (sid, sid, sid))
+            conn.commit()
+            return sid if claimed else None
+        finally:
+            cursor.close()
+
+    def _delete(self, conn, sid):
+        cursor = conn.cursor()
+        try:
+            for counter, table in BATCHED:
+                while not self._stopped:
+                    cursor.execute(f"DELETE FROM {table} WHERE SID = %s LIMIT %s", (sid, self.batch_size))
+                    deleted = cursor.rowcount
+                    self._renew(cursor, sid, f"{counter}_DELETED = {counter}_DELETED + %s, BATCHES = BATCHES + 1",
+                                (deleted,))
+                    conn.commit()
+                    self._batches += 1
+                    self._rows_deleted += deleted
+                    if deleted < self.batch_size:
+                        break
+                    # Let viewer writes waiting on these locks through
+                    time.sleep(self.pause)
+            if self._stopped:
+                return
+
+            # Rows written since the batches above, plus the small tables
+            cursor.execute("DELETE FROM DRY_FEEDBACK WHERE SID = %s", (sid,))
+            cursor.execute("DELETE FROM DRY_EPISODE WHERE SID = %s", (sid,))
+            for table in ('DRY_SERIES_TYPE', 'DRY_SERIES_SUBTITLE', 'DRY_SERIES_DUBBING',
+                          'DRY_SERIES_RELEASE_COUNTRY', 'DRY_CONTRACT'):
+                cursor.execute(f"DELETE FROM {table} WHERE SID = %s", (sid,))
+            series_stats.remove_series(cursor, sid)
+            cursor.execute("DELETE FROM DRY_SERIES WHERE SID = %s", (sid,))
+            self._renew(cursor, sid, "STATUS = 'done', FINISHED_AT = NOW(), OWNER = NULL, LAST_ERROR = NULL", ())
+            conn.commit()
+        finally:
+            cursor.close()
+
+        self._completed += 1
+        changes.bump(changes.SERIES, changes.EPISODE, changes.FEEDBACK, key=sid)
+        self.dashboard_stats.invalidate()
+        logger.info("Series %s deleted", sid)
+
+    def _renew(self, cursor, sid, assignments, params):
+        """Applies ``assignments`` if this process still holds the lease, else raises."""
+        cursor.execute(f"""
+            UPDATE DRY_SERIES_DELETION SET {assignments}, HEARTBEAT_AT = NOW()
+            WHERE SID = %s AND OWNER = %s
+        """, params + (sid, self.owner))
+        if cursor.rowcount != 1:
+            raise RuntimeError(f"Lost the lease on the deletion of series {sid}")
+
+    def _release(self, conn, sid, error):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE DRY_SERIES_DELETION SET STATUS = 'failed', OWNER = NULL, LAST_ERROR = %s
+                WHERE SID = %s AND OWNER = %s
+            """, (error[:500], sid, self.owner))
+            conn.commit()
+        except mysql.connector.Error:
+            logger.exception("Could not record the failed deletion of series %s", sid)
+        finally:
+            cursor.close()
+
+    def stats(self):
+        return {
+            "running": int(self._thread is not None and self._thread.is_alive()),
+            "batches": self._batches,
+            "rows_deleted": self._rows_deleted,
+            "completed": self._completed,
+            "failures": self._failures,
+        }
+
+
+def get_deleter():
+    """The background deleter, or None in synchronous mode."""
+    return current_app.extensions.get('series_deleter')
+
+
+def init_app(app):
+    if app.config['SERIES_DELETE_MODE'] != 'job':
+        return
+    deleter = SeriesDeleter(app.extensions['db_pool'], app.extensions['dashboard_stats'],
+                            batch_size=app.config['SERIES_DELETE_BATCH_SIZE'],
+                            pause_ms=app.config['SERIES_DELETE_PAUSE_MS'],
+                            lease=app.config['SERIES_DELETE_LEASE'],
+                            poll=app.config['SERIES_DELETE_POLL'])
+    app.extensions['series_deleter'] = deleter
+    # Started by the first request rather than here, so neither the gunicorn
+    # master (with preload) nor CLI commands run deletions
+    app.before_request(deleter.ensure_started)
+    app.extensions.setdefault('fork_handlers', []).append(deleter.after_fork)
+    app.extensions.setdefault('metric_sources', {})['series_deleter'] = deleter.stats
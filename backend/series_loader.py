@@ -0,0 +1,88 @@
+"""Single-round-trip loader for a series and all of its associations.
+
+The viewer detail page and the admin edit form both need the series row plus
+its genres, subtitles, dubbings, release countries (and, for viewers, the
+episode list). Instead of one query per association, the associations are
+aggregated server-side with JSON_ARRAYAGG in correlated subqueries so the
+whole document comes back as a single row.
+"""
+import datetime
+import json
+
+import series_deletion
+
+_BASE_QUERY = """
+    SELECT
+        s.*,
+        (SELECT JSON_ARRAYAGG(st.TNAME)
+           FROM DRY_SERIES_TYPE st WHERE st.SID = s.SID) AS genres,
+        (SELECT JSON_ARRAYAGG(sub.LNAME)
+           FROM DRY_SERIES_SUBTITLE sub WHERE sub.SID = s.SID) AS subtitles,
+        (SELECT JSON_ARRAYAGG(dub.LNAME)
+           FROM DRY_SERIES_DUBBING dub WHERE dub.SID = s.SID) AS dubbings,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('CID', src.CID, 'CNAME', c.CNAME, 'RELEASE_DATE', src.RELEASE_DATE))
+           FROM DRY_SERIES_RELEASE_COUNTRY src
+           JOIN DRY_COUNTRY c ON src.CID = c.CID
+          WHERE src.SID = s.SID) AS release_countries
+        {episodes}
+    FROM DRY_SERIES s
+    WHERE s.SID = %s AND {not_deleted}
+"""
+
+_EPISODES_COLUMN = """,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                    'EID', e.EID, 'E_NUM', e.E_NUM,
+                    'SCHEDULE_SDATE', e.SCHEDULE_SDATE, 'SCHEDULE_EDATE', e.SCHEDULE_EDATE,
+                    'NVIEWERS', e.NVIEWERS, 'INTERRUPTION', e.INTERRUPTION))
+           FROM DRY_EPISODE e WHERE e.SID = s.SID) AS episodes"""
+
+_DATE_FIELDS = ('RELEASE_DATE', 'SCHEDULE_SDATE', 'SCHEDULE_EDATE')
+
+
+def _json_list(value):
+    if value is None:
+        return []
+    return json.loads(value)
+
+
+def _restore_dates(rows):
+    # JSON_OBJECT renders DATE columns as ISO strings; turn them back into
+    # dates so they serialize exactly like columns read directly.
+    for row in rows:
+        for field in _DATE_FIELDS:
+            if isinstance(row.get(field), str):
+                row[field] = datetime.date.fromisoformat(row[field])
+    return rows
+
+
+def series_query(include_episodes=True):
+    """The single-row query; takes the SID as its only parameter."""
+    return _BASE_QUERY.format(episodes=_EPISODES_COLUMN if include_episodes else '',
+                              not_deleted=series_deletion.not_deleted('s'))
+
+
+def decode_series(series, include_episodes=True):
+    """Turns the aggregated JSON columns of a fetched row into sorted lists."""
+    series['genres'] = sorted(_json_list(series['genres']))
+    series['subtitles'] = sorted(_json_list(series['subtitles']))
+    series['dubbings'] = sorted(_json_list(series['dubbings']))
+    series['release_countries'] = _restore_dates(
+        sorted(_json_list(series['release_countries']), key=lambda r: r['CNAME'])
+    )
+    if include_episodes:
+        series['episodes'] = _restore_dates(
+            sorted(_json_list(series['episodes']), key=lambda e: e['E_NUM'])
+        )
+    return series
+
+
+def load_series(cursor, sid, include_episodes=True):
+    """Returns the series row with its associations, or None if it does not exist.
+
+    ``cursor`` must be a dictionary cursor.
+    """
+    cursor.execute(series_query(include_episodes), (sid,))
+    series = cursor.fetchone()
+    if not series:
+        return None
+    return decode_series(series, include_episodes)
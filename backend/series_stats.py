@@ -0,0 +1,110 @@
+"""Incrementally maintained per-series rating aggregates (DRY_SERIES_STATS).
+
+Every write to DRY_FEEDBACK must call ``apply_change`` with the same cursor,
+inside the same transaction, so the summary never drifts from the source
+rows. ``rebuild`` recomputes everything from DRY_FEEDBACK and is exposed as
+the ``flask rebuild-series-stats`` command.
+"""
+import click
+import db
+
+STAR_COLUMNS = ['STAR_1', 'STAR_2', 'STAR_3', 'STAR_4', 'STAR_5']
+
+# SQL fragments for reading the aggregates joined as ``ss``
+AVG_RATING_SQL = "ss.RATING_SUM / NULLIF(ss.RATING_COUNT, 0)"
+FEEDBACK_COUNT_SQL = "COALESCE(ss.RATING_COUNT, 0)"
+
+
+_UPSERT_SQL = """
+    INSERT INTO DRY_SERIES_STATS (SID, RATING_SUM, RATING_COUNT, {columns})
+    VALUES (%s, %s, %s, {placeholders})
+    ON DUPLICATE KEY UPDATE
+        RATING_SUM = RATING_SUM + VALUES(RATING_SUM),
+        RATING_COUNT = RATING_COUNT + VALUES(RATING_COUNT),
+        {updates}
+""".format(
+    columns=', '.join(STAR_COLUMNS),
+    placeholders=', '.join(['%s'] * 5),
+    updates=', '.join(f"{c} = {c} + VALUES({c})" for c in STAR_COLUMNS),
+)
+
+
+def apply_change(cursor, sid, old_rate=None, new_rate=None):
+    """Applies one feedback insert/update/delete to the series summary.
+
+    Insert: ``old_rate=None``. Delete: ``new_rate=None``. Update: both set.
+    """
+    apply_changes(cursor, [(sid, old_rate, new_rate)])
+
+
+def apply_changes(cursor, changes):
+    """Applies many ``(sid, old_rate, new_rate)`` changes with one batched upsert."""
+    deltas = {}
+    for sid, old_rate, new_rate in changes:
+        if old_rate == new_rate:
+            continue
+        delta = deltas.setdefault(sid, [0] * 7)  # sum, count, star 1..5
+        delta[0] += (new_rate or 0) - (old_rate or 0)
+        delta[1] += (new_rate is not None) - (old_rate is not None)
+        if old_rate is not None:
+            delta[1 + old_rate] -= 1
+        if new_rate is not None:
+            delta[1 + new_rate] += 1
+    if deltas:
+        # Sorted so concurrent transactions lock summary rows in the same order
+        cursor.executemany(_UPSERT_SQL, [(sid, *delta) for sid, delta in sorted(deltas.items())])
+
+
+def remove_series(cursor, sid):
+    """Drops the summary row of a series whose feedback was deleted wholesale."""
+    cursor.execute("DELETE FROM DRY_SERIES_STATS WHERE SID = %s", (sid,))
+
+
+STATS_SQL = f"""
+    SELECT {AVG_RATING_SQL} AS avg_rating, {FEEDBACK_COUNT_SQL} AS feedback_count,
+           {', '.join('ss.' + c for c in STAR_COLUMNS)}
+    FROM DRY_SERIES_STATS ss
+    WHERE ss.SID = %s
+"""
+
+
+def stats_payload(row):
+    """Shapes a STATS_SQL row (None if the series has no summary yet)."""
+    row = row or {}
+    return {
+        "avg_rating": row.get('avg_rating'),
+        "feedback_count": row.get('feedback_count', 0),
+        "histogram": {str(star): row.get(f'STAR_{star}', 0) for star in range(1, 6)},
+    }
+
+
+def get_stats(cursor, sid):
+    """Returns avg_rating, feedback_count and the per-star histogram of a series.
+
+    ``cursor`` must be a dictionary cursor.
+    """
+    cursor.execute(STATS_SQL, (sid,))
+    return stats_payload(cursor.fetchone())
+
+
+def rebuild(db_conn):
+    """Recomputes DRY_SERIES_STATS from DRY_FEEDBACK."""
+    cursor = db_conn.cursor()
+    try:
+        cursor.callproc('RebuildSeriesStats')
+        db_conn.commit()
+        cursor.execute("SELECT COUNT(*) FROM DRY_SERIES_STATS")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+@click.command('rebuild-series-stats')
+def rebuild_command():
+    """Rebuild the series rating summary from DRY_FEEDBACK."""
+    count = rebuild(db.get_db())
+    click.echo(f"Rebuilt rating stats for {count} series.")
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
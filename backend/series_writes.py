@@ -0,0 +1,122 @@
+"""Series edits that only write what changed.
+
+``update_series`` compares the submitted series fields and associations
+(genres, subtitles, dubbings, release countries) with the stored ones,
+read in one query under a lock on the series row, and issues one batched
+DELETE and one batched INSERT per association table that actually changed.
+Release countries whose date changed are updated in place by the same
+INSERT (``ON DUPLICATE KEY UPDATE``). Unchanged associations cost no writes,
+so there is no redo log or lock churn for them.
+
+The returned report lists what changed; callers skip cache invalidation
+entirely when it is empty.
+"""
+import datetime
+
+from werkzeug.http import parse_date
+
+SERIES_FIELDS = ('SNAME', 'NEPISODES', 'ORI_LANG')
+
+# association -> (table, value column)
+ASSOCIATIONS = {
+    'genres': ('DRY_SERIES_TYPE', 'TNAME'),
+    'subtitles': ('DRY_SERIES_SUBTITLE', 'LNAME'),
+    'dubbings': ('DRY_SERIES_DUBBING', 'LNAME'),
+}
+
+_CURRENT_SQL = """
+    SELECT 'genres', TNAME, NULL FROM DRY_SERIES_TYPE WHERE SID = %(sid)s
+    UNION ALL
+    SELECT 'subtitles', LNAME, NULL FROM DRY_SERIES_SUBTITLE WHERE SID = %(sid)s
+    UNION ALL
+    SELECT 'dubbings', LNAME, NULL FROM DRY_SERIES_DUBBING WHERE SID = %(sid)s
+    UNION ALL
+    SELECT 'release_countries', CID, RELEASE_DATE FROM DRY_SERIES_RELEASE_COUNTRY WHERE SID = %(sid)s
+"""
+
+
+def _date(value):
+    """Parses ISO dates and HTTP dates (as returned with ``JSON_PROVIDER=default``)."""
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        parsed = parse_date(str(value))
+        return parsed.date() if parsed else value
+
+
+def _current(cursor, sid):
+    current = {name: set() for name in ASSOCIATIONS}
+    current['release_countries'] = {}
+    cursor.execute(_CURRENT_SQL, {'sid': sid})
+    for association, value, release_date in cursor.fetchall():
+        if association == 'release_countries':
+            current[association][int(value)] = release_date
+        else:
+            current[association].add(value)
+    return current
+
+
+def update_series(cursor, sid, fields, associations):
+    """Applies an edit of series ``sid`` in the current transaction.
+
+    ``cursor`` must be a tuple (non-dictionary) cursor. ``fields`` maps
+    SERIES_FIELDS to their new values; ``associations`` maps 'genres',
+    'subtitles' and 'dubbings' to lists of names and 'release_countries' to
+    ``[{"cid": ..., "release_date": ...}]``. Returns the changes, e.g.
+    ``{"fields": ["SNAME"], "genres": {"added": [...], "removed": [...]}}``,
+    or None if the series does not exist.
+    """
+    cursor.execute(f"SELECT {', '.join(SERIES_FIELDS)} FROM DRY_SERIES WHERE SID = %s FOR UPDATE", (sid,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    report = {}
+
+    changed = [field for field, old in zip(SERIES_FIELDS, row) if fields[field] != old]
+    if changed:
+        assignments = ', '.join(f"{field} = %s" for field in changed)
+        cursor.execute(f"UPDATE DRY_SERIES SET {assignments} WHERE SID = %s",
+                       tuple(fields[field] for field in changed) + (sid,))
+        report['fields'] = changed
+
+    current = _current(cursor, sid)
+
+    for name, (table, column) in ASSOCIATIONS.items():
+        wanted = set(associations[name])
+        removed, added = sorted(current[name] - wanted), sorted(wanted - current[name])
+        # Deletes first: under a case-insensitive collation a renamed value
+        # ('drama' -> 'Drama') has the same key as the old one
+        if removed:
+            placeholders = ', '.join(['%s'] * len(removed))
+            cursor.execute(f"DELETE FROM {table} WHERE SID = %s AND {column} IN ({placeholders})",
+                           (sid, *removed))
+        if added:
+            rows = ', '.join(['(%s, %s)'] * len(added))
+            cursor.execute(f"INSERT INTO {table} (SID, {column}) VALUES {rows}",
+                           tuple(v for value in added for v in (sid, value)))
+        if removed or added:
+            report[name] = {"added": added, "removed": removed}
+
+    wanted = {int(rc['cid']): _date(rc['release_date']) for rc in associations['release_countries']}
+    stored = current['release_countries']
+    removed = sorted(stored.keys() - wanted.keys())
+    added = sorted(wanted.keys() - stored.keys())
+    updated = sorted(cid for cid in wanted.keys() & stored.keys() if wanted[cid] != stored[cid])
+    if removed:
+        placeholders = ', '.join(['%s'] * len(removed))
+        cursor.execute(f"DELETE FROM DRY_SERIES_RELEASE_COUNTRY WHERE SID = %s AND CID IN ({placeholders})",
+                       (sid, *removed))
+    if added or updated:
+        upserts = added + updated
+        rows = ', '.join(['(%s, %s, %s)'] * len(upserts))
+        cursor.execute(f"""
+            INSERT INTO DRY_SERIES_RELEASE_COUNTRY (SID, CID, RELEASE_DATE)
+            VALUES {rows}
+            ON DUPLICATE KEY UPDATE RELEASE_DATE = VALUES(RELEASE_DATE)
+        """, tuple(v for cid in upserts for v in (sid, cid, wanted[cid])))
+    if removed or added or updated:
+        report['release_countries'] = {"added": added, "removed": removed, "updated": updated}
+
+    return report
@@ -0,0 +1,64 @@
+from flask import Response, current_app, request, stream_with_context
+import db
+
+STREAM_FORMATS = ('ndjson', 'stream')
+
+
+def wants_stream():
+    """True when the client asked for ``?format=ndjson`` or ``?format=stream``."""
+    return request.args.get('format') in STREAM_FORMATS
+
+
+def stream_query(query, params=None, head=None):
+    """Streams the rows of ``query`` without materializing the result set.
+
+    Rows are pulled from an unbuffered cursor with ``fetchmany`` and encoded
+    one at a time, so memory stays flat regardless of table size.
+
+    * ``?format=ndjson``: one JSON object per line (``application/x-ndjson``).
+    * ``?format=stream``: a chunked JSON array. If ``head`` is given, the
+      array is wrapped as ``{**head, "result": [...]}`` to match the
+      buffered response shape.
+
+    The query is executed before the response is returned so SQL errors are
+    raised to the caller as usual.
+    """
+    ndjson = request.args.get('format') == 'ndjson'
+    batch_size = current_app.config['STREAM_FETCH_SIZE']
+    dumps = current_app.json.dumps
+
+    cursor = db.get_db().cursor(dictionary=True)
+    try:
+        cursor.execute(query, params or ())
+    except Exception:
+        cursor.close()
+        raise
+
+    def generate():
+        try:
+            if not ndjson:
+                if head is not None:
+                    opening = dumps(head)[:-1]
+                    yield opening + (', ' if head else '') + '"result": ['
+                else:
+                    yield '['
+            first = True
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if ndjson:
+                    yield ''.join(dumps(row) + '\n' for row in rows)
+                else:
+                    chunk = ','.join(dumps(row) for row in rows)
+                    yield chunk if first else ',' + chunk
+                    first = False
+            if not ndjson:
+                yield ']}' if head is not None else ']'
+        finally:
+            cursor.close()
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    # stream_with_context keeps the app context (and with it the pooled
+    # connection) alive until the last chunk has been sent.
+    return Response(stream_with_context(generate()), mimetype=mimetype)
@@ -0,0 +1,68 @@
+import io
+import tempfile
+
+import pytest
+from flask import Flask, jsonify, request
+
+import bulk_import
+
+CSV = b"sid,account,rate,ftext,fdate\r\n1,2,5,\"Great, really\",2025-01-02\r\n"
+NDJSON = b'{"sid": 1, "account": 2}\n\nnot json\n'
+
+
+class Py39SpooledTemporaryFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile as in Python < 3.11, without readable()."""
+
+    @property
+    def readable(self):
+        raise AttributeError('readable')
+
+
+def upload_app():
+    app = Flask(__name__)
+
+    @app.route('/import/<fmt>', methods=['POST'])
+    def upload(fmt):
+        records = bulk_import.iter_records(request.files['file'].stream, fmt)
+        return jsonify([r if isinstance(r, dict) else str(r) for r in records])
+
+    return app
+
+
+def test_multipart_csv_upload():
+    client = upload_app().test_client()
+    response = client.post('/import/csv', data={'file': (io.BytesIO(CSV), 'feedback.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {"sid": "1", "account": "2", "rate": "5", "ftext": "Great, really", "fdate": "2025-01-02"},
+    ]
+
+
+def test_multipart_ndjson_upload():
+    client = upload_app().test_client()
+    response = client.post('/import/ndjson', data={'file': (io.BytesIO(NDJSON), 'feedback.ndjson')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body[0] == {"sid": 1, "account": 2}
+    assert body[1].startswith("Invalid JSON")
+
+
+def test_spooled_file_without_readable():
+    spooled = Py39SpooledTemporaryFile()
+    spooled.write(CSV)
+    spooled.seek(0)
+    assert not hasattr(spooled, 'readable')
+    records = list(bulk_import.iter_records(spooled, 'csv'))
+    assert records[0]['ftext'] == "Great, really"
+
+
+def test_feedback_rate_must_be_whole_number():
+    loader = bulk_import.FeedbackLoader()
+    record = {"sid": 1, "account": 2, "ftext": "Great pacing", "fdate": "2025-01-02"}
+    assert loader.validate({**record, "rate": "4"})[1] == 4
+    assert loader.validate({**record, "rate": 4})[1] == 4
+    for rate in (4.7, True, "4.7", "four"):
+        with pytest.raises(ValueError):
+            loader.validate({**record, "rate": rate})
@@ -0,0 +1,125 @@
+"""Daily rollup of new viewers and their monthly charges (DRY_VIEWER_DAILY_STATS).
+
+One row per account opening date holds the number of viewers opened that
+day and the sum of their current MCHARGE. Registration and admin charge
+changes must call ``record_viewer`` / ``record_charge_change`` with the same
+cursor, inside the same transaction. ``rebuild`` recomputes the table from
+DRY_VIEWER and is exposed as the ``flask rebuild-viewer-growth`` command.
+
+The growth endpoints aggregate the rollup to day, week or month buckets,
+so they read a few hundred rows instead of grouping all of DRY_VIEWER.
+"""
+import datetime
+
+import click
+import db
+
+# Bucket label for each granularity; weeks start on Monday
+GRANULARITIES = {
+    'day': "DATE_FORMAT(STAT_DATE, '%Y-%m-%d')",
+    'week': "DATE_FORMAT(STAT_DATE - INTERVAL WEEKDAY(STAT_DATE) DAY, '%Y-%m-%d')",
+    'month': "DATE_FORMAT(STAT_DATE, '%Y-%m')",
+}
+
+_UPSERT_SQL = """
+    INSERT INTO DRY_VIEWER_DAILY_STATS (STAT_DATE, NEW_VIEWERS, NEW_MCHARGE)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        NEW_VIEWERS = NEW_VIEWERS + VALUES(NEW_VIEWERS),
+        NEW_MCHARGE = NEW_MCHARGE + VALUES(NEW_MCHARGE)
+"""
+
+
+def record_viewer(cursor, open_date, mcharge):
+    """Counts a newly opened account."""
+    cursor.execute(_UPSERT_SQL, (open_date, 1, mcharge))
+
+
+def record_charge_change(cursor, open_date, delta):
+    """Applies an MCHARGE change of an existing account opened on ``open_date``."""
+    if delta:
+        cursor.execute(_UPSERT_SQL, (open_date, 0, delta))
+
+
+def parse_range(args):
+    """Reads ``?from=`` / ``?to=`` (YYYY-MM-DD, inclusive) and ``?granularity=``.
+
+    Raises ValueError on malformed input.
+    """
+    granularity = args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    start = datetime.date.fromisoformat(args['from']) if args.get('from') else None
+    end = datetime.date.fromisoformat(args['to']) if args.get('to') else None
+    if start and end and start > end:
+        raise ValueError("from must not be after to")
+    return granularity, start, end
+
+
+def _where(start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append("STAT_DATE >= %s")
+        params.append(start)
+    if end:
+        clauses.append("STAT_DATE <= %s")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def viewer_growth(cursor, granularity='month', start=None, end=None):
+    """New viewers per bucket; ``cursor`` must be a dictionary cursor."""
+    where, params = _where(start, end)
+    cursor.execute(f"""
+        SELECT {GRANULARITIES[granularity]} AS {granularity},
+               SUM(NEW_VIEWERS) AS new_viewers
+        FROM DRY_VIEWER_DAILY_STATS{where}
+        GROUP BY {granularity}
+        ORDER BY {granularity}
+    """, tuple(params))
+    return cursor.fetchall()
+
+
+def revenue_growth(cursor, granularity='month', start=None, end=None):
+    """New monthly charges per bucket with a running total.
+
+    The running total includes accounts opened before ``start``.
+    """
+    where, params = _where(start, end)
+    opening = "SELECT COALESCE(SUM(NEW_MCHARGE), 0) FROM DRY_VIEWER_DAILY_STATS WHERE STAT_DATE < %s"
+    cursor.execute(f"""
+        WITH buckets AS (
+            SELECT {GRANULARITIES[granularity]} AS {granularity},
+                   SUM(NEW_MCHARGE) AS revenue_new
+            FROM DRY_VIEWER_DAILY_STATS{where}
+            GROUP BY {granularity}
+        )
+        SELECT {granularity}, revenue_new,
+               ({opening}) + SUM(revenue_new) OVER (ORDER BY {granularity}) AS revenue_total
+        FROM buckets
+        ORDER BY {granularity}
+    """, tuple(params) + (start or datetime.date.min,))
+    return cursor.fetchall()
+
+
+def rebuild(db_conn):
+    """Recomputes DRY_VIEWER_DAILY_STATS from DRY_VIEWER."""
+    cursor = db_conn.cursor()
+    try:
+        cursor.callproc('RebuildViewerDailyStats')
+        db_conn.commit()
+        cursor.execute("SELECT COUNT(*) FROM DRY_VIEWER_DAILY_STATS")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+@click.command('rebuild-viewer-growth')
+def rebuild_command():
+    """Rebuild the daily viewer/charge rollup from DRY_VIEWER."""
+    count = rebuild(db.get_db())
+    click.echo(f"Rebuilt viewer growth rollup for {count} days.")
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
@@ -1,7 +1,20 @@
 from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
+import datetime
+import cache
+import changes
+import dashboard
 import db
+import facets
+import feedback_writes
+import http_cache
+import pagination
+import passwords
+import recommender
+import search
+import series_deletion
+import series_loader
+import series_stats
 
 bp = Blueprint('viewer', __name__)
 
@@ -16,7 +29,13 @@ def viewer_required(f):
 
 @bp.route('/recommendations', methods=['GET'])
 @viewer_required
+@http_cache.conditional(changes.SERIES, changes.FEEDBACK, changes.RECOMMENDER, per_viewer=True)
 def get_recommendations():
+    recommendations = recommender.get_recommender().recommend(session['user_id'])
+    if recommendations is not None:
+        return jsonify(recommendations)
+
+    # No model yet (first build still running): global top 5
     try:
         db_conn = db.get_db()
         cursor = db_conn.cursor(dictionary=True)
@@ -35,112 +54,150 @@ def get_recommendations():
     finally:
         cursor.close()
 
-@bp.route('/series', methods=['GET'])
-@viewer_required
-def get_series_list():
-    """Returns a list of all series with optional filters."""
-    # Extract query parameters
-    genre = request.args.get('genre')
-    language = request.args.get('language')
-    country_id = request.args.get('country')
-
+SERIES_LIST_SQL = """
+    SELECT
+        s.SID,
+        s.SNAME,
+        s.NEPISODES,
+        s.ORI_LANG,
+        GROUP_CONCAT(DISTINCT st.TNAME ORDER BY st.TNAME SEPARATOR ', ') AS genres,
+        COALESCE(
+            CONCAT('[', GROUP_CONCAT(DISTINCT JSON_OBJECT('CID', c.CID, 'CNAME', c.CNAME) ORDER BY c.CNAME SEPARATOR ','), ']'),
+            '[]'
+        ) AS countries,
+        MAX({avg_rating}) AS avg_rating,
+        MAX({feedback_count}) AS feedback_count
+    FROM
+        DRY_SERIES s
+    LEFT JOIN DRY_SERIES_TYPE st ON s.SID = st.SID
+    LEFT JOIN DRY_SERIES_STATS ss ON s.SID = ss.SID
+    LEFT JOIN DRY_SERIES_RELEASE_COUNTRY src ON s.SID = src.SID
+    LEFT JOIN DRY_COUNTRY c ON src.CID = c.CID
+    WHERE {not_deleted}
+    GROUP BY s.SID
+    ORDER BY s.SNAME;
+""".format(avg_rating=series_stats.AVG_RATING_SQL,
+           feedback_count=series_stats.FEEDBACK_COUNT_SQL,
+           not_deleted=series_deletion.not_deleted('s'))
+
+FEEDBACK_LIST_SQL = """
+    SELECT f.FTEXT, f.RATE, f.FDATE, v.USERNAME, v.FNAME, v.LNAME
+    FROM DRY_FEEDBACK f
+    JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
+    WHERE f.SID = %s
+    ORDER BY f.FDATE DESC
+"""
+
+USER_FEEDBACK_SQL = "SELECT * FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s"
+
+def _query_series_list():
+    cursor = db.get_db().cursor(dictionary=True)
     try:
-        db_conn = db.get_db()
-        cursor = db_conn.cursor(dictionary=True)
+        cursor.execute(SERIES_LIST_SQL)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
 
-        # Base query
-        query = """
-            SELECT
-                s.SID,
-                s.SNAME,
-                s.NEPISODES,
-                s.ORI_LANG,
-                GROUP_CONCAT(DISTINCT st.TNAME ORDER BY st.TNAME SEPARATOR ', ') AS genres,
-                COALESCE(
-                    CONCAT('[', GROUP_CONCAT(DISTINCT JSON_OBJECT('CID', c.CID, 'CNAME', c.CNAME) ORDER BY c.CNAME SEPARATOR ','), ']'),
-                    '[]'
-                ) AS countries,
-                AVG(f.RATE) AS avg_rating,
-                COUNT(DISTINCT f.ACCOUNT) AS feedback_count
-            FROM
-                DRY_SERIES s
-            LEFT JOIN DRY_SERIES_TYPE st ON s.SID = st.SID
-            LEFT JOIN DRY_FEEDBACK f ON s.SID = f.SID
-            LEFT JOIN DRY_SERIES_RELEASE_COUNTRY src ON s.SID = src.SID
-            LEFT JOIN DRY_COUNTRY c ON src.CID = c.CID
-        """
-        
-        # Conditions and parameters for filtering
-        conditions = []
-        params = []
+def _facet_selection():
+    """Reads repeated ?genre=&language=&country= filters and their *_mode flags."""
+    selection = {facet: request.args.getlist(facet) for facet in facets.FACETS}
+    modes = {facet: request.args.get(f'{facet}_mode', 'or') for facet in facets.FACETS}
+    return selection, modes
 
-        if genre:
-            conditions.append("s.SID IN (SELECT SID FROM DRY_SERIES_TYPE WHERE TNAME = %s)")
-            params.append(genre)
-        
-        if language:
-            conditions.append("s.ORI_LANG = %s")
-            params.append(language)
-            
-        if country_id:
-            conditions.append("src.CID = %s")
-            params.append(country_id)
+def _search_facets(selection, modes):
+    index = facets.get_index()
+    cursor = db.get_db().cursor()
+    try:
+        index.ensure_fresh(cursor)
+    finally:
+        cursor.close()
+    return index.search(selection, modes)
+
+def _filtered_catalog(selection, modes):
+    catalog = cache.get_cache('series_catalog').get_or_load(None, _query_series_list)
+    if not any(selection.values()):
+        return catalog
+    sids, _ = _search_facets(selection, modes)
+    return [s for s in catalog if s['SID'] in sids]
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+@bp.route('/series', methods=['GET'])
+@viewer_required
+@http_cache.conditional(changes.SERIES, changes.EPISODE, changes.FEEDBACK)
+def get_series_list():
+    """Returns a list of all series with optional filters.
 
-        query += " GROUP BY s.SID ORDER BY s.SNAME;"
+    ``genre``, ``language`` and ``country`` may be repeated; values of one
+    filter are OR-ed (or AND-ed with e.g. ``genre_mode=and``) and different
+    filters are AND-ed.
+    """
+    selection, modes = _facet_selection()
 
-        cursor.execute(query, tuple(params))
-        series_list = cursor.fetchall()
+    try:
+        # Served from the catalog cache; admin series/episode writes and
+        # feedback writes invalidate it (see changes.bump)
+        key = (tuple((f, tuple(sorted(v)), modes[f]) for f, v in selection.items() if v))
+        series_list = cache.get_cache('series_catalog').get_or_load(
+            key, lambda: _filtered_catalog(selection, modes)
+        )
         return jsonify(series_list)
 
     except Exception as e:
         return jsonify({"error": "Database query failed", "details": str(e)}), 500
+
+@bp.route('/series/facets', methods=['GET'])
+@viewer_required
+def get_series_facets():
+    """Returns the filtered series list together with per-value facet counts."""
+    selection, modes = _facet_selection()
+    try:
+        catalog = cache.get_cache('series_catalog').get_or_load(None, _query_series_list)
+        sids, facet_counts = _search_facets(selection, modes)
+        if any(selection.values()):
+            items = [s for s in catalog if s['SID'] in sids]
+        else:
+            items = catalog
+        return jsonify({"items": items, "total": len(items), "facets": facet_counts})
+    except Exception as e:
+        return jsonify({"error": "Database query failed", "details": str(e)}), 500
+
+@bp.route('/search', methods=['GET'])
+@viewer_required
+def search_series():
+    """Ranked prefix search over series names: ``?q=&limit=&cursor=``."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"error": "Query parameter q is required"}), 400
+    limit = pagination.page_size(default=20, maximum=100)
+    try:
+        offset = pagination.decode_offset(request.args['cursor']) if request.args.get('cursor') else 0
+    except pagination.InvalidCursor:
+        return jsonify({"error": "Malformed cursor"}), 400
+
+    try:
+        cursor = db.get_db().cursor(dictionary=True)
+        rows, has_more = search.search_series(cursor, q, limit, offset)
+        next_cursor = pagination.encode_cursor([offset + limit]) if has_more else None
+        return jsonify({"items": rows, "next_cursor": next_cursor, "has_more": has_more})
+    except Exception as e:
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
     finally:
         if 'cursor' in locals() and cursor:
             cursor.close()
 
 @bp.route('/series/<int:sid>', methods=['GET'])
 @viewer_required
+@http_cache.conditional(changes.SERIES, changes.EPISODE)
 def get_series_detail(sid):
-    # This endpoint can be quite large, combining multiple queries might be better for performance
-    # but for simplicity, we do it in separate queries.
     try:
         db_conn = db.get_db()
         cursor = db_conn.cursor(dictionary=True)
-        
-        # 1. Series base info
-        cursor.execute("SELECT * FROM DRY_SERIES WHERE SID = %s", (sid,))
-        series_info = cursor.fetchone()
+
+        # Series row, genres, subtitles, dubbings, release countries and
+        # episodes in a single round trip
+        series_info = series_loader.load_series(cursor, sid)
         if not series_info:
             return jsonify({"error": "Series not found"}), 404
 
-        # 2. Genres
-        cursor.execute("SELECT TNAME FROM DRY_SERIES_TYPE WHERE SID = %s", (sid,))
-        series_info['genres'] = [row['TNAME'] for row in cursor.fetchall()]
-
-        # 3. Subtitle Languages
-        cursor.execute("SELECT LNAME FROM DRY_SERIES_SUBTITLE WHERE SID = %s", (sid,))
-        series_info['subtitles'] = [row['LNAME'] for row in cursor.fetchall()]
-
-        # 4. Dubbing Languages
-        cursor.execute("SELECT LNAME FROM DRY_SERIES_DUBBING WHERE SID = %s", (sid,))
-        series_info['dubbings'] = [row['LNAME'] for row in cursor.fetchall()]
-
-        # 5. Release Countries
-        cursor.execute("""
-            SELECT c.CNAME, src.RELEASE_DATE
-            FROM DRY_SERIES_RELEASE_COUNTRY src
-            JOIN DRY_COUNTRY c ON src.CID = c.CID
-            WHERE src.SID = %s
-        """, (sid,))
-        series_info['release_countries'] = cursor.fetchall()
-        
-        # 6. Episodes
-        cursor.execute("SELECT EID, E_NUM, SCHEDULE_SDATE, SCHEDULE_EDATE, NVIEWERS, INTERRUPTION FROM DRY_EPISODE WHERE SID = %s ORDER BY E_NUM", (sid,))
-        series_info['episodes'] = cursor.fetchall()
-
         return jsonify(series_info)
         
     except Exception as e:
@@ -158,26 +215,19 @@ def handle_feedback(sid):
     viewer_id = session['user_id']
 
     try:
+        # Series being deleted take no more feedback; the deleter would remove it
+        if not series_deletion.is_visible(cursor, sid):
+            return jsonify({"error": "Series not found"}), 404
+
         if request.method == 'GET':
             # Get all feedback for a series, plus aggregate stats
-            cursor.execute("""
-                SELECT f.FTEXT, f.RATE, f.FDATE, v.USERNAME, v.FNAME, v.LNAME
-                FROM DRY_FEEDBACK f
-                JOIN DRY_VIEWER v ON f.ACCOUNT = v.ACCOUNT
-                WHERE f.SID = %s
-                ORDER BY f.FDATE DESC
-            """, (sid,))
+            cursor.execute(FEEDBACK_LIST_SQL, (sid,))
             feedback_list = cursor.fetchall()
 
-            cursor.execute("""
-                SELECT AVG(RATE) as avg_rating, COUNT(*) as feedback_count
-                FROM DRY_FEEDBACK
-                WHERE SID = %s
-            """, (sid,))
-            stats = cursor.fetchone()
+            stats = series_stats.get_stats(cursor, sid)
             
             # Check if current user has feedback
-            cursor.execute("SELECT * FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s", (sid, viewer_id))
+            cursor.execute(USER_FEEDBACK_SQL, (sid, viewer_id))
             user_feedback = cursor.fetchone()
 
             return jsonify({
@@ -191,29 +241,41 @@ def handle_feedback(sid):
             rate = data.get('rate')
             ftext = data.get('ftext')
 
-            if not rate or not ftext or not (1 <= rate <= 5) or len(ftext) < 5:
+            # The rating delta in DRY_SERIES_STATS is indexed by the rate, so
+            # only whole numbers are accepted (True is an int, too)
+            if (not isinstance(rate, int) or isinstance(rate, bool) or not (1 <= rate <= 5)
+                    or not isinstance(ftext, str) or len(ftext) < 5):
                 return jsonify({"error": "Invalid input. Rate must be 1-5 and text must be at least 5 characters."}), 400
 
-            # Check if feedback already exists
-            cursor.execute("SELECT 1 FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s", (sid, viewer_id))
-            exists = cursor.fetchone()
+            item = (sid, viewer_id, rate, ftext, datetime.date.today())
+            writer = feedback_writes.get_writer()
+            if writer is not None and writer.submit(item):
+                return jsonify({"message": "Feedback accepted", "queued": True}), 202
 
-            if exists: # Update
-                query = "UPDATE DRY_FEEDBACK SET RATE = %s, FTEXT = %s, FDATE = CURDATE() WHERE SID = %s AND ACCOUNT = %s"
-                cursor.execute(query, (rate, ftext, sid, viewer_id))
-            else: # Insert
-                query = "INSERT INTO DRY_FEEDBACK (SID, ACCOUNT, RATE, FTEXT, FDATE) VALUES (%s, %s, %s, %s, CURDATE())"
-                cursor.execute(query, (sid, viewer_id, rate, ftext))
-            
+            write_cursor = db_conn.cursor()
+            try:
+                written = feedback_writes.write_feedback(write_cursor, [item])
+            finally:
+                write_cursor.close()
             db_conn.commit()
+            feedback_writes.after_commit(written, dashboard.get_stats(), recommender.get_recommender())
             return jsonify({"message": "Feedback submitted successfully"}), 200
 
         elif request.method == 'DELETE':
-            cursor.execute("DELETE FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s", (sid, viewer_id))
-            if cursor.rowcount == 0:
+            writer = feedback_writes.get_writer()
+            if writer is not None:
+                writer.discard(sid, viewer_id)
+            cursor.execute("SELECT RATE, FDATE FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s FOR UPDATE", (sid, viewer_id))
+            existing = cursor.fetchone()
+            if not existing:
                 return jsonify({"error": "No feedback found to delete"}), 404
-            
+
+            cursor.execute("DELETE FROM DRY_FEEDBACK WHERE SID = %s AND ACCOUNT = %s", (sid, viewer_id))
+            series_stats.apply_change(cursor, sid, old_rate=existing['RATE'])
             db_conn.commit()
+            changes.bump(changes.FEEDBACK, key=sid)
+            dashboard.get_stats().feedback_changed(sid, old_rate=existing['RATE'], old_date=existing['FDATE'])
+            recommender.get_recommender().rating_changed(viewer_id, sid, None)
             return jsonify({"message": "Feedback deleted successfully"}), 200
 
     except Exception as e:
@@ -285,6 +347,7 @@ def profile():
             """
             cursor.execute(query, (street, city, state, zipcode, cid, viewer_id))
             db_conn.commit()
+            changes.bump(changes.VIEWER, key=viewer_id)
             return jsonify({"message": "Profile updated successfully"})
 
     except Exception as e:
@@ -315,7 +378,8 @@ def change_password():
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        if not check_password_hash(user['PASSWORD_HASH'], old_password):
+        hasher = passwords.get_hasher()
+        if not hasher.verify(user['PASSWORD_HASH'], old_password):
             return jsonify({"error": "Invalid old password"}), 401
 
         if not user.get('SECURITY_ANSWER'):
@@ -324,13 +388,16 @@ def change_password():
         if user['SECURITY_ANSWER'].strip() != security_answer.strip():
             return jsonify({"error": "Incorrect security answer"}), 401
 
-        new_password_hash = generate_password_hash(new_password, method="pbkdf2:sha256", salt_length=16)
+        new_password_hash = hasher.hash(new_password)
         
         cursor.execute("UPDATE DRY_VIEWER SET PASSWORD_HASH = %s WHERE ACCOUNT = %s", (new_password_hash, viewer_id))
         db_conn.commit()
+        changes.bump(changes.VIEWER, key=viewer_id)
         
         return jsonify({"message": "Password updated successfully"}), 200
 
+    except passwords.HasherBusy:
+        raise
     except Exception as e:
         db_conn.rollback()
         return jsonify({"error": "Database operation failed", "details": str(e)}), 500
@@ -0,0 +1,4 @@
+"""WSGI entry point: ``gunicorn -c gunicorn.conf.py`` (see gunicorn.conf.py)."""
+from app import create_app
+
+app = create_app()
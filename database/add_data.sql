@@ -639,3 +639,13 @@ VALUES
       WHERE SID = 3001
         AND ACCOUNT = 2;'
   );
+
+-- ------------------------------------------------------------
+-- 重建剧集评分汇总（上面直接插入了 DRY_FEEDBACK）
+-- ------------------------------------------------------------
+CALL RebuildSeriesStats();
+
+-- ------------------------------------------------------------
+-- 重建新增观众按日汇总（上面直接插入了 DRY_VIEWER）
+-- ------------------------------------------------------------
+CALL RebuildViewerDailyStats();
@@ -61,6 +61,8 @@ BEGIN
     END WHILE;
     
     COMMIT;
+    -- 直接写入 DRY_FEEDBACK 绕过了后端的增量维护，需要重建评分汇总
+    CALL RebuildSeriesStats();
     SELECT CONCAT('成功生成 ', num_records, ' 条测试数据') AS result;
 END$$
 
@@ -211,10 +211,13 @@ CREATE TABLE DRY_ADMIN (
   )
 ) ENGINE=InnoDB;
 
-<<<<<<< HEAD
-------------------------------------------------------------
+-- ----------------------------------------------------------
 -- Admin 操作历史表
-------------------------------------------------------------
+-- ----------------------------------------------------------
+-- 后端在管理员写操作提交后批量写入（backend/audit.py）。按 ACTION_TS 每月一个分区，
+-- 分区由 MaintainAdminHistoryPartitions 提前创建，超过保留期的分区整体转存到
+-- DRY_ADMIN_HISTORY_ARCHIVE 后 DROP。分区表不支持外键，且每个唯一键都必须包含
+-- ACTION_TS，所以主键是 (HID, ACTION_TS)，ADMIN_ID 不再引用 DRY_ADMIN。
 
 CREATE TABLE DRY_ADMIN_HISTORY (
   HID          BIGINT NOT NULL AUTO_INCREMENT COMMENT 'surrogate key of history record',
@@ -223,19 +226,31 @@ CREATE TABLE DRY_ADMIN_HISTORY (
   TARGET_TABLE VARCHAR(64) NOT NULL COMMENT 'target table name, e.g. DRY_SERIES',
   ACTION_TYPE  VARCHAR(10) NOT NULL COMMENT 'INSERT / UPDATE / DELETE',
   SQL_TEXT     TEXT NOT NULL COMMENT 'executed SQL statement text',
-  PRIMARY KEY (HID),
+  PRIMARY KEY (HID, ACTION_TS),
+  -- 分页（ORDER BY ACTION_TS DESC, HID DESC）及按管理员 / 表过滤
+  KEY idx_history_ts (ACTION_TS, HID),
+  KEY idx_history_admin_ts (ADMIN_ID, ACTION_TS, HID),
+  KEY idx_history_table_ts (TARGET_TABLE, ACTION_TS, HID),
   CONSTRAINT chk_history_action_type CHECK (ACTION_TYPE IN ('INSERT','UPDATE','DELETE'))
+) ENGINE=InnoDB
+PARTITION BY RANGE (TO_DAYS(ACTION_TS)) (
+  PARTITION p_old VALUES LESS THAN (TO_DAYS('2024-01-01')),
+  PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- 归档：列与 DRY_ADMIN_HISTORY 相同（INSERT ... SELECT * 依赖列顺序）
+CREATE TABLE DRY_ADMIN_HISTORY_ARCHIVE (
+  HID          BIGINT NOT NULL,
+  ADMIN_ID     INT    NOT NULL,
+  ACTION_TS    DATETIME NOT NULL,
+  TARGET_TABLE VARCHAR(64) NOT NULL,
+  ACTION_TYPE  VARCHAR(10) NOT NULL,
+  SQL_TEXT     TEXT NOT NULL,
+  PRIMARY KEY (HID),
+  KEY idx_history_archive_ts (ACTION_TS, HID)
 ) ENGINE=InnoDB;
 
--- 外键：哪个管理员做的
-ALTER TABLE DRY_ADMIN_HISTORY
-  ADD CONSTRAINT HISTORY_ADMIN_FK
-  FOREIGN KEY (ADMIN_ID) REFERENCES DRY_ADMIN (ADMIN_ID);
-
-------------------------------------------------------------
-=======
 -- ----------------------------------------------------------
->>>>>>> f638b657a347af67fcb70215129413891d753acb
 -- 外键约束
 -- ----------------------------------------------------------
 
@@ -689,10 +704,11 @@ BEGIN
         s.SID,
         s.SNAME,
         s.ORI_LANG,
-        AVG(f.RATE) AS avg_rating
-    FROM DRY_SERIES s
-    JOIN DRY_FEEDBACK f ON s.SID = f.SID
-    GROUP BY s.SID, s.SNAME, s.ORI_LANG
+        ss.RATING_SUM / ss.RATING_COUNT AS avg_rating
+    FROM DRY_SERIES_STATS ss
+    JOIN DRY_SERIES s ON s.SID = ss.SID
+    WHERE ss.RATING_COUNT > 0
+      AND NOT EXISTS (SELECT 1 FROM DRY_SERIES_DELETION d WHERE d.SID = s.SID AND d.FINISHED_AT IS NULL)
     ORDER BY avg_rating DESC
     LIMIT limit_count;
 END$$
@@ -724,4 +740,184 @@ COMMENT '用于按月/年统计新增观众，支持viewer_growth_monthly视图'
 
 -- 5. 集数表：按剧集查询集数
 CREATE INDEX idx_episode_sid_enum ON DRY_EPISODE(SID, E_NUM)
-COMMENT '用于查询某剧集的所有集数并按集数排序';
\ No newline at end of file
+COMMENT '用于查询某剧集的所有集数并按集数排序';
+
+-- ----------------     剧集评分汇总表    ---------------
+-- 每部剧的评分总和 / 数量 / 星级分布，由后端在写入 DRY_FEEDBACK 的同一事务中增量维护，
+-- 读取平均分时无需再扫描 DRY_FEEDBACK。批量导入数据后执行 CALL RebuildSeriesStats(); 重建。
+
+CREATE TABLE DRY_SERIES_STATS (
+  SID          INT NOT NULL COMMENT 'series id',
+  RATING_SUM   BIGINT NOT NULL DEFAULT 0 COMMENT 'sum of all ratings',
+  RATING_COUNT INT NOT NULL DEFAULT 0 COMMENT 'number of feedback rows',
+  STAR_1       INT NOT NULL DEFAULT 0 COMMENT 'number of 1-star ratings',
+  STAR_2       INT NOT NULL DEFAULT 0 COMMENT 'number of 2-star ratings',
+  STAR_3       INT NOT NULL DEFAULT 0 COMMENT 'number of 3-star ratings',
+  STAR_4       INT NOT NULL DEFAULT 0 COMMENT 'number of 4-star ratings',
+  STAR_5       INT NOT NULL DEFAULT 0 COMMENT 'number of 5-star ratings',
+  PRIMARY KEY (SID),
+  CONSTRAINT SERIES_STATS_SERIES_FK FOREIGN KEY (SID) REFERENCES DRY_SERIES (SID)
+) ENGINE=InnoDB;
+
+DELIMITER $$
+
+CREATE PROCEDURE RebuildSeriesStats()
+BEGIN
+    START TRANSACTION;
+    DELETE FROM DRY_SERIES_STATS;
+    INSERT INTO DRY_SERIES_STATS
+      (SID, RATING_SUM, RATING_COUNT, STAR_1, STAR_2, STAR_3, STAR_4, STAR_5)
+    SELECT
+        SID,
+        SUM(RATE),
+        COUNT(*),
+        SUM(RATE = 1),
+        SUM(RATE = 2),
+        SUM(RATE = 3),
+        SUM(RATE = 4),
+        SUM(RATE = 5)
+    FROM DRY_FEEDBACK
+    GROUP BY SID;
+    COMMIT;
+END$$
+
+DELIMITER ;
+
+CALL RebuildSeriesStats();
+
+-- ----------------     全文索引（搜索接口）    ---------------
+-- /api/viewer/search 与 /api/admin/feedback/search 使用 MATCH ... AGAINST (... IN BOOLEAN MODE)
+CREATE FULLTEXT INDEX ft_series_sname ON DRY_SERIES(SNAME);
+CREATE FULLTEXT INDEX ft_feedback_ftext ON DRY_FEEDBACK(FTEXT);
+
+-- ----------------     新增观众按日汇总表    ---------------
+-- 每个开户日期的新增观众数与其 MCHARGE 之和，由后端在注册和管理员修改月费的同一事务中增量维护，
+-- /api/admin/viewer-growth 与 /api/admin/revenue-growth 按日/周/月聚合此表，无需扫描 DRY_VIEWER。
+-- 直接写入 DRY_VIEWER 后执行 CALL RebuildViewerDailyStats(); 重建。
+
+CREATE TABLE DRY_VIEWER_DAILY_STATS (
+  STAT_DATE   DATE NOT NULL COMMENT 'account opening date',
+  NEW_VIEWERS INT NOT NULL DEFAULT 0 COMMENT 'number of accounts opened on this date',
+  NEW_MCHARGE DECIMAL(14,2) NOT NULL DEFAULT 0 COMMENT 'sum of current monthly charges of these accounts',
+  PRIMARY KEY (STAT_DATE)
+) ENGINE=InnoDB;
+
+DELIMITER $$
+
+CREATE PROCEDURE RebuildViewerDailyStats()
+BEGIN
+    START TRANSACTION;
+    DELETE FROM DRY_VIEWER_DAILY_STATS;
+    INSERT INTO DRY_VIEWER_DAILY_STATS (STAT_DATE, NEW_VIEWERS, NEW_MCHARGE)
+    SELECT OPEN_DATE, COUNT(*), SUM(MCHARGE)
+    FROM DRY_VIEWER
+    GROUP BY OPEN_DATE;
+    COMMIT;
+END$$
+
+DELIMITER ;
+
+CALL RebuildViewerDailyStats();
+
+-- ----------------     剧集后台删除（墓碑 + 进度）    ---------------
+-- DELETE /api/admin/series/<sid> 先插入一行墓碑（FINISHED_AT IS NULL 的剧集对观众隐藏），
+-- 再由后端线程分批删除 DRY_FEEDBACK / DRY_EPISODE，每批与进度计数在同一事务中提交，
+-- 进程崩溃后由其他进程在租约（HEARTBEAT_AT）过期后接手继续。不设外键：剧集删除后保留此行作为记录。
+
+CREATE TABLE DRY_SERIES_DELETION (
+  SID               INT NOT NULL COMMENT 'series being deleted',
+  SNAME             VARCHAR(200) NOT NULL COMMENT 'series name, kept after the series row is gone',
+  STATUS            VARCHAR(10) NOT NULL DEFAULT 'queued' COMMENT 'queued, running, failed or done',
+  REQUESTED_BY      INT NULL COMMENT 'admin id',
+  REQUESTED_AT      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  STARTED_AT        DATETIME NULL,
+  FINISHED_AT       DATETIME NULL COMMENT 'NULL while the series is tombstoned',
+  OWNER             VARCHAR(100) NULL COMMENT 'host:pid of the process holding the lease',
+  HEARTBEAT_AT      DATETIME NULL COMMENT 'lease renewed with every batch',
+  FEEDBACK_TOTAL    INT NULL,
+  FEEDBACK_DELETED  INT NOT NULL DEFAULT 0,
+  EPISODES_TOTAL    INT NULL,
+  EPISODES_DELETED  INT NOT NULL DEFAULT 0,
+  BATCHES           INT NOT NULL DEFAULT 0,
+  ATTEMPTS          INT NOT NULL DEFAULT 0,
+  LAST_ERROR        VARCHAR(500) NULL,
+  PRIMARY KEY (SID),
+  KEY idx_series_deletion_pending (FINISHED_AT, REQUESTED_AT)
+) ENGINE=InnoDB;
+
+-- ----------------     Admin 历史表分区维护    ---------------
+-- 1. 把 pmax 拆分出直到当前月之后 months_ahead 个月的月分区（pYYYYMM 存放该月数据）；
+-- 2. 上限早于 keep_months 个月前的分区：先 INSERT IGNORE 到归档表（可重复执行），再 DROP PARTITION。
+-- 由下面的事件每天执行一次（需要 event_scheduler=ON，MySQL 8 默认开启）。
+
+DELIMITER $$
+
+CREATE PROCEDURE MaintainAdminHistoryPartitions(IN months_ahead INT, IN keep_months INT)
+BEGIN
+    DECLARE done INT DEFAULT 0;
+    DECLARE part_name VARCHAR(64);
+    DECLARE bound DATE;
+    DECLARE target DATE;
+    DECLARE cutoff DATE;
+    DECLARE new_parts TEXT DEFAULT '';
+    DECLARE expired CURSOR FOR
+        SELECT PARTITION_NAME
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'DRY_ADMIN_HISTORY'
+          AND PARTITION_DESCRIPTION <> 'MAXVALUE'
+          AND FROM_DAYS(PARTITION_DESCRIPTION) <= cutoff
+        ORDER BY PARTITION_ORDINAL_POSITION;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
+
+    -- 第一天：下个月 + months_ahead 个月
+    SET target = LAST_DAY(CURDATE()) + INTERVAL 1 DAY + INTERVAL months_ahead MONTH;
+    -- 第一天：当前月 - keep_months 个月
+    SET cutoff = LAST_DAY(CURDATE()) + INTERVAL 1 DAY - INTERVAL (keep_months + 1) MONTH;
+
+    SELECT FROM_DAYS(MAX(CAST(PARTITION_DESCRIPTION AS UNSIGNED))) INTO bound
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME = 'DRY_ADMIN_HISTORY'
+      AND PARTITION_DESCRIPTION <> 'MAXVALUE';
+
+    WHILE bound < target DO
+        SET new_parts = CONCAT(new_parts, 'PARTITION p', DATE_FORMAT(bound, '%Y%m'),
+                               ' VALUES LESS THAN (', TO_DAYS(bound + INTERVAL 1 MONTH), '), ');
+        SET bound = bound + INTERVAL 1 MONTH;
+    END WHILE;
+    IF new_parts <> '' THEN
+        SET @ddl = CONCAT('ALTER TABLE DRY_ADMIN_HISTORY REORGANIZE PARTITION pmax INTO (',
+                          new_parts, 'PARTITION pmax VALUES LESS THAN MAXVALUE)');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+
+    OPEN expired;
+    archive_loop: LOOP
+        FETCH expired INTO part_name;
+        IF done THEN
+            LEAVE archive_loop;
+        END IF;
+        SET @ddl = CONCAT('INSERT IGNORE INTO DRY_ADMIN_HISTORY_ARCHIVE ',
+                          'SELECT * FROM DRY_ADMIN_HISTORY PARTITION (', part_name, ')');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+        SET @ddl = CONCAT('ALTER TABLE DRY_ADMIN_HISTORY DROP PARTITION ', part_name);
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END LOOP;
+    CLOSE expired;
+END$$
+
+DELIMITER ;
+
+-- 提前 3 个月建分区，在线保留 24 个月
+CALL MaintainAdminHistoryPartitions(3, 24);
+
+CREATE EVENT MaintainAdminHistoryPartitionsDaily
+  ON SCHEDULE EVERY 1 DAY
+  DO CALL MaintainAdminHistoryPartitions(3, 24);
@@ -5,13 +5,16 @@ import NavBar from '../components/NavBar';
 const AdminFeedback = () => {
   const [filters, setFilters] = useState({ sid: '', rating: '', start_date: '', end_date: '' });
   const [list, setList] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState('');
   const [notice, setNotice] = useState('');
 
-  const load = async () => {
+  const load = async (cursor = null) => {
     try {
-      const data = await axiosClient.get('/admin/feedback', { params: filters });
-      setList(data);
+      const params = cursor ? { ...filters, cursor } : filters;
+      const data = await axiosClient.get('/admin/feedback', { params });
+      setList((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (err) {
       setError(err.error || 'Failed to load feedback');
     }
@@ -89,6 +92,9 @@ const AdminFeedback = () => {
               </tbody>
             </table>
             {!list.length && <p className="muted">No feedback found.</p>}
+            {nextCursor && (
+              <button className="btn" type="button" onClick={() => load(nextCursor)}>Load more</button>
+            )}
           </div>
         </div>
       </div>
@@ -3,20 +3,42 @@ import axiosClient from '../api/axiosClient';
 import NavBar from '../components/NavBar';
 
 const AdminHistory = () => {
+  const [filters, setFilters] = useState({ admin_id: '', table: '' });
   const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(true);
 
+  const load = async (cursor = null) => {
+    setLoading(true);
+    try {
+      const params = cursor ? { ...filters, cursor } : filters;
+      const data = await axiosClient.get('/admin/history', { params });
+      setRows((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
+      setError('');
+    } catch (err) {
+      setError(err.error || 'Failed to load history');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    axiosClient.get('/admin/history')
-      .then((data) => {
-        setRows(data);
-        setError('');
-      })
-      .catch((err) => setError(err.error || 'Failed to load history'))
-      .finally(() => setLoading(false));
+    load();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
+  const handleChange = (e) => {
+    const { name, value } = e.target;
+    setFilters((prev) => ({ ...prev, [name]: value }));
+  };
+
+  const handleSubmit = (e) => {
+    e.preventDefault();
+    load();
+  };
+
   return (
     <>
       <NavBar />
@@ -27,6 +49,13 @@ const AdminHistory = () => {
             {loading && <span className="pill">Loading...</span>}
           </div>
           {error && <p className="muted">{error}</p>}
+          <div className="card">
+            <form onSubmit={handleSubmit} className="form-row">
+              <input name="admin_id" placeholder="Admin ID" value={filters.admin_id} onChange={handleChange} />
+              <input name="table" placeholder="Table, e.g. DRY_SERIES" value={filters.table} onChange={handleChange} />
+              <button className="btn" type="submit">Filter</button>
+            </form>
+          </div>
           <div className="card section">
             <table className="table">
               <thead>
@@ -53,6 +82,9 @@ const AdminHistory = () => {
               </tbody>
             </table>
             {!loading && !rows.length && <p className="muted">No history records.</p>}
+            {nextCursor && (
+              <button className="btn" type="button" onClick={() => load(nextCursor)}>Load more</button>
+            )}
           </div>
         </div>
       </div>